@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+"""
+Compare the in-process BAM header reader with 'samtools view -H' on the BAMs
+under tests/submissions.
+
+    python benchmarks/bam_header.py [-n REPEATS]
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from seq_tools.bam_header import read_bam_header_text, BamHeader  # noqa: E402
+
+test_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'tests')
+
+
+def time_it(bam_file, use_samtools, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        BamHeader(read_bam_header_text(bam_file, use_samtools=use_samtools))
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--repeats', type=int, default=20, help='number of reads per BAM and per reader')
+    args = parser.parse_args()
+
+    print("%-70s %12s %12s %8s" % ('BAM', 'python (ms)', 'samtools (ms)', 'speedup'))
+    total = [0, 0]
+    for bam_file in sorted(set(os.path.realpath(f) for f in glob.glob(os.path.join(test_dir, 'submissions', '*', '*.bam')))):
+        try:  # skip BAMs neither reader can decode, they are there to fail validation
+            BamHeader(read_bam_header_text(bam_file, use_samtools=True))
+        except Exception:
+            continue
+
+        python_time = time_it(bam_file, False, args.repeats)
+        samtools_time = time_it(bam_file, True, args.repeats)
+        total[0] += python_time
+        total[1] += samtools_time
+
+        print("%-70s %12.3f %12.3f %7.1fx" % (
+            os.path.relpath(bam_file, test_dir), python_time * 1000, samtools_time * 1000, samtools_time / python_time))
+
+    if total[0]:
+        print("%-70s %12.3f %12.3f %7.1fx" % ('total', total[0] * 1000, total[1] * 1000, total[1] / total[0]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark checkers and the end-to-end 'seq-tools validate' on synthetic submissions
+(see benchmarks/synthetic_data.py) of different formats and sizes. Submissions are
+generated into WORK_DIR once and reused by later runs. Time of each checker is taken
+from 'validate --metrics'. Results are saved as JSON for comparison between releases:
+
+    python benchmarks/checkers.py run [-s 1M,1G,20G] [-f fastq.gz,fastq.bz2,bam] [-o RESULTS] [WORK_DIR]
+    python benchmarks/checkers.py compare BASELINE_RESULTS RESULTS [--threshold 1.2]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+
+repo_dir = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, repo_dir)
+
+from seq_tools import __version__ as ver  # noqa: E402
+from synthetic_data import FORMATS, generate_submission  # noqa: E402
+
+
+def prepare_submission(work_dir, fmt, size, read_groups, threads):
+    submission_dir = os.path.join(work_dir, '%s-%s-%srg' % (fmt, size, read_groups))
+    metadata_file = os.path.join(submission_dir, 'sequencing_experiment.json')
+    if not os.path.isfile(metadata_file):  # metadata is written last, only a complete submission has it
+        print("Generating %s submission of %s ..." % (fmt, size), file=sys.stderr)
+        generate_submission(submission_dir, fmt, size, read_groups, threads)
+    return metadata_file
+
+
+def time_validate(metadata_file, threads, workers):
+    cmd = [sys.executable, '-c', 'from seq_tools.cli import main; main()', '--offline',
+           'validate', '--metrics', '-m', 'off', '-t', str(threads), '-w', str(workers), metadata_file]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([repo_dir, os.environ.get('PYTHONPATH', '')]))
+
+    with tempfile.TemporaryDirectory() as run_dir:  # logs and reports of the run go here
+        start = time.perf_counter()
+        result = subprocess.run(cmd, cwd=run_dir, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                universal_newlines=True, check=True)
+        wall_s = time.perf_counter() - start
+
+    summary_report = json.loads(result.stdout.strip().split('\n')[-1])
+    return {
+        'status': list(summary_report['summary']),
+        'wall_s': round(wall_s, 3),
+        'checkers': {c: m['wall_s'] for c, m in summary_report['metrics']['checkers'].items()},
+        'metrics': {k: v for k, v in summary_report['metrics'].items() if k != 'checkers'}
+    }
+
+
+def run(args):
+    results = {
+        'version': ver,
+        'python': platform.python_version(),
+        'host': socket.gethostname(),
+        'cpus': os.cpu_count(),
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'threads': args.threads,
+        'workers': args.workers,
+        'results': []
+    }
+    for fmt in args.formats.split(','):
+        for size in args.sizes.split(','):
+            metadata_file = prepare_submission(args.work_dir, fmt, size, args.read_groups, args.threads)
+            for i in range(args.repeats):
+                result = time_validate(metadata_file, args.threads, args.workers)
+                result.update(format=fmt, size=size, read_groups=args.read_groups, repeat=i)
+                results['results'].append(result)
+                print("%-10s %6s  %8.2fs  %s" % (fmt, size, result['wall_s'], ', '.join(result['status'])),
+                      file=sys.stderr)
+
+    output = args.output or 'benchmark.%s.%s.json' % (ver, time.strftime('%Y%m%dT%H%M%S'))
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(output)
+
+
+def best_times(results):
+    # fastest of repeats: {(format, size): {'validate': s, checker: s}}
+    best = {}
+    for r in results['results']:
+        times = dict(r['checkers'], validate=r['wall_s'])
+        key = (r['format'], r['size'])
+        for name, seconds in times.items():
+            best.setdefault(key, {})
+            best[key][name] = min(seconds, best[key].get(name, seconds))
+    return best
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.results) as f:
+        current = json.load(f)
+
+    base_times, times = best_times(baseline), best_times(current)
+    print("%s (baseline) vs %s\n" % (baseline['version'], current['version']))
+    print("%-10s %6s  %-45s %10s %10s %7s" % ('format', 'size', 'checker', 'baseline', 'current', 'ratio'))
+
+    regressions = []
+    for key in sorted(set(base_times) & set(times)):
+        for name in sorted(set(base_times[key]) & set(times[key])):
+            before, after = base_times[key][name], times[key][name]
+            ratio = after / before if before else float('inf') if after else 1.0
+            # small absolute differences are noise, eg, of quick metadata checks
+            regressed = ratio > args.threshold and after - before > args.min_seconds
+            if regressed:
+                regressions.append((key, name))
+            print("%-10s %6s  %-45s %9.3fs %9.3fs %6.2fx%s" % (
+                key[0], key[1], name, before, after, ratio, '  <- slower' if regressed else ''))
+
+    if regressions:
+        sys.exit("%s regression(s) over %.2fx" % (len(regressions), args.threshold))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser('run', help='generate submissions as needed and time validation of them')
+    run_parser.add_argument('work_dir', nargs='?', default=os.path.join(tempfile.gettempdir(), 'seq-tools-benchmark'),
+                            help='directory of generated submissions, reused between runs')
+    run_parser.add_argument('-s', '--sizes', default='1M', help='comma separated sizes of reads, eg, 1M,1G,20G')
+    run_parser.add_argument('-f', '--formats', default=','.join(FORMATS), help='comma separated formats of data files')
+    run_parser.add_argument('-g', '--read_groups', type=int, default=3, help='number of read groups')
+    run_parser.add_argument('-t', '--threads', type=int, default=1, help='as -t of seq-tools validate')
+    run_parser.add_argument('-w', '--workers', type=int, default=1, help='as -w of seq-tools validate')
+    run_parser.add_argument('-r', '--repeats', type=int, default=1, help='number of runs of each submission')
+    run_parser.add_argument('-o', '--output', help='results JSON file, default: benchmark.<version>.<time>.json')
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser('compare', help='compare results with a baseline')
+    compare_parser.add_argument('baseline', help='results JSON file to compare with, eg, of the last release')
+    compare_parser.add_argument('results', help='results JSON file')
+    compare_parser.add_argument('--threshold', type=float, default=1.2, help='ratio over which it is a regression')
+    compare_parser.add_argument('--min_seconds', type=float, default=0.5,
+                                help='ignore differences smaller than this many seconds')
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+"""
+Measure throughput of metadata-only validation in documents per second, either of
+metadata given as a JSON string, ie, 'seq-tools validate -s', or with -f of metadata
+files, ie, 'seq-tools validate METADATA_FILE' with checks of data files skipped. Each
+document runs through perform_validation as it does from the command line, with
+logging turned off. With --resume checks also save checkpoints, as with 'seq-tools
+validate -r', into a temporary directory.
+
+    python benchmarks/metadata_checks.py [-n DOCS] [-r REPEATS] [-w WORKERS] [-f [--resume]] [METADATA_FILE]
+"""
+
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import logging
+import argparse
+import statistics
+import contextlib
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, repo_dir)
+
+import click  # noqa: E402
+from seq_tools.cli import validate  # noqa: E402
+from seq_tools.validation import checker_registry, perform_validation  # noqa: E402
+
+
+def docs_per_second(metadata_str, docs, workers):
+    logger = logging.getLogger('seq_tools: benchmark')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # report of each document goes to STDOUT
+        for _ in range(docs):
+            ctx = click.Context(validate, obj={'LOGGER': logger})
+            perform_validation(ctx, metadata_str=metadata_str, workers=workers)
+    return docs / (time.perf_counter() - start)
+
+
+def files_per_second(metadata_file, docs, workers, resume=False):
+    logger = logging.getLogger('seq_tools: benchmark')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    # checks of data files, only metadata checks are measured
+    data_checks = [c.split('_')[0] for c in checker_registry() if c[1] in '6789']
+
+    start = time.perf_counter()
+    for _ in range(docs):
+        ctx = click.Context(validate, obj={'LOGGER': logger, 'RESUME': resume})
+        perform_validation(ctx, metadata_file=metadata_file, skip_checks=data_checks, workers=workers)
+    return docs / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('metadata_file', nargs='?', help='metadata JSON to validate, default: a valid test submission',
+                        default=os.path.join(repo_dir, 'tests', 'submissions', 'HCC1160T.valid',
+                                             'sequencing_experiment.json'))
+    parser.add_argument('-n', '--docs', type=int, default=1000, help='number of documents to validate per run')
+    parser.add_argument('-r', '--repeats', type=int, default=5, help='number of runs to take median from')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='as -w of seq-tools validate')
+    parser.add_argument('-f', '--file', action='store_true', help='validate the metadata file instead of a string')
+    parser.add_argument('--resume', action='store_true', help='with -f, save checkpoints as -r of seq-tools validate')
+    args = parser.parse_args()
+
+    if args.file:
+        metadata_file = os.path.realpath(args.metadata_file)
+        run_dir = tempfile.mkdtemp()  # checkpoints are saved under 'logs' of the working directory
+        cwd = os.getcwd()
+        os.chdir(run_dir)
+        try:
+            files_per_second(metadata_file, 20, args.workers, args.resume)  # warm up
+            rates = [files_per_second(metadata_file, args.docs, args.workers, args.resume)
+                     for _ in range(args.repeats)]
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(run_dir)
+        print("metadata file validation%s (median of %s runs of %s documents): %.0f docs/s" %
+              (' with --resume' if args.resume else '', args.repeats, args.docs, statistics.median(rates)))
+        return
+
+    with open(args.metadata_file) as f:
+        metadata_str = f.read()
+
+    docs_per_second(metadata_str, 20, args.workers)  # warm up, checkers are imported on first use
+    rates = [docs_per_second(metadata_str, args.docs, args.workers) for _ in range(args.repeats)]
+    print("metadata-only validation (median of %s runs of %s documents): %.0f docs/s" %
+          (args.repeats, args.docs, statistics.median(rates)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+"""
+Measure start up time of seq-tools: cumulative import time of 'seq_tools.cli' as
+reported by 'python -X importtime', wall time of 'seq-tools --version', and the
+slowest imports. With --max-ms, exits with an error when the median import time
+is over the limit, so that regressions can be caught.
+
+    python benchmarks/startup.py [-n REPEATS] [-t TOP] [--max-ms MS]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+
+def import_times():
+    # {module: cumulative import time in microseconds}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import seq_tools.cli'],
+        cwd=repo_dir, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, universal_newlines=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        m = re.match(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$', line)
+        if m:
+            times[m.group(4)] = int(m.group(2))
+    return times
+
+
+def version_wall_time():
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-c', 'from seq_tools.cli import main; main(["--version"])'],
+        cwd=repo_dir, stdout=subprocess.DEVNULL, check=True
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--repeats', type=int, default=10, help='number of runs to take median from')
+    parser.add_argument('-t', '--top', type=int, default=10, help='number of slowest imports to list')
+    parser.add_argument('--max-ms', type=float, help='fail if median import time of seq_tools.cli is over this')
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.repeats)]
+    cli_ms = statistics.median(r['seq_tools.cli'] for r in runs) / 1000
+    version_ms = statistics.median(version_wall_time() for _ in range(args.repeats)) * 1000
+
+    print("import seq_tools.cli (median of %s): %.1f ms" % (args.repeats, cli_ms))
+    print("seq-tools --version (median of %s): %.1f ms" % (args.repeats, version_ms))
+    print("\nslowest imports (cumulative, last run):")
+    for module, us in sorted(runs[-1].items(), key=lambda x: -x[1])[:args.top]:
+        print("  %-50s %8.1f ms" % (module, us / 1000))
+
+    if args.max_ms and cli_ms > args.max_ms:
+        sys.exit("import time %.1f ms is over the limit of %.1f ms" % (cli_ms, args.max_ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+Generate synthetic submissions for benchmarking: paired FASTQs (gz or bz2) or an
+unaligned multi read group BAM of a given size, with a matching sequencing experiment
+metadata JSON that passes validation. Sizes are of the uncompressed reads (FASTQ or
+SAM text), bases and qualities are random so that files compress like real ones.
+
+Used by benchmarks/checkers.py, or on its own:
+
+    python benchmarks/synthetic_data.py [-f fastq.gz|fastq.bz2|bam] [-s SIZE] [-g READ_GROUPS] OUT_DIR
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import argparse
+import subprocess
+
+READ_LENGTH = 150
+INSERT_SIZE = 298
+SAMPLE = 'SYNTH01N'
+FORMATS = ('fastq.gz', 'fastq.bz2', 'bam')
+
+# map random bytes to bases and to phred+33 qualities (2-41)
+BASES = bytes(b'ACGT'[i % 4] for i in range(256))
+QUALITIES = bytes(35 + i % 40 for i in range(256))
+
+
+def parse_size(size) -> int:
+    """'1M', '1G', '20G', or number of bytes"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    size = str(size).strip().upper().rstrip('B')
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+
+def compress_cmd(fmt, threads=1):
+    if fmt == 'fastq.gz':
+        return ['pigz', '-p', str(threads), '-c'] if threads > 1 and shutil.which('pigz') else ['gzip', '-c']
+    return ['pbzip2', '-p%s' % threads, '-c'] if threads > 1 and shutil.which('pbzip2') else ['bzip2', '-c']
+
+
+def random_reads(count, seed):
+    """(sequence, quality) of 'count' reads, deterministic for a seed"""
+    rng = hashlib.sha256(seed.encode('utf-8')).digest()
+    for i in range(count):
+        block = b''
+        counter = 0
+        while len(block) < 2 * READ_LENGTH:  # sha256 as a fast, seeded and portable byte stream
+            block += hashlib.sha512(rng + i.to_bytes(8, 'little') + bytes([counter])).digest()
+            counter += 1
+        yield block[:READ_LENGTH].translate(BASES), block[READ_LENGTH:2 * READ_LENGTH].translate(QUALITIES)
+
+
+def write_fastq_pair(path_r1, path_r2, pairs, run_id, fmt, threads=1):
+    with open(path_r1, 'wb') as f1, open(path_r2, 'wb') as f2:
+        p1 = subprocess.Popen(compress_cmd(fmt, threads), stdin=subprocess.PIPE, stdout=f1)
+        p2 = subprocess.Popen(compress_cmd(fmt, threads), stdin=subprocess.PIPE, stdout=f2)
+        reads = random_reads(2 * pairs, run_id)
+        for i in range(pairs):
+            name = b'@%s:%d' % (run_id.encode(), i)
+            (s1, q1), (s2, q2) = next(reads), next(reads)
+            p1.stdin.write(b'%s/1\n%s\n+\n%s\n' % (name, s1, q1))
+            p2.stdin.write(b'%s/2\n%s\n+\n%s\n' % (name, s2, q2))
+        for p in (p1, p2):
+            p.stdin.close()
+            if p.wait():
+                raise RuntimeError("Compression failed: %s" % ' '.join(p.args))
+
+
+def write_bam(path, read_groups, pairs_per_group, experiment, threads=1):
+    # reads are unaligned, a reference is there as samtools quickcheck requires one
+    header = ['@HD\tVN:1.6\tSO:unsorted', '@SQ\tSN:1\tLN:249250621']
+    for rg in read_groups:
+        header.append('\t'.join([
+            '@RG', 'ID:%s' % rg['read_group_id_in_bam'], 'SM:%s' % SAMPLE, 'LB:%s' % rg['library_name'],
+            'PU:%s' % rg['platform_unit'], 'PL:%s' % experiment['platform'],
+            'PM:%s' % experiment['platform_model'], 'CN:%s' % experiment['sequencing_center'],
+            'DT:%s' % experiment['sequencing_date']
+        ]))
+
+    p = subprocess.Popen(['samtools', 'view', '-b', '-@', str(threads), '-o', path, '-'], stdin=subprocess.PIPE)
+    p.stdin.write(('\n'.join(header) + '\n').encode())
+    for rg in read_groups:
+        rg_id = rg['read_group_id_in_bam'].encode()
+        reads = random_reads(2 * pairs_per_group, rg['submitter_read_group_id'])
+        for i in range(pairs_per_group):
+            (s1, q1), (s2, q2) = next(reads), next(reads)
+            name = b'%s:%d' % (rg_id, i)
+            # unaligned pairs: flags 77 and 141
+            p.stdin.write(b'%s\t77\t*\t0\t0\t*\t*\t0\t0\t%s\t%s\tRG:Z:%s\n' % (name, s1, q1, rg_id))
+            p.stdin.write(b'%s\t141\t*\t0\t0\t*\t*\t0\t0\t%s\t%s\tRG:Z:%s\n' % (name, s2, q2, rg_id))
+    p.stdin.close()
+    if p.wait():
+        raise RuntimeError("Failed to write BAM: %s" % path)
+
+
+def file_entry(path, file_type):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(8 * 1024 * 1024), b''):
+            md5.update(chunk)
+    return {
+        'fileName': os.path.basename(path),
+        'fileSize': os.path.getsize(path),
+        'fileMd5sum': md5.hexdigest(),
+        'fileType': file_type,
+        'fileAccess': 'controlled',
+        'dataType': 'Submitted Reads',
+        'info': {'data_category': 'Sequencing Reads'}
+    }
+
+
+def generate_submission(out_dir, fmt='fastq.gz', size='1M', read_group_count=3, threads=1) -> str:
+    """Write data files and metadata JSON of a submission into 'out_dir', returns path of the metadata JSON"""
+    if fmt not in FORMATS:
+        raise ValueError("Unknown format %s, one of: %s" % (fmt, ', '.join(FORMATS)))
+    os.makedirs(out_dir, exist_ok=True)
+
+    # a read pair takes about this many bytes in FASTQ or SAM text
+    pair_size = 2 * (2 * READ_LENGTH + 40)
+    pairs_per_group = max(parse_size(size) // pair_size // read_group_count, 1)
+
+    experiment = {
+        'submitter_sequencing_experiment_id': 'SYNTH_EXP',
+        'sequencing_center': 'EXT',
+        'platform': 'ILLUMINA',
+        'platform_model': 'HiSeq 2000',
+        'experimental_strategy': 'WGS',
+        'sequencing_date': '2014-12-12'
+    }
+
+    read_groups = []
+    files = []
+    for i in range(read_group_count):
+        rg = {
+            'submitter_read_group_id': 'SYNTH.%d' % (i + 1),
+            'read_group_id_in_bam': None,
+            'platform_unit': 'SYNTH_%d' % (i + 1),
+            'is_paired_end': True,
+            'file_r1': None,
+            'file_r2': None,
+            'read_length_r1': READ_LENGTH,
+            'read_length_r2': READ_LENGTH,
+            'insert_size': INSERT_SIZE,
+            'sample_barcode': None,
+            'library_name': 'SYNTH_LIB'
+        }
+        if fmt == 'bam':
+            rg['read_group_id_in_bam'] = 'RG%d' % (i + 1)
+            rg['file_r1'] = rg['file_r2'] = 'synthetic.bam'
+        else:
+            ext = 'fq.gz' if fmt == 'fastq.gz' else 'fq.bz2'
+            rg['file_r1'] = '%s_r1.%s' % (rg['submitter_read_group_id'], ext)
+            rg['file_r2'] = '%s_r2.%s' % (rg['submitter_read_group_id'], ext)
+            r1, r2 = os.path.join(out_dir, rg['file_r1']), os.path.join(out_dir, rg['file_r2'])
+            write_fastq_pair(r1, r2, pairs_per_group, rg['submitter_read_group_id'], fmt, threads)
+            files += [file_entry(r1, 'FASTQ'), file_entry(r2, 'FASTQ')]
+        read_groups.append(rg)
+
+    if fmt == 'bam':
+        bam = os.path.join(out_dir, 'synthetic.bam')
+        write_bam(bam, read_groups, pairs_per_group, experiment, threads)
+        files.append(file_entry(bam, 'BAM'))
+
+    metadata = {
+        'analysisType': {'name': 'sequencing_experiment'},
+        'studyId': 'TEST-PR',
+        'experiment': experiment,
+        'read_group_count': read_group_count,
+        'read_groups': read_groups,
+        'samples': [{
+            'submitterSampleId': SAMPLE,
+            'matchedNormalSubmitterSampleId': None,
+            'sampleType': 'Total DNA',
+            'specimen': {
+                'submitterSpecimenId': SAMPLE,
+                'tumourNormalDesignation': 'Normal',
+                'specimenTissueSource': 'Blood derived',
+                'specimenType': 'Normal'
+            },
+            'donor': {'submitterDonorId': 'SYNTH01', 'gender': 'Female'}
+        }],
+        'files': files
+    }
+
+    metadata_file = os.path.join(out_dir, 'sequencing_experiment.json')
+    with open(metadata_file, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return metadata_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('out_dir', help='directory to write the submission into')
+    parser.add_argument('-f', '--format', default='fastq.gz', choices=FORMATS, help='format of data files')
+    parser.add_argument('-s', '--size', default='1M', help='size of reads, eg, 1M, 1G, 20G')
+    parser.add_argument('-g', '--read_groups', type=int, default=3, help='number of read groups')
+    parser.add_argument('-t', '--threads', type=int, default=1, help='threads for compression')
+    args = parser.parse_args()
+
+    print(generate_submission(args.out_dir, args.format, args.size, args.read_groups, args.threads))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Copyright (c) 2020, Ontario Institute for Cancer Research (OICR).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+    Authors:
+        Junjun Zhang <junjun.zhang@oicr.on.ca>
+"""
+
+
+import zlib
+import struct
+import threading
+import subprocess
+from seq_tools.metrics import record_bytes_read, record_subprocess
+from seq_tools.trace import span
+
+
+class BamHeader(object):
+    """
+    Parsed SAM/BAM header. @HD is kept as a dict, @SQ, @RG and @PG lines are kept as
+    lists of dicts (tag: value) in the order they appear in the header, @CO as a list
+    of strings. When a tag appears more than once in a line, the first one is kept.
+    """
+
+    def __init__(self, text):
+        self._text = text
+        self._hd = {}
+        self._sq = []
+        self._rg = []
+        self._pg = []
+        self._co = []
+
+        for line in text.rstrip().split('\n'):
+            if line.startswith('@CO\t'):
+                self._co.append(line[4:])
+                continue
+
+            fields = line.rstrip().split('\t')
+            record = {}
+            for kv in fields[1:]:
+                if ':' not in kv:
+                    continue
+                k, v = kv.split(':', 1)
+                record.setdefault(k, v)
+
+            if fields[0] == '@HD':
+                self._hd = record
+            elif fields[0] == '@SQ':
+                self._sq.append(record)
+            elif fields[0] == '@RG':
+                self._rg.append(record)
+            elif fields[0] == '@PG':
+                self._pg.append(record)
+
+    @property
+    def text(self):
+        return self._text
+
+    @property
+    def hd(self):
+        return self._hd
+
+    @property
+    def sq(self):
+        return self._sq
+
+    @property
+    def rg(self):
+        return self._rg
+
+    @property
+    def pg(self):
+        return self._pg
+
+    @property
+    def co(self):
+        return self._co
+
+
+class BgzfReader(object):
+    """
+    Minimal reader of BGZF compressed files, decompresses one block at a time and only
+    as many blocks as needed to satisfy the reads, so reading a BAM header never touches
+    the alignment records.
+    """
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self._buffer = bytearray()
+        self._offset = 0  # position in the buffer of the next byte to read
+
+    def _read_block(self):
+        header = self._fileobj.read(12)
+        if not header:
+            return False
+        if len(header) < 12 or header[:4] != b'\x1f\x8b\x08\x04':
+            raise ValueError("Not a BGZF block")
+
+        xlen = struct.unpack('<H', header[10:12])[0]
+        extra = self._fileobj.read(xlen)
+
+        bsize = None
+        i = 0
+        while i + 4 <= len(extra):  # look for the 'BC' subfield carrying the block size
+            si1, si2, slen = extra[i], extra[i + 1], struct.unpack('<H', extra[i + 2:i + 4])[0]
+            if si1 == 66 and si2 == 67 and slen == 2:
+                bsize = struct.unpack('<H', extra[i + 4:i + 6])[0]
+                break
+            i += 4 + slen
+        if bsize is None:
+            raise ValueError("Not a BGZF block, missing BC subfield")
+
+        cdata = self._fileobj.read(bsize - xlen - 19)
+        crc, isize = struct.unpack('<II', self._fileobj.read(8))
+        record_bytes_read(bsize + 1)
+
+        data = zlib.decompress(cdata, -15)
+        if len(data) != isize or zlib.crc32(data) != crc:
+            raise ValueError("Corrupted BGZF block")
+
+        del self._buffer[:self._offset]  # drop what has been read already
+        self._offset = 0
+        self._buffer += data
+        return True
+
+    def read(self, size):
+        while len(self._buffer) - self._offset < size:
+            if not self._read_block():
+                raise EOFError("Unexpected end of BGZF file")
+
+        data = bytes(self._buffer[self._offset:self._offset + size])
+        self._offset += size
+        return data
+
+
+def read_bam_header(bam_file):
+    """
+    Decode the header of a BAM file in process, returns header text and the list of
+    references (name, length) from the binary part of the header.
+    """
+    with span('read_bam_header', 'io', file=bam_file) as attrs, open(bam_file, 'rb') as f:
+        reader = BgzfReader(f)
+
+        if reader.read(4) != b'BAM\x01':
+            raise ValueError("Not a BAM file: %s" % bam_file)
+
+        l_text = struct.unpack('<i', reader.read(4))[0]
+        text = reader.read(l_text).split(b'\0', 1)[0].decode('utf-8')
+
+        n_ref = struct.unpack('<i', reader.read(4))[0]
+        references = []
+        for _ in range(n_ref):
+            l_name = struct.unpack('<I', reader.read(4))[0]
+            name = reader.read(l_name).rstrip(b'\0').decode('utf-8')
+            l_ref = struct.unpack('<I', reader.read(4))[0]
+            references.append((name, l_ref))
+
+        attrs['bytes'] = f.tell()
+
+    return text, references
+
+
+def read_bam_header_text(bam_file, use_samtools=False):
+    if not use_samtools:
+        try:
+            text, references = read_bam_header(bam_file)
+        except (ValueError, EOFError, struct.error, zlib.error, UnicodeDecodeError):
+            pass  # not a BAM we can decode, let samtools have a try
+        else:
+            if references and '@SQ\t' not in text:  # same as samtools, @SQ lines from binary header
+                text += ''.join(['@SQ\tSN:%s\tLN:%s\n' % r for r in references])
+            return text
+
+    record_subprocess()
+    with span('samtools', 'subprocess', cmd='samtools view -H %s' % bam_file):
+        header = subprocess.check_output(
+            ['samtools', 'view', '-H', bam_file],
+            stderr=subprocess.PIPE
+        )
+    record_bytes_read(len(header))
+    return header.decode('utf-8')
+
+
+class BamHeaderCache(object):
+    """
+    Per validation run cache of parsed BAM headers, so that every BAM header is read
+    only once no matter how many checkers look at it. Safe to use from concurrently
+    running checkers, a header being read by one checker is waited for by the others.
+    Failures are not cached, the exception is raised to every caller.
+    """
+
+    def __init__(self):
+        self._headers = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, bam_file) -> BamHeader:
+        with self._lock:
+            if bam_file in self._headers:
+                return self._headers[bam_file]
+            lock = self._locks.setdefault(bam_file, threading.Lock())
+
+        with lock:
+            if bam_file not in self._headers:
+                self._headers[bam_file] = BamHeader(read_bam_header_text(bam_file))
+
+            return self._headers[bam_file]
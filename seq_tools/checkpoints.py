@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Copyright (c) 2020, Ontario Institute for Cancer Research (OICR).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+    Authors:
+        Junjun Zhang <junjun.zhang@oicr.on.ca>
+"""
+
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections.abc import Mapping, Sequence
+from seq_tools import __version__ as ver
+
+
+# only conclusive results are checkpointed, checks ended in UNKNOWN (eg, an exception)
+# or SKIPPED (depends on command line options) are run again
+CHECKPOINT_STATUSES = ('PASS', 'INVALID', 'WARNING')
+
+# command line options (keys of ctx.obj) changing what checks compute, eg, sampled or full
+# scan of BAMs in c680, md5 from the cache or verified in c683, bundled or downloaded schema
+# in c120, results saved with other options are not reused
+RESULT_OPTIONS = ('FULL_SCAN', 'MD5_CACHE', 'OFFLINE')
+
+# the checkpoint file is written at most this often (in seconds) as checks complete,
+# quick metadata checks complete many at a time, see CheckpointStore.flush
+SAVE_INTERVAL = 1.0
+
+# steps in paths of metadata reads, besides dict keys: any element of a list, length of
+# a list, and type of a value, for dicts and lists whose content is read separately
+ANY = '*'
+LENGTH = '#'
+TYPE = '~'
+
+
+class TrackedDict(Mapping):
+    """
+    Read-only view of a metadata dict recording the paths of what is read from it
+    into 'reads'. Nested dicts and lists are handed out as tracked views too, list
+    elements share the path step ANY. Reads not narrowed to a key, eg, iterating over
+    the dict, record the path of the dict itself, ie, the whole of it.
+    """
+
+    def __init__(self, data, path, reads):
+        self._data = data
+        self._path = path
+        self._reads = reads
+
+    def _read(self, key):
+        value = self._data.get(key)
+        if isinstance(value, (dict, list)):  # its content is recorded as it is read
+            self._reads.add(self._path + (key, TYPE))
+        else:
+            self._reads.add(self._path + (key,))
+        return track(value, self._path + (key,), self._reads)
+
+    def __getitem__(self, key):
+        value = self._read(key)
+        if key not in self._data:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        value = self._read(key)
+        return value if key in self._data else default
+
+    def __contains__(self, key):
+        self._reads.add(self._path + (key, TYPE))
+        return key in self._data
+
+    def __iter__(self):
+        self._reads.add(self._path)
+        return iter(self._data)
+
+    def __len__(self):
+        self._reads.add(self._path)
+        return len(self._data)
+
+
+class TrackedList(Sequence):
+    """Read-only view of a metadata list, see TrackedDict"""
+
+    def __init__(self, data, path, reads):
+        self._data = data
+        self._path = path
+        self._reads = reads
+
+    def __getitem__(self, index):
+        self._reads.add(self._path + (LENGTH,))
+        if isinstance(index, slice):
+            return [track(v, self._path + (ANY,), self._reads) for v in self._data[index]]
+        return track(self._data[index], self._path + (ANY,), self._reads)
+
+    def __iter__(self):
+        self._reads.add(self._path + (LENGTH,))
+        for v in self._data:
+            yield track(v, self._path + (ANY,), self._reads)
+
+    def __len__(self):
+        self._reads.add(self._path + (LENGTH,))
+        return len(self._data)
+
+    def __contains__(self, value):
+        self._reads.add(self._path)
+        return value in self._data
+
+    def copy(self):
+        return list(self)
+
+
+def track(value, path, reads):
+    if isinstance(value, dict):
+        return TrackedDict(value, path, reads)
+    elif isinstance(value, list):
+        return TrackedList(value, path, reads)
+    return value
+
+
+def values_at(value, path):
+    # what is found at a recorded path of reads, all elements for ANY steps
+    for i, step in enumerate(path):
+        if step == ANY:
+            if not isinstance(value, list):
+                return ['<not a list>']
+            return [values_at(v, path[i + 1:]) for v in value]
+        elif step == LENGTH:
+            return len(value) if isinstance(value, list) else ['<not a list>']
+        elif step == TYPE:
+            return type(value).__name__
+        elif isinstance(value, dict) and step in value:
+            value = value[step]
+        else:
+            return ['<missing>']
+    return value
+
+
+def inputs_digest(metadata, path):
+    content = json.dumps(values_at(metadata, path), sort_keys=True, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def file_fingerprints(data_dir, data_files) -> list:
+    fingerprints = []
+    for f in sorted(data_files):
+        try:
+            st = os.stat(os.path.join(data_dir, f))
+            fingerprints.append([f, st.st_size, st.st_mtime_ns])
+        except OSError:  # not accessible, which is reported by checks
+            fingerprints.append([f, None, None])
+    return fingerprints
+
+
+class CheckpointStore(object):
+    """
+    Results (status and message) of checks of a metadata file, with what each of them
+    read: digests of the metadata parts it read, fingerprints (size and modification
+    time) of data files if it looked at data files, the status of the checks it depends
+    on, and the command line options in RESULT_OPTIONS it ran with. Results are saved
+    as checks complete, so that a validation dying partway through can be resumed, and
+    when the metadata is fixed only checks that read the changed parts need to run again. The file is written at most every
+    SAVE_INTERVAL seconds, 'flush' writes what is left once checks are done.
+    """
+
+    def __init__(self, checkpoint_dir, metadata_file, data_dir, metadata, data_files, resume=False, options=None):
+        key = hashlib.sha256(json.dumps([metadata_file, data_dir]).encode('utf-8')).hexdigest()
+        self._file = os.path.join(checkpoint_dir, '%s.json' % key)
+        self._metadata = metadata
+        self._data_files = file_fingerprints(data_dir, data_files) if data_dir else []
+        self._options = {k: (options or {}).get(k) for k in RESULT_OPTIONS}
+        self._digests = {}  # {path: digest}, checks often read the same parts of the metadata
+        self._lock = threading.Lock()
+        self._saved_at = time.monotonic()
+        self._unsaved = False
+        self.resume = resume
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+        self._results = {}
+        try:
+            with open(self._file) as f:
+                self._results = json.load(f)
+        except (OSError, ValueError):  # no checkpoint yet, or a broken one
+            pass
+
+    def _is_current(self, result, checker) -> bool:
+        if result.get('version') != ver or result.get('depends') != checker.dependency_statuses():
+            return False
+        if result.get('options') != self._options:
+            return False
+        if result.get('data_files') is not None and result['data_files'] != self._data_files:
+            return False
+        for path, digest in result.get('inputs', []):
+            if self._digest(tuple(path)) != digest:
+                return False
+        return True
+
+    def _digest(self, path):
+        digest = self._digests.get(path)
+        if digest is None:
+            digest = self._digests[path] = inputs_digest(self._metadata, path)
+        return digest
+
+    def restore(self, checker) -> bool:
+        # set status and message from the saved result if none of its inputs changed
+        result = self._results.get(checker.checker)
+        if not result or not self._is_current(result, checker):
+            return False
+
+        checker.status = result['status']
+        checker.message = result['message']
+        return True
+
+    def save(self, checker):
+        if checker.status not in CHECKPOINT_STATUSES:
+            return
+
+        result = {
+            'version': ver,
+            'status': checker.status,
+            'message': checker.message,
+            'depends': checker.dependency_statuses(),
+            'options': self._options,
+            'data_files': self._data_files if checker.reads_data else None,
+            'inputs': [[list(path), self._digest(path)]
+                       for path in sorted(checker.metadata_reads, key=str)]
+        }
+
+        with self._lock:
+            self._results[checker.checker] = result
+            self._unsaved = True
+            if time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+                self._write()
+
+    def flush(self):
+        with self._lock:
+            if self._unsaved:
+                self._write()
+
+    def _write(self):
+        # with self._lock held
+        tmp_file = '%s.%s.tmp' % (self._file, os.getpid())
+        with open(tmp_file, 'w') as f:
+            json.dump(self._results, f)
+        os.replace(tmp_file, self._file)  # atomic, a checkpoint is never half written
+        self._saved_at = time.monotonic()
+        self._unsaved = False
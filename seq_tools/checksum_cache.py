@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Copyright (c) 2020, Ontario Institute for Cancer Research (OICR).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+    Authors:
+        Junjun Zhang <junjun.zhang@oicr.on.ca>
+"""
+
+
+import os
+import time
+import sqlite3
+import threading
+from seq_tools.utils import default_cache_dir
+
+
+class ChecksumCache(object):
+    """
+    On-disk cache of file checksums in SQLite, so that unchanged files do not need to
+    be hashed again in later validation runs. An entry is only used when the file still
+    has the same fingerprint: real path, device, inode, size and modification time.
+    Entries not used for 'max_age_days' are evicted when the cache is opened. Safe to
+    use from multiple threads, and from multiple processes through SQLite locking.
+    """
+
+    def __init__(self, cache_dir=None, verify=False, max_age_days=90):
+        cache_dir = cache_dir or default_cache_dir()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.verify = verify  # when set, cached checksums are calculated again and compared
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(cache_dir, 'checksums.sqlite'), timeout=30, check_same_thread=False)
+
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS md5 ("
+                "path TEXT PRIMARY KEY, dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, "
+                "md5 TEXT, last_used REAL)"
+            )
+            self._db.execute("DELETE FROM md5 WHERE last_used < ?", (time.time() - max_age_days * 86400,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def fingerprint(file_path):
+        path = os.path.realpath(file_path)
+        st = os.stat(path)
+        return path, st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+    def get(self, fingerprint):
+        path, dev, ino, size, mtime_ns = fingerprint
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT md5 FROM md5 WHERE path = ? AND dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+                (path, dev, ino, size, mtime_ns)
+            ).fetchone()
+            if row:
+                self._db.execute("UPDATE md5 SET last_used = ? WHERE path = ?", (time.time(), path))
+
+        return row[0] if row else None
+
+    def put(self, fingerprint, md5):
+        # fingerprint should be taken before hashing, so that a file modified meanwhile
+        # does not get cached. An entry of the same path with a different fingerprint
+        # is stale, it gets replaced
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO md5 VALUES (?, ?, ?, ?, ?, ?, ?)",
+                tuple(fingerprint) + (md5, time.time())
+            )
@@ -23,9 +23,62 @@ import click
 import json
 from typing import List
 import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from seq_tools import __version__ as ver
 from ..validation import perform_validation
 from ..utils import ntcnow_iso, check_for_update, initialize_log
+from ..metrics import rollup
+from ..openmetrics import write_textfile
+from ..profiling import write_summary
+from ..trace import start as start_trace, save_part as save_trace_part, write as write_trace
+
+
+# ctx.obj of a worker process, set up once by init_worker
+_worker_obj = None
+
+
+def init_worker(obj, log_file):
+    global _worker_obj
+    ctx = click.Context(validate, obj=obj)
+    initialize_log(ctx, os.getcwd(), log_file=log_file)  # log into the same file as the main process
+    if obj.get('TRACE'):
+        start_trace()
+    _worker_obj = ctx.obj
+
+
+def validate_in_worker(metafile, data_dir, threads, skip_checks, workers):
+    # each metadata file gets its own context, hence its own validation report
+    ctx = click.Context(validate, obj=dict(_worker_obj))
+    with ctx:
+        perform_validation(ctx, metadata_file=metafile, data_dir=data_dir, threads=threads,
+                           skip_checks=skip_checks, workers=workers)
+
+    if ctx.obj.get('TRACE'):  # merged into the trace file by the main process
+        save_trace_part(ctx.obj['TRACE'])
+
+    return ctx.obj['validation_report']
+
+
+def validate_in_process(ctx, metadata_files, data_dir, threads, skip_checks, workers):
+    for i, metafile in enumerate(metadata_files):
+        perform_validation(ctx, metadata_file=metafile, data_dir=data_dir, threads=threads,
+                           skip_checks=skip_checks, workers=workers)
+
+        yield i, metafile, ctx.obj['validation_report']
+
+
+def validate_in_processes(ctx, metadata_files, data_dir, threads, skip_checks, workers, jobs, log_file):
+    # logger can not be shared with worker processes, they set up their own
+    obj = {k: v for k, v in ctx.obj.items() if k != 'LOGGER'}
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(obj, log_file)) as executor:
+        futures = {}
+        for i, metafile in enumerate(metadata_files):
+            futures[executor.submit(
+                validate_in_worker, metafile, data_dir, threads, skip_checks, workers)] = i, metafile
+
+        for future in as_completed(futures):  # report progress as each metadata file finishes
+            yield futures[future] + (future.result(),)
 
 
 def print_version(ctx, param, value):
@@ -40,14 +93,17 @@ def print_version(ctx, param, value):
               help='Show debug information in STDERR.')
 @click.option('--ignore-update', '-i', is_flag=True, default=False,
               help='Keep using the current version of seq-tools, ignore available update.')
+@click.option('--offline', is_flag=True, default=False, envvar='SEQ_TOOLS_OFFLINE',
+              help='Do not access the Internet, use the last cached update lookup and metadata schema.')
 @click.option('--version', '-v', is_flag=True, callback=print_version,
               expose_value=False, is_eager=True,
               help='Show seq-tools version.')
 @click.pass_context
-def main(ctx, debug, ignore_update):
+def main(ctx, debug, ignore_update, offline):
     # initializing ctx.obj
     ctx.obj = {}
     ctx.obj['DEBUG'] = debug
+    ctx.obj['OFFLINE'] = offline
 
     check_for_update(ctx, ignore_update)
 
@@ -58,11 +114,38 @@ def main(ctx, debug, ignore_update):
               help='path containing submission data files')
 @click.option('--skip_checks','-k', multiple=True,default=[], help='skip this tests',type=click.Choice(['c681','c683','c680','c670','c609','c608','c650']))
 @click.option('--threads','-t', default=1, help='threads and cores to run commands')
+@click.option('--workers', '-w', default=1, type=click.IntRange(min=1),
+              help='number of independent validation checks to run concurrently, eg, 4 for checks on '
+                   'large data files, default is one at a time')
+@click.option('--jobs', '-j', default=1, type=click.IntRange(min=1),
+              help='number of metadata files to validate in parallel, each in its own worker process')
+@click.option('--full_scan', '-f', is_flag=True, default=False,
+              help='check repeated read names in all reads of BAMs instead of a sample of the first 500,000')
+@click.option('--md5_cache', '-m', default='on', type=click.Choice(['on', 'off', 'verify']),
+              help='use cached md5 of files with unchanged path, inode, size and modification time (on), '
+                   'do not use the cache (off), or calculate md5 again and compare with the cache (verify)')
+@click.option('--resume', '-r', is_flag=True, default=False,
+              help='save results of checks under logs/checkpoints and reuse them from the last validation '
+                   'with -r of the same metadata file, only checks whose metadata fields or data files '
+                   'changed are run again')
+@click.option('--metrics', is_flag=True, default=False,
+              help='report time, CPU, bytes read, subprocesses and peak memory of each check, '
+                   'with totals in the summary')
+@click.option('--profile', type=click.Path(file_okay=False),
+              help='profile each check into a pstats file under this directory, with a summary of '
+                   'the hottest functions, checks run one at a time')
+@click.option('--trace', type=click.Path(dir_okay=False),
+              help='write a timeline of checks, commands run and files read to this file, '
+                   'in Chrome trace-event format viewable in Perfetto (ui.perfetto.dev)')
+@click.option('--openmetrics', type=click.Path(dir_okay=False),
+              help='write validation throughput to this file in Prometheus text format, '
+                   'eg, for the textfile collector of node_exporter')
 @click.argument('metadata_file', nargs=-1, type=click.Path(exists=True))
 @click.pass_context
 
 
-def validate(ctx, metadata_str, metadata_file, data_dir, skip_checks ,threads):
+def validate(ctx, metadata_str, metadata_file, data_dir, skip_checks ,threads, workers, jobs, full_scan, md5_cache, resume,
+             metrics, profile, trace, openmetrics):
     """
     Perform validation on metadata file(s) or metadata string.
     """
@@ -77,10 +160,23 @@ def validate(ctx, metadata_str, metadata_file, data_dir, skip_checks ,threads):
         click.echo(ctx.get_help())
         ctx.exit()
 
+    ctx.obj['FULL_SCAN'] = full_scan
+    ctx.obj['MD5_CACHE'] = md5_cache
+    ctx.obj['RESUME'] = resume
+    ctx.obj['METRICS'] = metrics  # check metrics in reports
+    ctx.obj['MEASURE'] = metrics or bool(openmetrics)  # check metrics are needed for the export too
+    ctx.obj['TRACE'] = os.path.realpath(trace) if trace else None
+    if trace:
+        start_trace()
+
     initialize_log(ctx, os.getcwd())
     logger = ctx.obj['LOGGER']
     log_file = logger.handlers[0].baseFilename
 
+    # profiles of each run go to a subdirectory named after its log file
+    ctx.obj['PROFILE'] = os.path.join(
+        os.path.realpath(profile), os.path.splitext(os.path.basename(log_file))[0]) if profile else None
+
     if metadata_file:
         summary_report = {
             "summary": {},
@@ -97,12 +193,20 @@ def validate(ctx, metadata_str, metadata_file, data_dir, skip_checks ,threads):
         validation_reports = {}
         click.echo('Start validating %s metadata file(s), current_time: %s. ' % (total, ntcnow_iso()) +
                    'Please be patient, it may take sometime.')
-        for metafile in metadata_file:
-            current += 1
 
-            perform_validation(ctx, metadata_file=metafile, data_dir=data_dir,threads=threads, skip_checks=skip_checks)
+        if jobs > 1 and total > 1:
+            completed_validations = validate_in_processes(
+                ctx, metadata_file, data_dir, threads, skip_checks, workers, jobs, log_file)
+        else:
+            completed_validations = validate_in_process(ctx, metadata_file, data_dir, threads, skip_checks, workers)
 
-            status = ctx.obj['validation_report']['validation']['status']
+        # by position of the metadata file, the same file may be given more than once
+        reports = [None] * total
+        for i, metafile, validation_report in completed_validations:
+            current += 1
+            reports[i] = validation_report
+
+            status = validation_report['validation']['status']
             status_with_stype = status
             if status == 'INVALID':
                 status_with_stype = click.style(status, fg="red")
@@ -117,16 +221,29 @@ def validate(ctx, metadata_str, metadata_file, data_dir, skip_checks ,threads):
                 metafile, status_with_stype, ntcnow_iso(), current, total
             ), err=True)
 
+        # merge in the order metadata files were given, regardless of which finished first
+        for report in reports:
+            status = report['validation']['status']
             if status not in summary_report['summary']:
                 summary_report['summary'][status] = 0
                 validation_reports[status] = []
 
             summary_report['summary'][status] += 1
-            validation_reports[status].append(ctx.obj['validation_report'])
+            validation_reports[status].append(report)
+
+        if metrics:
+            summary_report['metrics'] = rollup(reports)
 
         click.echo('', err=True)
         summary_report['ended_at'] = ntcnow_iso()
 
+        if openmetrics:
+            write_textfile(openmetrics, summary_report, reports)
+            if not metrics:  # only collected for the export, keep reports as they are without --metrics
+                for report in reports:
+                    for c in report['validation']['checks']:
+                        c.pop('metrics', None)
+
         # split report based on validation status
         for status in (
                     'INVALID',
@@ -161,9 +278,28 @@ def validate(ctx, metadata_str, metadata_file, data_dir, skip_checks ,threads):
                 os.symlink(report_file, report_filename)
                 summary_report['reports'].append(report_filename)
 
+        if profile:
+            summary_report['profile'] = write_summary(ctx.obj['PROFILE'])
+        if trace:
+            write_trace(ctx.obj['TRACE'])
+            summary_report['trace'] = ctx.obj['TRACE']
+
         # wait a bit to avoid mixing STDOUT with STDERR in terminal display
         time.sleep(.3)
         click.echo(json.dumps(summary_report))
 
     else:
-        perform_validation(ctx, metadata_str=metadata_str)
+        started_at = ntcnow_iso()
+        perform_validation(ctx, metadata_str=metadata_str, workers=workers)
+        if openmetrics:
+            report = ctx.obj['validation_report']
+            write_textfile(openmetrics, {
+                'summary': {report['validation']['status']: 1},
+                'started_at': started_at,
+                'ended_at': report['ended_at']
+            }, [report])
+        if profile:
+            click.echo("Profile summary: %s" % write_summary(ctx.obj['PROFILE']), err=True)
+        if trace:
+            write_trace(ctx.obj['TRACE'])
+            click.echo("Trace: %s" % ctx.obj['TRACE'], err=True)
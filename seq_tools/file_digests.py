@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Copyright (c) 2020, Ontario Institute for Cancer Research (OICR).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+    Authors:
+        Junjun Zhang <junjun.zhang@oicr.on.ca>
+"""
+
+
+import os
+import threading
+
+
+class FileDigests(object):
+    """
+    Per validation run registry of file md5 checksums, so that a checker already
+    streaming a file, eg, to decompress it, can hash it along the way and others
+    do not need to read the file again. A checker going to hash a file first claims
+    it, others asking for the md5 in the meantime wait for the claimer to finish.
+    """
+
+    def __init__(self):
+        self._md5s = {}
+        self._claims = {}  # file path -> event set once the claimer is done
+        self._lock = threading.Lock()
+
+    def claim(self, file_path) -> bool:
+        # returns True when the caller is to hash the file and then call 'set' or 'release'
+        file_path = os.path.realpath(file_path)
+        with self._lock:
+            if file_path in self._md5s or file_path in self._claims:
+                return False
+            self._claims[file_path] = threading.Event()
+            return True
+
+    def set(self, file_path, md5):
+        file_path = os.path.realpath(file_path)
+        with self._lock:
+            self._md5s[file_path] = md5
+            self._claims.pop(file_path).set()
+
+    def release(self, file_path):
+        # claimer failed to hash the file, whoever asks next does it
+        file_path = os.path.realpath(file_path)
+        with self._lock:
+            self._claims.pop(file_path).set()
+
+    def md5(self, file_path, calculate):
+        """
+        Returns md5 of the file, waits for it if the file is being hashed by a claimer,
+        otherwise calculates it with 'calculate(file_path)'
+        """
+        file_path = os.path.realpath(file_path)
+        while True:
+            with self._lock:
+                if file_path in self._md5s:
+                    return self._md5s[file_path]
+                claim = self._claims.get(file_path)
+                if claim is None:
+                    self._claims[file_path] = threading.Event()
+                    break
+            claim.wait()
+
+        try:
+            md5 = calculate(file_path)
+        except Exception:
+            self.release(file_path)
+            raise
+
+        self.set(file_path, md5)
+        return md5
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Copyright (c) 2020, Ontario Institute for Cancer Research (OICR).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+    Authors:
+        Junjun Zhang <junjun.zhang@oicr.on.ca>
+"""
+
+
+from types import MappingProxyType
+from seq_tools.checkpoints import ANY, LENGTH, TYPE
+
+
+# JSON values other than lists and objects
+PLAIN_TYPES = (str, bool, int, float, type(None))
+
+
+class MetadataIndex(object):
+    """
+    Lookups derived from a metadata document, built once per validation run and
+    shared by all checkers instead of each of them walking 'read_groups' and 'files'
+    again. Built leniently, never failing on malformed metadata: files missing
+    'fileName' are recorded as None in 'file_names', a populated 'files' that is not a
+    list is flagged in 'files_malformed' and has no 'file_names', read groups missing
+    a field the lookups need, or with a value not of the expected type, are listed in
+    'incomplete_read_groups' so that checkers relying on them can tell their result
+    would be incomplete. Checkers report such problems. Read-only, collections are
+    tuples, frozensets and read-only mappings.
+    """
+
+    __slots__ = ('_file_names', '_files_malformed', '_read_group_files', '_bam_files', '_rg_ids_in_bam',
+                 '_submitter_rg_ids_alone', '_incomplete_read_groups')
+
+    # metadata paths each lookup is derived from, see checkpoints.TrackedDict
+    SOURCES = {
+        'file_names': (('files', LENGTH), ('files', ANY, 'fileName')),
+        'files_malformed': (('files', TYPE),),
+        'read_group_files': (('read_groups', LENGTH), ('read_groups', ANY, 'file_r1'),
+                             ('read_groups', ANY, 'file_r2')),
+        'bam_files': (('read_groups', LENGTH), ('read_groups', ANY, 'file_r1')),
+        'rg_ids_in_bam': (('read_groups', LENGTH), ('read_groups', ANY, 'file_r1'),
+                          ('read_groups', ANY, 'read_group_id_in_bam')),
+        'submitter_rg_ids_alone': (('read_groups', LENGTH), ('read_groups', ANY, 'file_r1'),
+                                   ('read_groups', ANY, 'read_group_id_in_bam'),
+                                   ('read_groups', ANY, 'submitter_read_group_id')),
+        'incomplete_read_groups': (('read_groups', LENGTH), ('read_groups', ANY, 'file_r1'),
+                                   ('read_groups', ANY, 'read_group_id_in_bam'),
+                                   ('read_groups', ANY, 'submitter_read_group_id')),
+    }
+
+    def __init__(self, metadata):
+        files = metadata.get('files') if isinstance(metadata, dict) else None
+        read_groups = metadata.get('read_groups') if isinstance(metadata, dict) else None
+        files_malformed = bool(files) and not isinstance(files, list)
+        files = files if isinstance(files, list) else []
+        read_groups = read_groups if isinstance(read_groups, list) else []
+
+        file_names = []
+        for fl in files:
+            name = fl.get('fileName') if isinstance(fl, dict) else None
+            file_names.append(name if name else None)
+
+        read_group_files = set()
+        rg_ids_in_bam = {}
+        submitter_rg_ids_alone = {}
+        incomplete_read_groups = []
+        for i, rg in enumerate(read_groups):
+            if not isinstance(rg, dict):
+                incomplete_read_groups.append(i)
+                continue
+
+            for f in ('file_r1', 'file_r2'):
+                if rg.get(f) and isinstance(rg[f], str):
+                    read_group_files.add(rg[f])
+
+            filename = rg.get('file_r1')
+            if not isinstance(filename, str):
+                incomplete_read_groups.append(i)
+                continue
+            if not filename.endswith('.bam'):
+                continue
+
+            rg_ids_in_bam.setdefault(filename, set())
+            submitter_rg_ids_alone.setdefault(filename, [])
+            # IDs are recorded as they are when plain values, a false or 0 matches none of the
+            # string IDs compared with it, lists and objects make the read group incomplete
+            rg_id_in_bam = rg.get('read_group_id_in_bam')
+            if rg_id_in_bam is None:
+                if 'submitter_read_group_id' in rg and isinstance(rg['submitter_read_group_id'], PLAIN_TYPES):
+                    submitter_rg_ids_alone[filename].append(rg['submitter_read_group_id'])
+                else:
+                    incomplete_read_groups.append(i)
+            elif isinstance(rg_id_in_bam, PLAIN_TYPES):
+                rg_ids_in_bam[filename].add(rg_id_in_bam)
+            else:
+                incomplete_read_groups.append(i)
+
+        object.__setattr__(self, '_file_names', tuple(file_names))
+        object.__setattr__(self, '_files_malformed', files_malformed)
+        object.__setattr__(self, '_read_group_files', frozenset(read_group_files))
+        object.__setattr__(self, '_bam_files', frozenset(rg_ids_in_bam))
+        object.__setattr__(self, '_rg_ids_in_bam', MappingProxyType(
+            {k: frozenset(v) for k, v in rg_ids_in_bam.items()}))
+        object.__setattr__(self, '_submitter_rg_ids_alone', MappingProxyType(
+            {k: tuple(v) for k, v in submitter_rg_ids_alone.items()}))
+        object.__setattr__(self, '_incomplete_read_groups', tuple(incomplete_read_groups))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MetadataIndex is read-only")
+
+    @property
+    def file_names(self):
+        """'fileName' of each entry in 'files', in order, None when not populated"""
+        return self._file_names
+
+    @property
+    def files_malformed(self):
+        """whether 'files' is populated with something other than a list"""
+        return self._files_malformed
+
+    @property
+    def read_group_files(self):
+        """populated 'file_r1' and 'file_r2' of all read groups"""
+        return self._read_group_files
+
+    @property
+    def bam_files(self):
+        """BAMs referred to by 'file_r1' of read groups"""
+        return self._bam_files
+
+    @property
+    def rg_ids_in_bam(self):
+        """{BAM: populated 'read_group_id_in_bam' of its read groups}"""
+        return self._rg_ids_in_bam
+
+    @property
+    def submitter_rg_ids_alone(self):
+        """{BAM: 'submitter_read_group_id' of its read groups with no 'read_group_id_in_bam'}"""
+        return self._submitter_rg_ids_alone
+
+    @property
+    def incomplete_read_groups(self):
+        """
+        positions (from 0) of read groups left out of the BAM lookups: not an object, no
+        string 'file_r1', or of a BAM with a list or an object as 'read_group_id_in_bam',
+        or with none and 'submitter_read_group_id' missing, a list or an object
+        """
+        return self._incomplete_read_groups
+
+
+class TrackedIndex(object):
+    """View of a MetadataIndex recording the metadata paths behind each lookup read into 'reads'"""
+
+    __slots__ = ('_index', '_reads')
+
+    def __init__(self, index, reads):
+        self._index = index
+        self._reads = reads
+
+    def __getattr__(self, name):
+        value = getattr(self._index, name)
+        self._reads.update(MetadataIndex.SOURCES.get(name, ()))
+        return value
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Copyright (c) 2020, Ontario Institute for Cancer Research (OICR).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+    Authors:
+        Junjun Zhang <junjun.zhang@oicr.on.ca>
+"""
+
+
+import traceback
+
+
+# sections of the metadata visited, in this order, with the rule method their items are passed to
+SECTIONS = (('read_groups', 'read_group'), ('files', 'file'))
+
+
+class MetadataRule(object):
+    """
+    A metadata check expressed as the sections it requires and what it makes of each
+    read group and file, so that rules of all metadata checks can be evaluated together
+    in one traversal of the metadata, see 'evaluate'.
+
+    'requires' lists (section, message) pairs, checked in order first: the rule ends
+    INVALID with the message when a section is not populated. Then 'start' is called,
+    items of 'read_groups' and 'files' are passed to 'read_group' and 'file' of rules
+    overriding them, and 'result' is called last. A section looked into but missing
+    from the metadata is an error, unless it is listed in 'optional'. A rule concludes
+    when it sets its status (see 'passed' and 'invalid'), it gets nothing more after
+    that. An exception raised by a rule is kept in 'error', as a traceback, and
+    concludes it too.
+    """
+
+    requires = ()
+    optional = ()  # sections taken as empty when not in the metadata
+
+    def __init__(self, metadata, metadata_index=None, options=None):
+        self.metadata = metadata
+        self.metadata_index = metadata_index
+        self.options = options or {}  # ctx.obj of the validation
+        self.status = None
+        self.message = None
+        self.error = None
+
+    @property
+    def concluded(self):
+        return self.status is not None or self.error is not None
+
+    def passed(self, message):
+        self.status = 'PASS'
+        self.message = message
+
+    def invalid(self, message):
+        self.status = 'INVALID'
+        self.message = message
+
+    def unknown(self, message):
+        self.status = 'UNKNOWN'
+        self.message = message
+
+    def start(self):
+        pass
+
+    def read_group(self, rg):
+        pass
+
+    def file(self, fl):
+        pass
+
+    def result(self):
+        pass
+
+
+def _visits(rule, method):
+    return getattr(type(rule), method) is not getattr(MetadataRule, method)
+
+
+def _call(rule, method):
+    try:
+        getattr(rule, method)()
+    except Exception:
+        rule.error = traceback.format_exc()
+
+
+def evaluate(rules, metadata):
+    """
+    Evaluate 'rules' on 'metadata', walking through each of its sections once for all
+    of them. Rules get the same items in the same order as when evaluated one by one,
+    results are left in their 'status' and 'message', or 'error'
+    """
+    for rule in rules:
+        for section, message in rule.requires:
+            if not metadata.get(section):
+                rule.invalid(message)
+                break
+        if not rule.concluded:
+            _call(rule, 'start')
+
+    for section, method in SECTIONS:
+        visiting = [r for r in rules if not r.concluded and _visits(r, method)]
+        if not visiting:  # sections are only read when a rule looks into them
+            continue
+
+        if section not in metadata:
+            for rule in visiting:
+                if section not in rule.optional:
+                    rule.error = "Section '%s' not found in the metadata" % section
+            continue
+        items = metadata[section]
+
+        hooks = [(rule, getattr(rule, method)) for rule in visiting]
+        try:
+            for item in items:
+                for rule, hook in hooks:
+                    if rule.status is None:  # not concluded, rules with an error are dropped
+                        try:
+                            hook(item)
+                        except Exception:
+                            rule.error = traceback.format_exc()
+                            hooks = [h for h in hooks if h[0] is not rule]
+        except Exception:  # not a list of items
+            error = traceback.format_exc()
+            for rule in visiting:
+                if not rule.concluded:
+                    rule.error = error
+
+    for rule in rules:
+        if not rule.concluded:
+            _call(rule, 'result')
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Copyright (c) 2020, Ontario Institute for Cancer Research (OICR).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+    Authors:
+        Junjun Zhang <junjun.zhang@oicr.on.ca>
+"""
+
+
+import sys
+import time
+import functools
+import threading
+import contextlib
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+_local = threading.local()
+# metrics of checks being measured in this process, see measure
+_measuring = set()
+_measuring_lock = threading.Lock()
+
+
+class CheckMetrics(object):
+    """
+    Resource use of one check: wall time, CPU time of the thread running it and of
+    helper threads it carries its metrics into (see carry), CPU time of the commands
+    (subprocesses) it ran, bytes read from data files and from output of commands it
+    runs, number of commands it runs, and peak RSS of seq-tools and of the largest
+    subprocess so far when the check ended. CPU time of commands and RSS are only known
+    per process: CPU time of commands is None when other checks ran at the same time,
+    RSS can not be told apart per check then.
+    """
+
+    __slots__ = ('wall_s', 'cpu_s', 'child_cpu_s', 'bytes_read', 'subprocesses', 'peak_rss_mb',
+                 'peak_child_rss_mb', '_overlapped', '_lock')
+
+    def __init__(self):
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.child_cpu_s = None
+        self.bytes_read = 0
+        self.subprocesses = 0
+        self.peak_rss_mb = None
+        self.peak_child_rss_mb = None
+        self._overlapped = False  # with other checks being measured
+        self._lock = threading.Lock()
+
+    def add_cpu(self, seconds):
+        with self._lock:  # may be reported from helper threads of the check
+            self.cpu_s += seconds
+
+    def add_bytes_read(self, size):
+        with self._lock:  # may be reported from helper threads of the check
+            self.bytes_read += size
+
+    def add_subprocess(self):
+        with self._lock:
+            self.subprocesses += 1
+
+    def to_dict(self) -> dict:
+        return {
+            'wall_s': round(self.wall_s, 3),
+            'cpu_s': round(self.cpu_s, 3),
+            'child_cpu_s': round(self.child_cpu_s, 3) if self.child_cpu_s is not None else None,
+            'bytes_read': self.bytes_read,
+            'subprocesses': self.subprocesses,
+            'peak_rss_mb': self.peak_rss_mb,
+            'peak_child_rss_mb': self.peak_child_rss_mb
+        }
+
+
+def current():
+    """Metrics of the check running in this thread, None if there is none"""
+    return getattr(_local, 'metrics', None)
+
+
+@contextlib.contextmanager
+def bind(metrics):
+    previous = current()
+    _local.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _local.metrics = previous
+
+
+def carry(func):
+    """
+    Wrap 'func' to be run in another thread, eg, a helper thread, recording into the
+    caller's metrics, CPU time of the thread included
+    """
+    metrics = current()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with bind(metrics):
+            if metrics is None:
+                return func(*args, **kwargs)
+            cpu_start = time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.add_cpu(time.thread_time() - cpu_start)
+    return wrapper
+
+
+def record_bytes_read(size):
+    metrics = current()
+    if metrics:
+        metrics.add_bytes_read(size)
+
+
+def record_subprocess():
+    metrics = current()
+    if metrics:
+        metrics.add_subprocess()
+
+
+def _children_cpu_s():
+    # CPU time of completed (waited for) subprocesses of this process
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _rss_mb(who):
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(maxrss / 1024 / (1024 if sys.platform == 'darwin' else 1), 1)
+
+
+@contextlib.contextmanager
+def measure(metrics):
+    """Record resource use of what runs in the 'with' block of this thread into 'metrics'"""
+    with bind(metrics):
+        with _measuring_lock:
+            # CPU time of subprocesses is per process, it is not known per check when
+            # checks overlap
+            for m in _measuring:
+                m._overlapped = True
+            metrics._overlapped = metrics._overlapped or bool(_measuring)
+            _measuring.add(metrics)
+
+        start, cpu_start, child_cpu_start = time.perf_counter(), time.thread_time(), _children_cpu_s()
+        try:
+            yield metrics
+        finally:
+            metrics.wall_s += time.perf_counter() - start
+            metrics.add_cpu(time.thread_time() - cpu_start)
+            with _measuring_lock:
+                _measuring.discard(metrics)
+                if metrics._overlapped or child_cpu_start is None:
+                    metrics.child_cpu_s = None
+                else:
+                    metrics.child_cpu_s = (metrics.child_cpu_s or 0.0) + _children_cpu_s() - child_cpu_start
+            metrics.peak_rss_mb = _rss_mb(resource.RUSAGE_SELF) if resource else None
+            metrics.peak_child_rss_mb = _rss_mb(resource.RUSAGE_CHILDREN) if resource else None
+
+
+def rollup(validation_reports) -> dict:
+    """
+    Totals of check metrics of validation reports per checker and overall, checks
+    without metrics, ie, reused from checkpoints, are not counted
+    """
+    def add(total, m):
+        total['checks'] += 1
+        for k in ('wall_s', 'cpu_s'):
+            total[k] = round(total[k] + m[k], 3)
+        for k in ('bytes_read', 'subprocesses'):
+            total[k] += m[k]
+        if m.get('child_cpu_s') is not None:  # of the checks where it is known
+            total['child_cpu_s'] = round((total['child_cpu_s'] or 0.0) + m['child_cpu_s'], 3)
+        for k in ('peak_rss_mb', 'peak_child_rss_mb'):
+            if m.get(k) is not None:
+                total[k] = max(total[k] or 0, m[k])
+
+    def new_total():
+        return {'checks': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'child_cpu_s': None, 'bytes_read': 0,
+                'subprocesses': 0, 'peak_rss_mb': None, 'peak_child_rss_mb': None}
+
+    overall = new_total()
+    checkers = {}
+    for report in validation_reports:
+        for c in report['validation']['checks']:
+            if not c.get('metrics'):
+                continue
+            add(checkers.setdefault(c['checker'], new_total()), c['metrics'])
+            add(overall, c['metrics'])
+
+    overall['checkers'] = {c: checkers[c] for c in sorted(checkers)}
+    return overall
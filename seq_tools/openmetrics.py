@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Copyright (c) 2020, Ontario Institute for Cancer Research (OICR).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+    Authors:
+        Junjun Zhang <junjun.zhang@oicr.on.ca>
+"""
+
+
+import os
+import datetime
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+
+# upper bounds in seconds of check duration histogram buckets
+DURATION_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 1800, 3600, 7200)
+
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    escaped = ('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for k, v in sorted(labels.items()))
+    return '{%s}' % ','.join(escaped)
+
+
+def _value(value):
+    return '%d' % value if float(value).is_integer() else '%s' % round(value, 3)
+
+
+def _seconds_since_epoch(iso_time):
+    # times in reports are as given by utils.ntcnow_iso, eg, 2020-05-01T12:00:00.123Z
+    return datetime.datetime.fromisoformat(iso_time.rstrip('Z')).replace(
+        tzinfo=datetime.timezone.utc).timestamp()
+
+
+def read_textfile(path) -> dict:
+    """Samples written to 'path' by an earlier run, {series: value}, in the order written"""
+    samples = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                series, _, value = line.rpartition(' ')
+                try:
+                    samples[series] = float(value)
+                except ValueError:  # not written by seq-tools
+                    continue
+    except OSError:  # no earlier run
+        pass
+    return samples
+
+
+def format_metrics(summary_report, validation_reports, previous=None) -> str:
+    """
+    Validation throughput in Prometheus text format, as read by node_exporter's
+    textfile collector: metadata files per validation status, checks per checker
+    and status, data files validated, and per checker duration histograms and bytes
+    read taken from check metrics (see seq_tools.metrics). Counters and histograms
+    add up all runs, ie, the samples of this run are added to 'previous', as read by
+    read_textfile, gauges are of this run.
+    """
+    previous = previous or {}
+    lines = []
+
+    def family(name, metric_type, help_text, samples):
+        # samples: [(series, value)], series being the metric name with its labels
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s %s' % (name, metric_type))
+        if metric_type == 'gauge':
+            lines.extend('%s %s' % (series, _value(value)) for series, value in samples)
+            return
+
+        names = (name + '_bucket', name + '_sum', name + '_count') if metric_type == 'histogram' else (name,)
+        written = set()
+        for series, value in samples:
+            lines.append('%s %s' % (series, _value(value + previous.get(series, 0))))
+            written.add(series)
+        for series, value in previous.items():  # eg, checkers not run this time
+            if series not in written and series.split('{', 1)[0] in names:
+                lines.append('%s %s' % (series, _value(value)))
+
+    family('seq_tools_metadata_files_total', 'counter', 'Metadata files validated, by validation status.', [
+        ('seq_tools_metadata_files_total%s' % _labels(status=status), count)
+        for status, count in sorted(summary_report['summary'].items(), key=lambda x: str(x[0]))])
+
+    check_counts = {}
+    durations = {}
+    bytes_read = {}
+    data_files = 0
+    for report in validation_reports:
+        data_files += len(report.get('data_files') or [])
+        for c in report['validation']['checks']:
+            key = (c['checker'], c['status'])
+            check_counts[key] = check_counts.get(key, 0) + 1
+            if c.get('metrics'):  # not there for checks reused from checkpoints
+                durations.setdefault(c['checker'], []).append(c['metrics']['wall_s'])
+                bytes_read[c['checker']] = bytes_read.get(c['checker'], 0) + c['metrics']['bytes_read']
+
+    family('seq_tools_data_files_total', 'counter', 'Data files found along with the validated metadata files.',
+           [('seq_tools_data_files_total', data_files)])
+
+    family('seq_tools_checks_total', 'counter', 'Checks run, by checker and check status.', [
+        ('seq_tools_checks_total%s' % _labels(checker=checker, status=status), count)
+        for (checker, status), count in sorted(check_counts.items(), key=lambda x: (x[0][0], str(x[0][1])))])
+
+    buckets = []
+    for checker in sorted(durations):
+        for bound in DURATION_BUCKETS:
+            buckets.append(('seq_tools_check_duration_seconds_bucket%s' % _labels(checker=checker, le=bound),
+                            sum(1 for d in durations[checker] if d <= bound)))
+        buckets.append(('seq_tools_check_duration_seconds_bucket%s' % _labels(checker=checker, le='+Inf'),
+                        len(durations[checker])))
+        buckets.append(('seq_tools_check_duration_seconds_sum%s' % _labels(checker=checker),
+                        sum(durations[checker])))
+        buckets.append(('seq_tools_check_duration_seconds_count%s' % _labels(checker=checker),
+                        len(durations[checker])))
+    family('seq_tools_check_duration_seconds', 'histogram', 'Wall time of checks, by checker.', buckets)
+
+    family('seq_tools_check_bytes_read_total', 'counter',
+           'Bytes read by checks from data files and output of commands they run, by checker.', [
+               ('seq_tools_check_bytes_read_total%s' % _labels(checker=checker), bytes_read[checker])
+               for checker in sorted(bytes_read)])
+
+    started, ended = (_seconds_since_epoch(summary_report[k]) for k in ('started_at', 'ended_at'))
+    family('seq_tools_validation_duration_seconds', 'gauge', 'Wall time of the last validation run.',
+           [('seq_tools_validation_duration_seconds', ended - started)])
+    family('seq_tools_validation_last_run_timestamp_seconds', 'gauge', 'When the last validation run ended.',
+           [('seq_tools_validation_last_run_timestamp_seconds', ended)])
+
+    return '\n'.join(lines) + '\n'
+
+
+@contextlib.contextmanager
+def _locked(lock_file):
+    if fcntl is None:
+        yield
+        return
+    with open(lock_file, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def write_textfile(path, summary_report, validation_reports):
+    # runs writing to the same file take turns, each adding to what the one before wrote.
+    # Written to a temporary file first then renamed, so a scrape never sees a partial file
+    with _locked('%s.lock' % path):
+        text = format_metrics(summary_report, validation_reports, read_textfile(path))
+        tmp_file = '%s.%s.tmp' % (path, os.getpid())
+        with open(tmp_file, 'w') as f:
+            f.write(text)
+        os.replace(tmp_file, path)
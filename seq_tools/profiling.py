@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Copyright (c) 2020, Ontario Institute for Cancer Research (OICR).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+    Authors:
+        Junjun Zhang <junjun.zhang@oicr.on.ca>
+"""
+
+
+import io
+import os
+import re
+import pstats
+import hashlib
+import cProfile
+from glob import glob
+
+
+PROFILE_TOP = 30  # number of functions listed in the profile summary
+
+
+def profile_file(profile_dir, metadata_file, checker) -> str:
+    """
+    Path of the pstats file of a checker for a metadata file, named after the metadata
+    file with a short hash of its full path, so same named files in different
+    directories do not overwrite each other
+    """
+    if metadata_file:
+        name = '%s.%s' % (os.path.basename(metadata_file),
+                          hashlib.sha1(metadata_file.encode('utf-8')).hexdigest()[:8])
+    else:
+        name = 'metadata_str'
+    return os.path.join(profile_dir, '%s.%s.pstats' % (re.sub(r'[^\w.-]', '_', name), checker))
+
+
+def start_profiler():
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_profiler(profiler, pstats_file):
+    profiler.disable()
+    os.makedirs(os.path.dirname(pstats_file), exist_ok=True)
+    profiler.dump_stats(pstats_file)
+
+
+def write_summary(profile_dir, top=PROFILE_TOP) -> str:
+    """
+    Merge all pstats files under 'profile_dir' into 'summary.txt': total time of each
+    checker, and the 'top' hottest functions by cumulative and by own time
+    """
+    pstats_files = sorted(glob(os.path.join(profile_dir, '*.pstats')))
+    if not pstats_files:
+        return None
+
+    out = io.StringIO()
+    totals = {}
+    for f in pstats_files:
+        checker = f.rsplit('.', 2)[-2]
+        totals[checker] = totals.get(checker, 0) + pstats.Stats(f).total_tt
+
+    out.write("Profiled time per checker, from %s pstats file(s):\n" % len(pstats_files))
+    for checker, seconds in sorted(totals.items(), key=lambda x: -x[1]):
+        out.write("%10.3fs  %s\n" % (seconds, checker))
+    out.write("\n")
+
+    stats = pstats.Stats(*pstats_files, stream=out)
+    for sort_key in ('cumulative', 'tottime'):
+        out.write("Top %s functions of all checkers by %s time:\n" % (top, sort_key))
+        stats.sort_stats(sort_key).print_stats(top)
+
+    summary_file = os.path.join(profile_dir, 'summary.txt')
+    with open(summary_file, 'w') as f:
+        f.write(out.getvalue())
+    return summary_file
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Copyright (c) 2020, Ontario Institute for Cancer Research (OICR).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+    Authors:
+        Junjun Zhang <junjun.zhang@oicr.on.ca>
+"""
+
+
+import os
+import heapq
+import shutil
+import tempfile
+from array import array
+
+
+def _read_run(path, buffer_size):
+    # iterate over hashes of a sorted run spilled to disk, reading 'buffer_size' at a time
+    with open(path, 'rb') as f:
+        while True:
+            hashes = array('q')
+            try:
+                hashes.fromfile(f, buffer_size)
+            except EOFError:  # last, partially filled buffer
+                pass
+            if not hashes:
+                return
+            yield from hashes
+
+
+class DuplicateReadNames(object):
+    """
+    Compact detector of repeated read names. Only a 64-bit hash of every read name is
+    kept, in typed arrays of 8 bytes per read. Hashes are sorted in runs of 'run_size'
+    and the sorted runs merged to find hashes seen more than once. Hashes are only
+    stable within one process, so the names behind the duplicated hashes must be
+    resolved in the same process, see 'resolve_duplicates'.
+
+    With 'spill' sorted runs are written to temporary files and merged from there, so
+    that memory stays bounded by 'run_size' no matter how many reads are added. Spilled
+    runs are merged in passes of at most 'max_open_runs' runs, so the number of open
+    files stays bounded too. At most 'max_duplicates' duplicated hashes are collected,
+    use it as a context manager to clean up the temporary files.
+    """
+
+    def __init__(self, run_size=1000000, spill=False, max_duplicates=None, max_open_runs=64):
+        self._run_size = run_size
+        self._max_open_runs = max(max_open_runs, 2)
+        self._hashes = array('q')
+        self._runs = []  # sorted runs of hashes, arrays or paths of spilled runs
+        self._spilled = 0  # number of run files written, to name the next one
+        self._spill_dir = tempfile.mkdtemp(prefix='seq-tools-') if spill else None
+        self._max_duplicates = max_duplicates
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._spill_dir:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+
+    def add(self, read_name):
+        self._hashes.append(hash(read_name))
+        self.count += 1
+        if len(self._hashes) >= self._run_size:
+            self._sort_run()
+
+    def _sort_run(self):
+        if not self._hashes:
+            return
+
+        run = array('q', sorted(self._hashes))
+        self._hashes = array('q')
+        if self._spill_dir:
+            path = self._run_path()
+            with open(path, 'wb') as f:
+                run.tofile(f)
+            run = path
+        self._runs.append(run)
+
+    def _run_path(self):
+        self._spilled += 1
+        return os.path.join(self._spill_dir, 'run.%s' % self._spilled)
+
+    def _open_runs(self, paths):
+        # buffers shrink as runs add up to keep memory bounded
+        buffer_size = max(1024, self._run_size // max(len(paths), 1))
+        return [_read_run(path, buffer_size) for path in paths]
+
+    def _merge_spilled_runs(self):
+        # merge groups of runs into longer runs until they can all be opened at once
+        while len(self._runs) > self._max_open_runs:
+            runs = []
+            for i in range(0, len(self._runs), self._max_open_runs):
+                group = self._runs[i:i + self._max_open_runs]
+                if len(group) == 1:
+                    runs.append(group[0])
+                    continue
+
+                path = self._run_path()
+                buffer = array('q')
+                with open(path, 'wb') as f:
+                    for h in heapq.merge(*self._open_runs(group)):
+                        buffer.append(h)
+                        if len(buffer) >= 65536:
+                            buffer.tofile(f)
+                            buffer = array('q')
+                    buffer.tofile(f)
+                for merged in group:
+                    os.remove(merged)
+                runs.append(path)
+            self._runs = runs
+
+    def duplicate_hashes(self) -> set:
+        self._sort_run()
+
+        if self._spill_dir:
+            # k-way merge of spilled runs
+            self._merge_spilled_runs()
+            runs = self._open_runs(self._runs)
+        else:
+            runs = self._runs
+
+        duplicates = set()
+        previous = None
+        for h in heapq.merge(*runs):
+            if h == previous:
+                duplicates.add(h)
+                if self._max_duplicates and len(duplicates) >= self._max_duplicates:
+                    break
+            previous = h
+
+        return duplicates
+
+
+def resolve_duplicates(reads, duplicate_hashes, read_group_of) -> dict:
+    """
+    Go through the (read_name, read) pairs again, only reads whose name hash is among
+    'duplicate_hashes' are kept, their read group is extracted by 'read_group_of(read)'.
+    Returns {read_name: {'count': n, 'rg': [read_group, ..]}} for the repeated read
+    names, in the order they first appear. Distinct names sharing a hash show up with
+    count 1, they are dropped.
+    """
+    read_dict = {}
+    for read_name, read in reads:
+        if hash(read_name) not in duplicate_hashes:
+            continue
+
+        read_group = read_group_of(read)
+        if read_name in read_dict:
+            read_dict[read_name]['count'] += 1
+            if read_group not in read_dict[read_name]['rg']:
+                read_dict[read_name]['rg'].append(read_group)
+        else:
+            read_dict[read_name] = {'count': 1, 'rg': [read_group]}
+
+    return {k: v for k, v in read_dict.items() if v['count'] > 1}
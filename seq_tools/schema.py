@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Copyright (c) 2020, Ontario Institute for Cancer Research (OICR).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+    Authors:
+        Junjun Zhang <junjun.zhang@oicr.on.ca>
+"""
+
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from seq_tools.utils import default_cache_dir
+
+
+SCHEMA_URL = 'https://raw.githubusercontent.com/icgc-argo/argo-metadata-schemas/master/schemas/sequencing_experiment.json'
+SCHEMA_CACHE_TTL = 24 * 3600  # seconds before the cached schema is downloaded again
+SCHEMA_FAILURE_TTL = 3600  # seconds before trying again after a failed download
+SCHEMA_TIMEOUT = 10  # seconds to wait for the schema download
+# not the full schema, only the parts seq-tools checks against, eg, read group ID pattern
+FALLBACK_SCHEMA = os.path.join(os.path.dirname(__file__), 'resources', 'sequencing_experiment.fallback.json')
+
+
+class SchemaProvider(object):
+    """
+    Metadata schema, downloaded at most once per process and kept on disk for
+    'ttl' seconds, so validating many metadata files does not download it again
+    for each of them. When the download fails, or in offline mode, the last
+    downloaded copy is used no matter how old it is, failing that the partial
+    fallback schema bundled with seq-tools. A failed download is not tried again
+    for 'failure_ttl' seconds, so hosts without Internet access do not wait for it
+    in every run. Safe to use from concurrently running checkers.
+    """
+
+    def __init__(self, url=SCHEMA_URL, cache_dir=None, ttl=SCHEMA_CACHE_TTL, offline=False,
+                 timeout=SCHEMA_TIMEOUT, failure_ttl=SCHEMA_FAILURE_TTL):
+        self.url = url
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.offline = offline
+        self.timeout = timeout
+        # one file per schema URL, ie, per schema version (branch or tag)
+        self.cache_file = os.path.join(
+            cache_dir or default_cache_dir(), 'schemas',
+            '%s.%s' % (hashlib.sha1(url.encode('utf-8')).hexdigest()[:12], os.path.basename(url))
+        )
+        self._schema = None
+        self._patterns = {}
+        self._lock = threading.Lock()
+
+    def _read_cache(self) -> dict:
+        # {'schema': .., 'downloaded_at': ..} of the last download, and 'failed_at' of
+        # the last failed download since, if any
+        try:
+            with open(self.cache_file) as f:
+                cached = json.load(f)
+            if isinstance(cached, dict):
+                return cached
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _write_cache(self, cached):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_file = '%s.%s.tmp' % (self.cache_file, os.getpid())
+            with open(tmp_file, 'w') as f:
+                json.dump(dict(cached, url=self.url), f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError:  # not being able to cache is no reason to fail
+            pass
+
+    def _should_download(self, cached) -> bool:
+        if self.offline:
+            return False
+        now = time.time()
+        if now - cached.get('failed_at', 0) < self.failure_ttl:
+            return False
+        return cached.get('schema') is None or now - cached.get('downloaded_at', 0) > self.ttl
+
+    def _download(self):
+        try:
+            import requests  # imported only when needed, it is slow to import
+            resp = requests.get(self.url, timeout=self.timeout)
+            if resp.status_code == 200:
+                schema = resp.json()
+                if isinstance(schema, dict):
+                    return schema
+        except Exception:
+            pass
+        return None
+
+    def schema(self) -> dict:
+        with self._lock:
+            if self._schema is None:
+                cached = self._read_cache()
+                schema = cached.get('schema')
+                if self._should_download(cached):
+                    downloaded = self._download()
+                    if downloaded is not None:
+                        self._write_cache({'downloaded_at': time.time(), 'schema': downloaded})
+                        schema = downloaded
+                    else:  # keep the last downloaded schema, if any
+                        self._write_cache(dict(cached, failed_at=time.time()))
+
+                if schema is None:
+                    with open(FALLBACK_SCHEMA) as f:
+                        schema = json.load(f)
+
+                self._schema = schema
+
+            return self._schema
+
+    def pattern(self, *path):
+        """
+        Compiled regex of the 'pattern' found following 'path' under the schema's
+        'properties', eg, pattern('read_groups', 'submitter_read_group_id'). Looked
+        up in the fallback schema when missing from the downloaded one.
+        """
+        if path not in self._patterns:
+            regex = _find_pattern(self.schema(), path)
+            if regex is None:
+                with open(FALLBACK_SCHEMA) as f:
+                    regex = _find_pattern(json.load(f), path)
+            self._patterns[path] = re.compile(regex)
+
+        return self._patterns[path]
+
+
+def _find_pattern(schema, path):
+    try:
+        node = schema['schema']
+        for p in path:
+            node = node['properties'][p]
+            if node.get('type') == 'array' or 'items' in node:
+                node = node['items']
+        return node['pattern']
+    except (KeyError, TypeError):
+        return None
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def schema_provider(offline=False) -> SchemaProvider:
+    """Schema provider shared within the process"""
+    with _providers_lock:
+        if offline not in _providers:
+            _providers[offline] = SchemaProvider(offline=offline)
+        return _providers[offline]
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Copyright (c) 2020, Ontario Institute for Cancer Research (OICR).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+    Authors:
+        Junjun Zhang <junjun.zhang@oicr.on.ca>
+"""
+
+
+import os
+import json
+import time
+import threading
+import contextlib
+from glob import glob, escape
+
+
+_tracer = None  # active tracer of this process, see start
+
+
+class Tracer(object):
+    """
+    Collects spans (Chrome trace-event 'complete' events) of what seq-tools does: checks,
+    commands it runs and files it reads, on the thread doing it. Timestamps are wall
+    clock, so that spans from worker processes line up with those of the main process.
+    """
+
+    def __init__(self):
+        self._events = []
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name, cat, **args):
+        thread = threading.current_thread()
+        start = time.time()
+        try:
+            yield args  # attributes known later, eg, bytes read, can be added to it
+        finally:
+            event = {
+                'name': name, 'cat': cat, 'ph': 'X', 'pid': os.getpid(), 'tid': thread.ident,
+                'ts': int(start * 1e6), 'dur': int((time.time() - start) * 1e6), 'args': args
+            }
+            with self._lock:
+                self._events.append(event)
+                self._threads[(os.getpid(), thread.ident)] = thread.name
+
+    def take_events(self) -> list:
+        """Events collected so far, with names of their threads and process, collected events are cleared"""
+        with self._lock:
+            events, threads = self._events, self._threads
+            self._events, self._threads = [], {}
+
+        pids = set(pid for pid, _ in threads)
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+                     'args': {'name': 'seq-tools %s' % pid}} for pid in pids]
+        metadata += [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                     for (pid, tid), name in threads.items()]
+        return metadata + events
+
+
+def start():
+    global _tracer
+    _tracer = Tracer()
+
+
+def span(name, cat, **args):
+    """Record a span when tracing, eg, 'with span("md5", "io", file=f) as args: args["bytes"] = n'"""
+    if _tracer is None:
+        return contextlib.nullcontext(args)
+    return _tracer.span(name, cat, **args)
+
+
+def save_part(trace_file):
+    """Append events collected in this (worker) process to a part file next to 'trace_file'"""
+    if _tracer is None:
+        return
+    with open('%s.%s.part' % (trace_file, os.getpid()), 'a') as f:
+        for event in _tracer.take_events():
+            f.write('%s\n' % json.dumps(event))
+
+
+def write(trace_file):
+    """Write events of this process, merged with part files of worker processes, as Chrome trace-event JSON"""
+    events = _tracer.take_events() if _tracer else []
+    for part_file in sorted(glob('%s.*.part' % escape(trace_file))):
+        with open(part_file) as f:
+            events += [json.loads(line) for line in f]
+        os.remove(part_file)
+
+    with open(trace_file, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
@@ -25,20 +25,25 @@ import json
 from click import echo
 import logging
 import datetime
-import requests
 import subprocess
 from packaging import version
 from seq_tools import __version__ as current_ver
+import time
 import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from seq_tools.metrics import carry, record_bytes_read, record_subprocess
+from seq_tools.trace import span
 
 
-def initialize_log(ctx, dir):
-    logger = logging.getLogger('seq_tools: %s' % dir)
+def initialize_log(ctx, dir, log_file=None):
+    # when log_file is given, eg, in a worker process, keep logging into that existing file
+    logger = logging.getLogger('seq_tools: %s' % (log_file or dir))
     logFormatter = logging.Formatter("%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s] %(message)s")
 
     logger.setLevel(logging.INFO)
 
-    if dir:
+    if dir and not log_file:
         log_directory = os.path.join(dir, "logs")
         log_file = "%s.log" % re.sub(r'[-:.]', '_', datetime.datetime.utcnow().isoformat())
         ctx.obj['log_file'] = log_file
@@ -47,6 +52,7 @@ def initialize_log(ctx, dir):
         if not os.path.isdir(log_directory):
             os.mkdir(log_directory)
 
+    if log_file:
         fh = logging.FileHandler(log_file)
         fh.setLevel(logging.DEBUG)  # always set fh to debug
         fh.setFormatter(logFormatter)
@@ -88,25 +94,38 @@ def ntcnow_iso() -> str:
     return datetime.datetime.utcnow().isoformat()[:-3] + 'Z'
 
 
-def get_latest_releases():
-    github_url = "https://api.github.com/repos/icgc-argo/seq-tools/releases"
+RELEASES_URL = "https://api.github.com/repos/icgc-argo/seq-tools/releases"
+RELEASES_CACHE_TTL = 24 * 3600  # seconds to reuse a successful release lookup
+RELEASES_FAILURE_TTL = 3600  # seconds before trying again after a failed lookup
+UPDATE_CHECK_DEADLINE = 1  # seconds to wait for the release lookup before going on without it
+UPDATE_CHECK_TIMEOUT = 10  # seconds the lookup itself may take, in the background
 
+
+def default_cache_dir():
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'seq-tools')
+
+
+def fetch_latest_releases(url=RELEASES_URL, timeout=UPDATE_CHECK_TIMEOUT):
+    """
+    Look up latest stable and pre-release on GitHub, returns the releases and a
+    message explaining the problem if the lookup failed, otherwise None
+    """
     latest_releases = {
         'stable': None,
         'prerelease': None
     }
 
     try:
-        res = requests.get(github_url, headers={'Accept': 'application/vnd.github.v3.text-match+json'})
+        import requests  # imported only when needed, it is slow to import
+        res = requests.get(url, headers={'Accept': 'application/vnd.github.v3.text-match+json'}, timeout=timeout)
         json_response = res.json()
     except Exception:
-        echo("INFO: Unable to check for update of 'seq-tools'. Please verify Internet connection.", err=True)
-        return latest_releases
+        return latest_releases, "Please verify Internet connection."
 
     if isinstance(json_response, dict):
         if 'rate limit exceeded' in json.dumps(json_response):
-            echo("INFO: Unable to check for update of 'seq-tools'. Github API rate limit exceeded.", err=True)
-        return latest_releases
+            return latest_releases, "Github API rate limit exceeded."
+        return latest_releases, "Unexpected response from Github API."
 
     for r in json_response:  # releases are ordered in reverse chronological way
         if latest_releases['prerelease'] and latest_releases['stable']:  # already found them
@@ -119,12 +138,79 @@ def get_latest_releases():
             if not latest_releases['stable']:  # get the latest stable release
                 latest_releases['stable'] = r.get('tag_name')
 
-    return latest_releases
+    return latest_releases, None
+
+
+def get_latest_releases(url=RELEASES_URL, offline=False, cache_file=None, deadline=UPDATE_CHECK_DEADLINE,
+                        timeout=UPDATE_CHECK_TIMEOUT):
+    """
+    Latest releases from a local cache while it is fresh, otherwise looked up in a
+    background thread waited for at most 'deadline' seconds, so that a slow or
+    unreachable GitHub never holds up seq-tools for long. The lookup itself may go on
+    for up to 'timeout' seconds in the background. Failed lookups, including those not
+    done by the deadline, are cached too, for a shorter time, so that hosts without
+    Internet access do not wait on every run. In offline mode only the cache is used.
+    """
+    cache_file = cache_file or os.path.join(default_cache_dir(), 'releases.json')
+    cached = None
+    try:
+        with open(cache_file) as f:
+            cached = json.load(f)
+        if cached.get('url') != url:
+            cached = None
+    except (OSError, ValueError):
+        pass
+
+    if cached:
+        ttl = RELEASES_FAILURE_TTL if cached.get('problem') else RELEASES_CACHE_TTL
+        if offline or time.time() - cached['checked_at'] < ttl:
+            return cached['releases']
+
+    if offline:
+        return {'stable': None, 'prerelease': None}
+
+    def save(releases, problem):
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            tmp_file = '%s.%s.%s.tmp' % (cache_file, os.getpid(), threading.get_ident())
+            with open(tmp_file, 'w') as f:
+                json.dump({'url': url, 'checked_at': time.time(), 'releases': releases, 'problem': problem}, f)
+            os.replace(tmp_file, cache_file)
+        except OSError:  # not being able to cache is no reason to fail
+            pass
+
+    def lookup():
+        releases, problem = fetch_latest_releases(url, timeout=timeout)
+        with lock:  # a result coming after the deadline still replaces the cached failure
+            result.update(releases=releases, problem=problem)
+            save(releases, problem)
+
+    # releases last looked up, if any, are kept until a lookup succeeds again
+    stale_releases = cached['releases'] if cached else {'stable': None, 'prerelease': None}
+    result = {}
+    lock = threading.Lock()
+    t = threading.Thread(target=lookup, name='update-check', daemon=True)
+    t.start()
+    t.join(deadline)
+
+    with lock:
+        if not result:
+            # the lookup goes on in the background, but may not finish before seq-tools
+            # exits, remember it as failed so that the next runs do not wait again
+            save(stale_releases, "Lookup not done in %s seconds." % deadline)
+            echo("INFO: Unable to check for update of 'seq-tools' in %s seconds, continue without it." % deadline,
+                 err=True)
+            return stale_releases
+
+    if result['problem']:
+        echo("INFO: Unable to check for update of 'seq-tools'. %s" % result['problem'], err=True)
+
+    return result['releases']
 
 
 def check_for_update(ctx, ignore_update, check_prerelease=False):
     # check for latest releases
-    latest_releases = get_latest_releases()
+    latest_releases = get_latest_releases(offline=ctx.obj.get('OFFLINE', False))
     stable_release = latest_releases.get('stable')
     prerelease = latest_releases.get('prerelease')
 
@@ -155,30 +241,156 @@ def check_for_update(ctx, ignore_update, check_prerelease=False):
 
 
 def run_cmd(cmd):
-    p = subprocess.Popen(
-        [cmd],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        shell=True)
-    stdout, stderr = p.communicate()
+    record_subprocess()
+    with span(cmd.split()[0], 'subprocess', cmd=cmd) as attrs:
+        p = subprocess.Popen(
+            [cmd],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            shell=True)
+        stdout, stderr = p.communicate()
+        attrs['bytes'] = len(stdout) + len(stderr)
+    record_bytes_read(len(stdout) + len(stderr))
 
     return stdout.decode("utf-8"), stderr.decode("utf-8"), p.returncode
 
 
+class LineReader(object):
+    """
+    Iterate over lines (bytes, without the line break) of a binary stream, eg, stdout of
+    a subprocess, reading the stream in large chunks so that memory use stays flat no
+    matter how many lines are read. Line breaks read from the stream are counted.
+    """
+
+    def __init__(self, stream, chunk_size=1024 * 1024):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self.newlines = 0
+
+    def _chunks(self):
+        for chunk in iter(lambda: self._stream.read(self._chunk_size), b''):
+            record_bytes_read(len(chunk))
+            self.newlines += chunk.count(b'\n')
+            yield chunk
+
+    def __iter__(self):
+        remainder = b''
+        for chunk in self._chunks():
+            lines = (remainder + chunk).split(b'\n')
+            remainder = lines.pop()
+            yield from lines
+
+        if remainder:
+            yield remainder
+
+    def drain(self):
+        # read through the rest of the stream, returns total number of line breaks
+        for _ in self._chunks():
+            pass
+        return self.newlines
+
+
+class CommandError(Exception):
+    """A command exited with an error after its whole output was read"""
+
+    def __init__(self, cmd, returncode, stderr):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stderr = stderr
+        super().__init__("'%s' exited with code %s: %s" % (cmd[0], returncode, stderr or 'no error message'))
+
+
+def iter_cmd_lines(cmd, max_lines=None):
+    """
+    Run a command (list of arguments) and iterate over the lines of its output, stops
+    the command once 'max_lines' lines have been read, like piping it to 'head'. Errors
+    of the command are kept apart from its output, CommandError is raised at the end of
+    the output when the command failed, eg, on a truncated file
+    """
+    record_subprocess()
+    with span(cmd[0], 'subprocess', cmd=' '.join(cmd)) as attrs:
+        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # drained along the way so that a full pipe never blocks the command
+        stderr = []
+        stderr_reader = threading.Thread(target=carry(lambda: stderr.append(p.stderr.read())),
+                                         name=threading.current_thread().name + '-stderr')
+        stderr_reader.start()
+
+        reader = LineReader(p.stdout)
+        read_through = False
+        try:
+            for i, line in enumerate(reader):
+                if max_lines is not None and i >= max_lines:
+                    break
+                yield line
+            else:
+                read_through = True
+        finally:
+            attrs['lines'] = reader.newlines
+            p.stdout.close()
+            if p.poll() is None:  # stopped before the end of its output
+                p.terminate()
+            p.wait()
+            stderr_reader.join()
+            p.stderr.close()
+            attrs['returncode'] = p.returncode
+
+    if read_through and p.returncode != 0:
+        raise CommandError(cmd, p.returncode, b''.join(stderr).decode('utf-8', 'replace').strip())
+
+
+def sample_cmd_output(cmd, max_lines, compress_cmd, handle_line) -> int:
+    """
+    Stream the first 'max_lines' lines output by 'cmd' to 'handle_line' and to 'compress_cmd'
+    at the same time, returns size of the compressed sample
+    """
+    record_subprocess()
+    with span(compress_cmd[0], 'subprocess', cmd=' '.join(compress_cmd)) as attrs:
+        compressor = subprocess.Popen(
+            compress_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+        compressed_size = [0]
+
+        def count_compressed():  # keep draining the compressor so that it never blocks on a full pipe
+            for chunk in iter(lambda: compressor.stdout.read(1024 * 1024), b''):
+                compressed_size[0] += len(chunk)
+
+        counter = threading.Thread(target=carry(count_compressed))
+        counter.start()
+
+        try:
+            for line in iter_cmd_lines(cmd, max_lines):
+                compressor.stdin.write(line + b'\n')
+                handle_line(line)
+        finally:
+            compressor.stdin.close()
+            counter.join()
+            compressor.wait()
+            attrs['bytes'] = compressed_size[0]
+
+    return compressed_size[0]
+
+
 def base_estimate(seq_file, logger, checker) -> int:
     reads_to_sample = 20000
 
     if seq_file.endswith('.bam'):
         file_size = os.path.getsize(seq_file)
 
+        def sample_read_lengths(flag, read_lengths):
+            def handle_line(line):
+                if not line.startswith(b'@'):
+                    read_lengths.append(len(line.split(b'\t')[9]))
+
+            cmd = ['samtools', 'view', '-h', '-f', flag, '-F', '0x200', seq_file]
+            return sample_cmd_output(cmd, reads_to_sample, ['samtools', 'view', '-bS', '-'], handle_line)
+
         # guesstimate read length by pull out first 'reads_to_sample' (minus header line count) QC passed reads
         # from each end and check their lengths
         # first end reads
-        cmd = "samtools view -h -f 0x40 -F 0x200 %s | head -%s | tee /dev/stderr | samtools view -bS - | wc -c" \
-            % (seq_file, reads_to_sample)
-        portion_size_r1, reads, returncode = run_cmd(cmd)
+        read_lengths_r1 = []
+        portion_size_r1 = sample_read_lengths('0x40', read_lengths_r1)
 
-        read_lengths_r1 = [len(r.split('\t')[9]) for r in reads.rstrip().split('\n') if not r.startswith('@')]
         average_len_r1 = int(sum(read_lengths_r1) / len(read_lengths_r1))
         logger.info("[%s] Average lenght of reads from first end: %s, from first %s reads in BAM: %s." %
                     (checker, average_len_r1, len(read_lengths_r1), seq_file))
@@ -187,10 +399,8 @@ def base_estimate(seq_file, logger, checker) -> int:
         estimated_read_count = len(read_lengths_r1) * file_size / int(portion_size_r1)
 
         # second end reads QC passed
-        cmd = "samtools view -h -f 0x80 -F 0x200 %s | head -%s | tee /dev/stderr | samtools view -bS - | wc -c" \
-            % (seq_file, reads_to_sample)
-        portion_size_r2, reads, returncode = run_cmd(cmd)
-        read_lengths_r2 = [len(r.split('\t')[9]) for r in reads.rstrip().split('\n') if not r.startswith('@')]
+        read_lengths_r2 = []
+        portion_size_r2 = sample_read_lengths('0x80', read_lengths_r2)
 
         if len(read_lengths_r2):  # paired end sequencing
             average_len_r2 = int(sum(read_lengths_r2) / len(read_lengths_r2))
@@ -214,18 +424,17 @@ def base_estimate(seq_file, logger, checker) -> int:
         else:
             raise Exception("Unspported file format for FASTQ, file: %s" % seq_file)
 
-        cmd = "%s -c %s | head -%s | tee /dev/stderr | %s - | wc -c" % (
-            compression_tool[1], seq_file, 4 * reads_to_sample, compression_tool[0])
-
-        portion_size, reads, ret_code = run_cmd(cmd)
-
-        line_count = 0
         read_lengths = []
-        for line in reads.rstrip().split('\n'):
-            line_count += 1
-            if (line_count + 2) % 4 == 0:
+        line_count = [0]
+
+        def handle_line(line):
+            line_count[0] += 1
+            if (line_count[0] + 2) % 4 == 0:
                 read_lengths.append(len(line))
 
+        portion_size = sample_cmd_output(
+            [compression_tool[1], '-c', seq_file], 4 * reads_to_sample, [compression_tool[0], '-'], handle_line)
+
         average_len = int(sum(read_lengths) / len(read_lengths))
         if len(read_lengths) < reads_to_sample:  # we've got all the reads
             logger.info("[%s] Average lenght of reads: %s, from %s reads in FASTQ: %s." %
@@ -249,9 +458,57 @@ def calculate_size(file_path):
     return os.stat(file_path).st_size
 
 
-def calculate_md5(file_path):
+def calculate_md5(file_path, buffer_size=8 * 1024 * 1024):
+    # read into one reused buffer, memory use stays at 'buffer_size' however large the
+    # file is, unlike mmap whose pages count toward RSS (and cgroup memory limits)
     md5 = hashlib.md5()
-    with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(1024 * 1024), b''):
-            md5.update(chunk)
+    buffer = bytearray(buffer_size)
+    with span('md5', 'io', file=file_path, bytes=0) as attrs, \
+            open(file_path, 'rb', buffering=0) as f, memoryview(buffer) as view:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        for size in iter(lambda: f.readinto(view), 0):
+            md5.update(view[:size])  # hashlib releases the GIL on large updates
+            record_bytes_read(size)
+            attrs['bytes'] += size
+
     return md5.hexdigest()
+
+
+def calculate_md5s(file_paths, threads=1, logger=None, checker=None, cache=None, digests=None) -> dict:
+    """
+    Calculate md5 of files concurrently with up to 'threads' files hashed at a time,
+    returns {file_path: md5}. Hashing speed of each file is logged when logger is given.
+    With a ChecksumCache, unchanged files get their md5 from the cache, or in verify
+    mode are hashed again and compared with the cached md5. With FileDigests, md5 of
+    files already hashed by other checkers in this run are reused.
+    """
+    def log(message):
+        if logger:
+            logger.info("[%s] %s" % (checker, message))
+
+    def md5_of(file_path):
+        cached_md5 = None
+        if cache:
+            fingerprint = cache.fingerprint(file_path)
+            cached_md5 = cache.get(fingerprint)
+            if cached_md5 and not cache.verify:
+                log("MD5 of %s taken from checksum cache" % file_path)
+                return cached_md5
+
+        start = time.time()
+        md5 = digests.md5(file_path, calculate_md5) if digests else calculate_md5(file_path)
+        size = os.path.getsize(file_path) / 1024 / 1024
+        elapsed = max(time.time() - start, 1e-6)
+        log("MD5 of %s: %.1f MB in %.1fs, %.1f MB/s" % (file_path, size, elapsed, size / elapsed))
+
+        if cache:
+            if cached_md5 and cached_md5 != md5:
+                log("MD5 of %s in checksum cache does not match, cache entry replaced" % file_path)
+            cache.put(fingerprint, md5)
+
+        return md5
+
+    file_paths = list(dict.fromkeys(file_paths))  # each file once, in the given order
+    with ThreadPoolExecutor(max_workers=max(int(threads), 1), thread_name_prefix='md5') as executor:
+        return dict(zip(file_paths, executor.map(carry(md5_of), file_paths)))
@@ -21,26 +21,144 @@
 
 import os
 import sys
+import ast
 import json
+import threading
+import importlib.util
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from click import echo
 from seq_tools import __version__ as ver
 from ..utils import find_files, ntcnow_iso
+from ..bam_header import BamHeaderCache
+from ..file_digests import FileDigests
+from ..checkpoints import CheckpointStore
+from ..metadata_index import MetadataIndex
+from ..trace import span
 
 
-path = list(sys.path)
-sys.path.insert(0, os.path.dirname(__file__))
-moduleFiles = sorted(find_files(os.path.dirname(__file__), r'^c[0-9]+_.*?\.py$'))
-checkers = {}
-try:
-    # load checker modules
-    for m in moduleFiles:
-        moduleName = os.path.splitext(m)[0]
-        checkers[moduleName] = __import__(moduleName)
-finally:
-    sys.path[:] = path
+_checker_dir = os.path.dirname(__file__)
+_registry = None
+_import_lock = threading.Lock()
 
+# what a checker declares, read from its source: names of the checkers it depends on,
+# and whether its check is a metadata rule (see base_checker.RuleChecker)
+CheckerInfo = namedtuple('CheckerInfo', ['depends_on', 'rule'])
 
-def perform_validation(ctx, metadata_file=None, data_dir=None, metadata_str=None,threads=None,skip_checks=None):
+
+def declared_dependencies(tree):
+    """
+    Read 'depends_on' passed to BaseChecker.__init__ from the parsed checker source
+    without importing it, returns None when it is not a literal list
+    """
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == '__init__':
+            for kw in node.keywords:
+                if kw.arg == 'depends_on':
+                    try:
+                        return list(ast.literal_eval(kw.value))
+                    except ValueError:
+                        return None
+            return []
+
+    return None
+
+
+def declares_rule(tree) -> bool:
+    """Whether class 'Checker' of the parsed checker source sets 'rule'"""
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == 'Checker':
+            for stmt in node.body:
+                if isinstance(stmt, ast.Assign) and any(isinstance(t, ast.Name) and t.id == 'rule'
+                                                        for t in stmt.targets):
+                    return not (isinstance(stmt.value, ast.Constant) and stmt.value.value is None)
+    return False
+
+
+def checker_registry() -> dict:
+    """
+    Checkers found in this directory, in checker order: {name: CheckerInfo}. Checker
+    modules are not imported here, see load_checker.
+    """
+    global _registry
+    if _registry is None:
+        registry = {}
+        for m in sorted(find_files(_checker_dir, r'^c[0-9]+_.*?\.py$')):
+            source_file = os.path.join(_checker_dir, m)
+            with open(source_file) as f:
+                tree = ast.parse(f.read(), source_file)
+
+            depends_on = declared_dependencies(tree)
+            if depends_on is None:  # unknown, depend on all checkers before it to be safe
+                depends_on = list(registry)
+            registry[os.path.splitext(m)[0]] = CheckerInfo(depends_on, declares_rule(tree))
+        _registry = registry
+
+    return _registry
+
+
+def _import(name):
+    module = sys.modules.get(name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(_checker_dir, '%s.py' % name))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module  # checkers import 'base_checker' as a top level module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[name]
+            raise
+    return module
+
+
+def load_checker(name):
+    """Import a checker module, on first use only"""
+    with _import_lock:
+        _import('base_checker')
+        return _import(name)
+
+
+def run_checkers(depends_on, run_checker, workers=1):
+    """
+    Run checkers as a DAG built from their 'depends_on' declarations. 'run_checker(name)'
+    is submitted to the thread pool as soon as all checkers it depends on have completed,
+    so independent checkers (eg, c608, c609 and c683) run concurrently.
+    Dependencies not among the checkers to run are ignored here, they are reported by
+    the checker itself.
+    """
+    pending = {}
+    for c, deps in depends_on.items():
+        pending[c] = set(d for d in deps if d in depends_on and d != c)
+
+    completed = set()
+    if (workers or 1) <= 1:  # one at a time in this thread, a thread pool only adds overhead
+        while pending:
+            ready = [c for c in pending if pending[c] <= completed] or [next(iter(pending))]
+            for c in ready:
+                pending.pop(c)
+                run_checker(c)
+                completed.add(c)
+        return
+
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(workers or 1, 1), thread_name_prefix='checker') as executor:
+        while pending or running:
+            ready = [c for c in pending if pending[c] <= completed]  # keeps checker order
+            if not ready and not running:  # dependency cycle, fall back to checker order
+                ready = [next(iter(pending))]
+
+            for c in ready:
+                pending.pop(c)
+                running[executor.submit(run_checker, c)] = c
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                completed.add(running.pop(future))
+                future.result()  # re-raise unexpected error
+
+
+def perform_validation(ctx, metadata_file=None, data_dir=None, metadata_str=None,threads=None,skip_checks=None,
+                       workers=1):
     if not (metadata_file or metadata_str):
         echo('Must specify one or more submission metadata files or metadata as a JSON string.', err=True)
         ctx.abort()
@@ -60,6 +178,11 @@ def perform_validation(ctx, metadata_file=None, data_dir=None, metadata_str=None
     # ctx.obj['data_dir'] = data_dir
     logger = ctx.obj['LOGGER']
 
+    # BAM headers are read once per validation run and shared by all checkers
+    ctx.obj['bam_headers'] = BamHeaderCache()
+    # so are md5 of data files streamed by checkers
+    ctx.obj['file_digests'] = FileDigests()
+
     # initialize validate status
     ctx.obj['validation_report'] = {
         'tool': {
@@ -121,20 +244,71 @@ def perform_validation(ctx, metadata_file=None, data_dir=None, metadata_str=None
 
         ctx.obj['validation_report']['metadata'] = '<supplied as a JSON string>'
 
+    ctx.obj['checkpoints'] = None
+    ctx.obj['metadata_index'] = None
     if ctx.obj['validation_report']['validation']['status'] != "INVALID":
-        for c in checkers:  # perform validation checks one by one
+        # lookups on read groups and files, built once for all checkers
+        ctx.obj['metadata_index'] = MetadataIndex(metadata)
+
+        if metadata_file and ctx.obj.get('RESUME'):
+            # with --resume results of checks are saved along with what they read,
+            # checks are only run again when what they read has changed
+            ctx.obj['checkpoints'] = CheckpointStore(
+                os.path.join('logs', 'checkpoints'), metadata_file, data_dir, metadata,
+                ctx.obj['validation_report']['data_files'], resume=True, options=ctx.obj
+            )
+
+        registry = checker_registry()
+        checkers_to_run = {}
+        for c in registry:
             checker_code = c.split('_')[0]
             # skip these checkers that involve sequencing file
             # when no submission dir specified
             if not data_dir and checker_code[0:2] in ('c6', 'c7', 'c8', 'c9'):
                 continue
-            if  checker_code in skip_checks:
-                skip = True
-            else:
-                skip = False
+            checkers_to_run[c] = registry[c].depends_on
+
+        def new_checker(c):
+            # checker modules are imported only when they are about to run
+            skip = bool(skip_checks and c.split('_')[0] in skip_checks)
+            return load_checker(c).Checker(ctx, metadata, threads, skip)
+
+        def run_checker(c):
+            with span(c, 'checker', metadata_file=metadata_file) as attrs:
+                checker = new_checker(c)
+                checker.run()
+                attrs['status'] = checker.status
+
+        # metadata checks expressed as rules, see seq_tools/metadata_rules.py, are run
+        # together in one traversal of the metadata, along with the rule checks they
+        # depend on. They run one by one instead when what each check reads (--resume),
+        # its profile or its metrics are to be recorded
+        rule_checkers = []
+        if ctx.obj['checkpoints'] is None and not ctx.obj.get('PROFILE') and not ctx.obj.get('MEASURE'):
+            for c in checkers_to_run:  # in checker order
+                if not registry[c].rule:
+                    continue
+                if all(d in rule_checkers for d in checkers_to_run[c] if d in checkers_to_run and d != c):
+                    rule_checkers.append(c)
 
-            checker = checkers[c].Checker(ctx, metadata, threads,skip)
-            checker.check()
+        # without data files all checks are quick metadata checks, running them
+        # concurrently does not pay off. When profiling, checks run one at a time so
+        # that their profiles are not skewed by each other
+        with span('validate', 'validation', metadata_file=metadata_file):
+            if rule_checkers:
+                with span('metadata_rules', 'checker', metadata_file=metadata_file):
+                    load_checker('base_checker').RuleChecker.run_together(
+                        [new_checker(c) for c in rule_checkers], metadata)
+
+            try:
+                run_checkers({c: d for c, d in checkers_to_run.items() if c not in rule_checkers},
+                             run_checker, workers if data_dir and not ctx.obj.get('PROFILE') else 1)
+            finally:
+                if ctx.obj['checkpoints']:
+                    ctx.obj['checkpoints'].flush()
+
+        # checkers add their entries as they start, report them in checker order
+        ctx.obj['validation_report']['validation']['checks'].sort(key=lambda c: c['checker'])
 
         # aggregate status from validation checks
         check_status = set()
@@ -170,4 +344,10 @@ def perform_validation(ctx, metadata_file=None, data_dir=None, metadata_str=None
             "Please find detailed report in STDOUT." % \
             ctx.obj['validation_report']['validation']['status']
         logger.info(message)
-        echo(json.dumps(ctx.obj['validation_report']))
+
+        report = ctx.obj['validation_report']
+        if ctx.obj.get('MEASURE') and not ctx.obj.get('METRICS'):
+            # measured for the export only (--openmetrics), the report is printed without them
+            report = dict(report, validation=dict(report['validation'], checks=[
+                {k: v for k, v in c.items() if k != 'metrics'} for c in report['validation']['checks']]))
+        echo(json.dumps(report))
@@ -21,6 +21,11 @@
 import functools
 import traceback
 from abc import ABCMeta, abstractmethod
+from seq_tools.checkpoints import track
+from seq_tools.metadata_index import TrackedIndex
+from seq_tools.metadata_rules import evaluate
+from seq_tools.metrics import CheckMetrics, measure
+from seq_tools.profiling import profile_file, start_profiler, stop_profiler
 
 
 class BaseChecker(object):
@@ -32,12 +37,23 @@ class BaseChecker(object):
         self._logger = ctx.obj['LOGGER']
         self._data_dir = ctx.obj['validation_report'].get('data_dir')
         self._files = ctx.obj['validation_report'].get('data_files')
+        self._bam_headers = ctx.obj.get('bam_headers')
+        self._file_digests = ctx.obj.get('file_digests')
+        self._checkpoints = ctx.obj.get('checkpoints')
+        self._metadata_index = ctx.obj.get('metadata_index')
+        # what the check reads, for its result to be reused when none of it changes
+        self._metadata_reads = set()
+        self._reads_data = False
+        self._metrics = CheckMetrics()
         self._checks = ctx.obj['validation_report']['validation']['checks']
-        self._checks.append({
+        # keep a reference to this checker's own entry, other checkers may
+        # append their entries concurrently
+        self._check = {
             'checker': checker_name,
             'status': None,
             'message': None
-        })
+        }
+        self._checks.append(self._check)
         self._threads = threads
         self._depends_on = depends_on
 
@@ -46,25 +62,54 @@ class BaseChecker(object):
             self.message = "This check was not performed as instructed by the command line option. Status: SKIPPED"
             self.logger.info("[%s] %s" % (self.checker, self.message))
 
-        if self._depends_on:
-            self._verify_dependencies()
-
     @property
     def ctx(self):
         return self._ctx
 
     @property
     def data_dir(self):
+        self._reads_data = True
         return self._data_dir
 
     @property
     def metadata(self):
-        return self._metadata
+        if self._checkpoints is None:  # no need to know what is read
+            return self._metadata
+        return track(self._metadata, (), self._metadata_reads)
+
+    @property
+    def metadata_index(self):
+        if self._checkpoints is None:
+            return self._metadata_index
+        return TrackedIndex(self._metadata_index, self._metadata_reads)
 
     @property
     def files(self):
+        self._reads_data = True
         return self._files
 
+    @property
+    def bam_headers(self):
+        self._reads_data = True
+        return self._bam_headers
+
+    @property
+    def file_digests(self):
+        self._reads_data = True
+        return self._file_digests
+
+    @property
+    def metadata_reads(self):
+        return self._metadata_reads
+
+    @property
+    def reads_data(self):
+        return self._reads_data
+
+    @property
+    def metrics(self):
+        return self._metrics
+
     @property
     def logger(self):
         return self._logger
@@ -79,32 +124,57 @@ class BaseChecker(object):
 
     @property
     def checker(self):
-        return self._checks[-1]['checker']
+        return self._check['checker']
 
     @checker.setter
     def checker(self, value):
-        self._checks[-1]['checker'] = value
+        self._check['checker'] = value
 
     @property
     def message(self):
-        return self._checks[-1]['message']
+        return self._check['message']
 
     @message.setter
     def message(self, value):
-        self._checks[-1]['message'] = value
+        self._check['message'] = value
 
     @property
     def status(self):
-        return self._checks[-1]['status']
+        return self._check['status']
 
     @status.setter
     def status(self, value):
-        self._checks[-1]['status'] = value
+        self._check['status'] = value
 
     @abstractmethod
     def check(self):
         pass
 
+    def run(self):
+        # dependencies are verified right before the check, by then
+        # all checks this one depends on have completed
+        if self.depends_on:
+            self._verify_dependencies()
+
+        if not self.status and self._checkpoints and self._checkpoints.resume \
+                and self._checkpoints.restore(self):
+            self.logger.info("[%s] Result reused from checkpoint as what the check reads is unchanged, "
+                             "status: %s" % (self.checker, self.status))
+            return
+
+        if self.ctx.obj.get('MEASURE'):
+            with measure(self._metrics):
+                self.check()
+            self._check['metrics'] = self._metrics.to_dict()
+        else:
+            self.check()
+
+        if self._checkpoints:
+            self._checkpoints.save(self)
+
+    def dependency_statuses(self):
+        return {c['checker']: c['status'] for c in self._checks if c['checker'] in self.depends_on}
+
     def _verify_dependencies(self):
         check_statuses = {}
         for c in self._checks:
@@ -132,26 +202,87 @@ class BaseChecker(object):
     def _catch_exception(f):
         @functools.wraps(f)
         def func(*args, **kwargs):
+            _self = args[0]
+            # with --profile, each check is profiled into its own pstats file
+            profile_dir = _self.ctx.obj.get('PROFILE')
+            profiler = start_profiler() if profile_dir else None
             try:
                 return f(*args, **kwargs)
             except Exception:
-                _self = args[0]
-                _self.status = 'UNKNOWN'
-
-                message = "An exception occurred during the execution of this checker. " \
-                    "This is likely due to problem(s) identified by earlier check(s), " \
-                    "please fix reported problem and then run the validation again."
-
-                if _self.data_dir is None:  # metadata only validation
-                    _self.message = "%s Use 'seq-tools -d' option to see more information on the exception in output to STDERR" \
-                        % message
-                else:  # metadata and data file validation
-                    _self.message = "%s More information of the exception can be found " \
-                        "in the latest log file: %s" \
-                        % (message, _self.logger.handlers[0].baseFilename)
-
-                _self.logger.info("[%s] %s Additional message: %s" % (
-                    _self.checker, message, repr(traceback.format_exc())))
+                _self._report_exception(traceback.format_exc())
+            finally:
+                if profiler:
+                    stop_profiler(profiler, profile_file(
+                        profile_dir, _self.ctx.obj['validation_report'].get('metadata_file'), _self.checker))
         return func
 
     _catch_exception = staticmethod(_catch_exception)
+
+    def _report_exception(self, error):
+        self.status = 'UNKNOWN'
+
+        message = "An exception occurred during the execution of this checker. " \
+            "This is likely due to problem(s) identified by earlier check(s), " \
+            "please fix reported problem and then run the validation again."
+
+        if self._data_dir is None:  # metadata only validation, not a read of data files
+            self.message = "%s Use 'seq-tools -d' option to see more information on the exception in output to STDERR" \
+                % message
+        else:  # metadata and data file validation
+            self.message = "%s More information of the exception can be found " \
+                "in the latest log file: %s" \
+                % (message, self.logger.handlers[0].baseFilename)
+
+        self.logger.info("[%s] %s Additional message: %s" % (self.checker, message, repr(error)))
+
+
+class RuleChecker(BaseChecker):
+    """
+    Checker of metadata only whose check is a MetadataRule, set as 'rule', see
+    seq_tools/metadata_rules.py. The rule is evaluated on its own by 'check', or along
+    with rules of other metadata checkers in one traversal of the metadata by
+    'run_together'.
+    """
+
+    rule = None
+
+    def new_rule(self):
+        return self.rule(self.metadata, self.metadata_index, self.ctx.obj)
+
+    def conclude(self, rule):
+        # take the result of the evaluated rule as the result of this check
+        if rule.error:
+            self._report_exception(rule.error)
+            return
+
+        self.status = rule.status
+        self.message = rule.message
+        self.logger.info(f'[{self.checker}] {self.message}')
+
+    @BaseChecker._catch_exception
+    def check(self):
+        # status already set at initiation
+        if self.status:
+            return
+
+        rule = self.new_rule()
+        evaluate([rule], self.metadata)
+        self.conclude(rule)
+
+    @staticmethod
+    def run_together(checkers, metadata):
+        """
+        Run RuleCheckers, given in checker order, by evaluating their rules in one
+        traversal of 'metadata'. Dependencies are verified in order after that, with
+        the same results as when the checkers are run one by one: a check whose
+        dependencies did not PASS ends UNKNOWN. Neither reads of the metadata nor
+        metrics are recorded, use 'run' of each checker for those.
+        """
+        rules = {c.checker: c.new_rule() for c in checkers if not c.status}  # not SKIPPED
+        evaluate(list(rules.values()), metadata)
+
+        for c in checkers:
+            if c.depends_on:
+                c._verify_dependencies()
+            if not c.status:
+                c.conclude(rules[c.checker])
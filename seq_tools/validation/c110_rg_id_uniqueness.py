@@ -19,49 +19,37 @@
 """
 
 
-from base_checker import BaseChecker
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
 
 
-class Checker(BaseChecker):
-    def __init__(self, ctx, metadata,threads, skip=False):
-        super().__init__(ctx, metadata, __name__,threads, skip=skip)
+class Rule(MetadataRule):
+    requires = (('read_groups', "Missing 'read_groups' in the metadata JSON"),)
 
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
-            return
+    def start(self):
+        self.rg_ids = set()
+        self.duplicated_ids = []
 
-        if not self.metadata.get('read_groups'):
-            message = "Missing 'read_groups' in the metadata JSON"
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+    def read_group(self, rg):
+        if 'submitter_read_group_id' not in rg:
+            self.invalid("Required field 'submitter_read_group_id' not found in metadata JSON")
             return
 
-        rg_ids = set()
-        duplicated_ids = []
-        for rg in self.metadata.get('read_groups'):
-            if 'submitter_read_group_id' not in rg:
-                message = "Required field 'submitter_read_group_id' not found in metadata JSON"
-                self.logger.info(f'[{self.checker}] {message}')
-                self.message = message
-                self.status = 'INVALID'
-                return
-
-            if rg['submitter_read_group_id'] in rg_ids:
-                duplicated_ids.append(rg['submitter_read_group_id'])
-            else:
-                rg_ids.add(rg['submitter_read_group_id'])
+        if rg['submitter_read_group_id'] in self.rg_ids:
+            self.duplicated_ids.append(rg['submitter_read_group_id'])
+        else:
+            self.rg_ids.add(rg['submitter_read_group_id'])
 
-        if duplicated_ids:
-            message = "'submitter_read_group_id' duplicated in metadata: '%s'" % \
-                ', '.join(duplicated_ids)
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+    def result(self):
+        if self.duplicated_ids:
+            self.invalid("'submitter_read_group_id' duplicated in metadata: '%s'" %
+                         ', '.join(self.duplicated_ids))
         else:
-            self.status = 'PASS'
-            message = "Read group ID uniqueness check status: PASS"
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
+            self.passed("Read group ID uniqueness check status: PASS")
+
+
+class Checker(RuleChecker):
+    rule = Rule
+
+    def __init__(self, ctx, metadata,threads, skip=False):
+        super().__init__(ctx, metadata, __name__,threads, skip=skip)
@@ -21,58 +21,40 @@
 """
 
 
-import re
-from base_checker import BaseChecker
-import json
-import requests
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
+from seq_tools.schema import schema_provider
 
-class Checker(BaseChecker):
-    def __init__(self, ctx, metadata,threads, skip=False):
-        super().__init__(ctx, metadata, __name__,threads, skip=skip)
 
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
-            return
+class Rule(MetadataRule):
+    requires = (('read_groups', "Missing 'read_groups' section in the metadata JSON"),)
 
-        if not self.metadata.get('read_groups'):
-            message = "Missing 'read_groups' section in the metadata JSON"
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+    def start(self):
+        # schema is downloaded once per process and cached on disk, see seq_tools/schema.py
+        self.regex = schema_provider(self.options.get('OFFLINE', False)).pattern(
+            'read_groups', 'submitter_read_group_id')
+        self.offending_ids = set()
+
+    def read_group(self, rg):
+        if 'submitter_read_group_id' not in rg:
+            self.invalid("Required field 'submitter_read_group_id' not found in metadata JSON")
             return
-        
-        url='https://raw.githubusercontent.com/icgc-argo/argo-metadata-schemas/master/schemas/sequencing_experiment.json'
-        resp=requests.get(url)
-        
-        if resp.status_code==200:
-            regex=resp.json()['schema']['properties']['read_groups']['items']['properties']['submitter_read_group_id']['pattern']
+
+        if not self.regex.match(rg['submitter_read_group_id']):
+            self.offending_ids.add(rg['submitter_read_group_id'])
+
+    def result(self):
+        if self.offending_ids:
+            self.invalid("'submitter_read_group_id' in metadata contains invalid character or "
+                         "is shorter then 2 characters: '%s'. "
+                         "Permissible characters include: a-z, A-Z, 0-9, - (hyphen), "
+                         "_ (underscore), : (colon), . (dot)" % ', '.join(self.offending_ids))
         else:
-            regex='^[a-zA-Z0-9\\-_:\\.]{1,98}$'
+            self.passed("Read group ID permissible character check status: PASS")
 
-        offending_ids = set()
-        for rg in self.metadata.get('read_groups'):
-            if 'submitter_read_group_id' not in rg:
-                message = "Required field 'submitter_read_group_id' not found in metadata JSON"
-                self.logger.info(f'[{self.checker}] {message}')
-                self.message = message
-                self.status = 'INVALID'
-                return
 
-            if not re.match(regex, rg['submitter_read_group_id']):
-                offending_ids.add(rg['submitter_read_group_id'])
+class Checker(RuleChecker):
+    rule = Rule
 
-        if offending_ids:
-            message =  "'submitter_read_group_id' in metadata contains invalid character or " \
-                "is shorter then 2 characters: '%s'. " \
-                "Permissible characters include: a-z, A-Z, 0-9, - (hyphen), " \
-                "_ (underscore), : (colon), . (dot)" % ', '.join(offending_ids)
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
-        else:
-            self.status = 'PASS'
-            message = "Read group ID permissible character check status: PASS"
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
+    def __init__(self, ctx, metadata,threads, skip=False):
+        super().__init__(ctx, metadata, __name__,threads, skip=skip)
@@ -19,34 +19,23 @@
 """
 
 
-from base_checker import BaseChecker
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
 
 
-class Checker(BaseChecker):
-    def __init__(self, ctx, metadata,threads, skip=False):
-        super().__init__(ctx, metadata, __name__,threads, skip=skip)
-
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
-            return
-
-        if not self.metadata.get('samples'):
-            message = "Missing 'samples' section in the metadata JSON"
-            self.message = message
-            self.status = 'INVALID'
-            self.logger.info(f'[{self.checker}] {message}')
-            return
+class Rule(MetadataRule):
+    requires = (('samples', "Missing 'samples' section in the metadata JSON"),)
 
+    def result(self):
         if len(self.metadata.get('samples')) != 1:
-            message = "'samples' section must contain exactly one sample in metadata, %s found" % \
-                len(self.metadata.get('samples'))
-            self.message = message
-            self.status = 'INVALID'
-            self.logger.info(f'[{self.checker}] {message}')
+            self.invalid("'samples' section must contain exactly one sample in metadata, %s found" %
+                         len(self.metadata.get('samples')))
         else:
-            message = "One and only one sample check status: PASS"
-            self.status = 'PASS'
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
+            self.passed("One and only one sample check status: PASS")
+
+
+class Checker(RuleChecker):
+    rule = Rule
+
+    def __init__(self, ctx, metadata,threads, skip=False):
+        super().__init__(ctx, metadata, __name__,threads, skip=skip)
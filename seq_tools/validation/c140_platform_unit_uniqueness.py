@@ -19,49 +19,36 @@
 """
 
 
-from base_checker import BaseChecker
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
 
 
-class Checker(BaseChecker):
-    def __init__(self, ctx, metadata,threads, skip=False):
-        super().__init__(ctx, metadata, __name__,threads, skip=skip)
+class Rule(MetadataRule):
+    requires = (('read_groups', "Missing 'read_groups' section in the metadata JSON"),)
 
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
-            return
+    def start(self):
+        self.pus = set()
+        self.duplicated_pus = []
 
-        if not self.metadata.get('read_groups'):
-            message = "Missing 'read_groups' section in the metadata JSON"
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+    def read_group(self, rg):
+        if 'platform_unit' not in rg or not rg['platform_unit'] or not isinstance(rg['platform_unit'], str):
+            self.invalid("Required field 'platform_unit' not found or not populated properly in metadata JSON")
             return
 
-        pus = set()
-        duplicated_pus = []
-        for rg in self.metadata.get('read_groups'):
-            if 'platform_unit' not in rg or not rg['platform_unit'] or not isinstance(rg['platform_unit'], str):
-                message = "Required field 'platform_unit' not found or not populated properly in metadata JSON"
-                self.logger.info(f'[{self.checker}] {message}')
-                self.message = message
-                self.status = 'INVALID'
-                return
-
-            if rg['platform_unit'] in pus:
-                duplicated_pus.append(rg['platform_unit'])
-            else:
-                pus.add(rg['platform_unit'])
+        if rg['platform_unit'] in self.pus:
+            self.duplicated_pus.append(rg['platform_unit'])
+        else:
+            self.pus.add(rg['platform_unit'])
 
-        if duplicated_pus:
-            message = "'platform_unit' duplicated in metadata: '%s'" % \
-                ', '.join(duplicated_pus)
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+    def result(self):
+        if self.duplicated_pus:
+            self.invalid("'platform_unit' duplicated in metadata: '%s'" % ', '.join(self.duplicated_pus))
         else:
-            self.status = 'PASS'
-            message = "Platform unit uniqueness check status: PASS"
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
+            self.passed("Platform unit uniqueness check status: PASS")
+
+
+class Checker(RuleChecker):
+    rule = Rule
+
+    def __init__(self, ctx, metadata,threads, skip=False):
+        super().__init__(ctx, metadata, __name__,threads, skip=skip)
@@ -20,50 +20,33 @@
 """
 
 
-from base_checker import BaseChecker
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
 
 
-class Checker(BaseChecker):
-    def __init__(self, ctx, metadata,threads, skip=False):
-        super().__init__(ctx, metadata, __name__,threads, skip=skip)
-
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
-            return
-
-        if not self.metadata.get('read_groups'):
-            message = "Missing 'read_groups' section in the metadata JSON"
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
-            return
+class Rule(MetadataRule):
+    requires = (('read_groups', "Missing 'read_groups' section in the metadata JSON"),)
 
+    def result(self):
         if self.metadata.get('read_group_count') is None:
-            message = "Missing 'read_group_count' field in the metadata JSON"
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+            self.invalid("Missing 'read_group_count' field in the metadata JSON")
             return
 
         if not isinstance(self.metadata['read_group_count'], int) or self.metadata['read_group_count'] < 1:
-            message = "'read_group_count' not populated with an integer or value not greater than 0 in the metadata JSON"
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+            self.invalid("'read_group_count' not populated with an integer or value not greater than 0 "
+                         "in the metadata JSON")
             return
 
         if len(self.metadata.get('read_groups')) != self.metadata.get('read_group_count'):
-            message = "The total number of read groups in 'read_groups' section is %s. It does NOT match the number " \
-                "specified in read_group_count: %s." % \
-                (len(self.metadata.get('read_groups')), self.metadata.get('read_group_count'))
-            self.message = message
-            self.status = 'INVALID'
-            self.logger.info(f'[{self.checker}] {message}')
-
+            self.invalid("The total number of read groups in 'read_groups' section is %s. It does NOT match "
+                         "the number specified in read_group_count: %s." %
+                         (len(self.metadata.get('read_groups')), self.metadata.get('read_group_count')))
         else:
-            self.status = 'PASS'
-            message = "Read groups count check status: PASS"
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
+            self.passed("Read groups count check status: PASS")
+
+
+class Checker(RuleChecker):
+    rule = Rule
+
+    def __init__(self, ctx, metadata,threads, skip=False):
+        super().__init__(ctx, metadata, __name__,threads, skip=skip)
@@ -20,109 +20,77 @@
 """
 
 
-from base_checker import BaseChecker
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
 
 
-class Checker(BaseChecker):
-    def __init__(self, ctx, metadata,threads, skip=False):
-        super().__init__(ctx, metadata, __name__,threads, skip=skip)
+class Rule(MetadataRule):
+    requires = (('read_groups', "Missing 'read_groups' section in the metadata JSON"),
+                ('files', "Missing 'files' section in the metadata JSON"))
+
+    def start(self):
+        self.fns = set()
+        self.fls = set()
 
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
+    def read_group(self, rg):
+        if 'is_paired_end' not in rg:
+            self.invalid("Required field 'is_paired_end' is not found in metadata JSON in read group: %s." %
+                         rg['submitter_read_group_id'])
             return
 
-        if not self.metadata.get('read_groups'):
-            message = "Missing 'read_groups' section in the metadata JSON"
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+        if not isinstance(rg['is_paired_end'], bool):
+            self.invalid("Required field 'is_paired_end' should be Boolean type in read group: %s." %
+                         rg['submitter_read_group_id'])
             return
 
-        if not self.metadata.get('files'):
-            message = "Missing 'files' section in the metadata JSON"
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+        if 'file_r1' not in rg or not rg['file_r1']:
+            self.invalid("Required field 'file_r1' is not found or populated in metadata JSON in read group: %s." %
+                         rg['submitter_read_group_id'])
             return
 
-        fns = set()
-        for rg in self.metadata.get('read_groups'):
-            if 'is_paired_end' not in rg:
-                message = "Required field 'is_paired_end' is not found in metadata JSON in read group: %s." % rg['submitter_read_group_id']
-                self.logger.info(f'[{self.checker}] {message}')
-                self.message = message
-                self.status = 'INVALID'
+        if rg['is_paired_end']:
+            if 'file_r2' not in rg or not rg['file_r2']:
+                self.invalid("Required field 'file_r2' is not found or populated in metadata JSON for paired end "
+                             "sequencing reads in read group: %s." % rg['submitter_read_group_id'])
                 return
 
-            if not isinstance(rg['is_paired_end'], bool):
-                message = "Required field 'is_paired_end' should be Boolean type in read group: %s." % rg['submitter_read_group_id']
-                self.logger.info(f'[{self.checker}] {message}')
-                self.message = message
-                self.status = 'INVALID'
+            if rg['file_r1'].endswith('.bam') and not rg['file_r1'] == rg['file_r2']:
+                self.invalid("Fields 'file_r1' and 'file_r2' should be the same for paired end BAM sequencing "
+                             "reads in read group: %s." % rg['submitter_read_group_id'])
                 return
 
-            if 'file_r1' not in rg or not rg['file_r1']:
-                message = "Required field 'file_r1' is not found or populated in metadata JSON in read group: %s." % rg['submitter_read_group_id']
-                self.logger.info(f'[{self.checker}] {message}')
-                self.message = message
-                self.status = 'INVALID'
+            if not rg['file_r1'].endswith('.bam') and rg['file_r1'] == rg['file_r2']:
+                self.invalid("Fields 'file_r1' and 'file_r2' should NOT be the same for paired end FASTQ "
+                             "sequencing reads in read group: %s." % rg['submitter_read_group_id'])
                 return
 
-            if rg['is_paired_end']:
-                if 'file_r2' not in rg or not rg['file_r2']:
-                    message = "Required field 'file_r2' is not found or populated in metadata JSON for paired end sequencing reads in read group: %s." % rg['submitter_read_group_id']
-                    self.logger.info(f'[{self.checker}] {message}')
-                    self.message = message
-                    self.status = 'INVALID'
-                    return
-
-                if rg['file_r1'].endswith('.bam') and not rg['file_r1'] == rg['file_r2']:
-                    message = "Fields 'file_r1' and 'file_r2' should be the same for paired end BAM sequencing reads in read group: %s." % rg['submitter_read_group_id']
-                    self.logger.info(f'[{self.checker}] {message}')
-                    self.message = message
-                    self.status = 'INVALID'
-                    return
-
-                if not rg['file_r1'].endswith('.bam') and rg['file_r1'] == rg['file_r2']:
-                    message = "Fields 'file_r1' and 'file_r2' should NOT be the same for paired end FASTQ sequencing reads in read group: %s." % rg['submitter_read_group_id']
-                    self.logger.info(f'[{self.checker}] {message}')
-                    self.message = message
-                    self.status = 'INVALID'
-                    return
-
-            else:
-                if 'file_r2' in rg and rg['file_r2']:
-                    message = "Field 'file_r2' must be 'null' in metadata JSON for single end sequencing in read group: %s." % rg['submitter_read_group_id']
-                    self.logger.info(f'[{self.checker}] {message}')
-                    self.message = message
-                    self.status = 'INVALID'
-                    return
-
-            if rg.get('file_r1'): fns.add(rg['file_r1'])
-            if rg.get('file_r2'): fns.add(rg['file_r2'])
-
-        fls = set()
-        for fl in self.metadata.get('files'):
-            if 'fileName' not in fl or not fl['fileName']:
-                message = "Required field 'fileName' not populated in 'files' section of the metadata JSON."
-                self.logger.info(f'[{self.checker}] {message}')
-                self.message = message
-                self.status = 'INVALID'
+        else:
+            if 'file_r2' in rg and rg['file_r2']:
+                self.invalid("Field 'file_r2' must be 'null' in metadata JSON for single end sequencing in "
+                             "read group: %s." % rg['submitter_read_group_id'])
                 return
 
-            fls.add(fl.get('fileName'))
+        if rg.get('file_r1'): self.fns.add(rg['file_r1'])
+        if rg.get('file_r2'): self.fns.add(rg['file_r2'])
+
+    def file(self, fl):
+        if 'fileName' not in fl or not fl['fileName']:
+            self.invalid("Required field 'fileName' not populated in 'files' section of the metadata JSON.")
+            return
 
-        if fns - fls:
-            missing_files = fns - fls
-            message = "File(s) specified in 'file_r1' or 'file_r2' missed in 'files' section of the metadata JSON: %s" % ", ".join(missing_files)
-            self.message = message
-            self.status = 'INVALID'
-            self.logger.info(f'[{self.checker}] {message}')
+        self.fls.add(fl.get('fileName'))
 
+    def result(self):
+        if self.fns - self.fls:
+            missing_files = self.fns - self.fls
+            self.invalid("File(s) specified in 'file_r1' or 'file_r2' missed in 'files' section of the "
+                         "metadata JSON: %s" % ", ".join(missing_files))
         else:
-            self.status = 'PASS'
-            message = "Fields file_r1 and file_r2 check status: PASS"
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
+            self.passed("Fields file_r1 and file_r2 check status: PASS")
+
+
+class Checker(RuleChecker):
+    rule = Rule
+
+    def __init__(self, ctx, metadata,threads, skip=False):
+        super().__init__(ctx, metadata, __name__,threads, skip=skip)
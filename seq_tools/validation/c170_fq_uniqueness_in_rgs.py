@@ -19,61 +19,49 @@
 """
 
 
-from base_checker import BaseChecker
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
 
 
-class Checker(BaseChecker):
-    def __init__(self, ctx, metadata,threads, skip=False):
-        super().__init__(ctx, metadata, __name__,threads, skip=skip)
+class Rule(MetadataRule):
+    requires = (('read_groups', "Missing 'read_groups' section in the metadata JSON"),)
 
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
-            return
+    def start(self):
+        self.fqs = set()
+        self.duplicated_fqs = []
 
-        if not self.metadata.get('read_groups'):
-            message = "Missing 'read_groups' section in the metadata JSON"
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+    def read_group(self, rg):
+        if 'file_r1' not in rg:
+            self.invalid("Required field 'file_r1' not found in metadata JSON")
             return
 
-        fqs = set()
-        duplicated_fqs = []
-        for rg in self.metadata.get('read_groups'):
-            if 'file_r1' not in rg:
-                message = "Required field 'file_r1' not found in metadata JSON"
-                self.logger.info(f'[{self.checker}] {message}')
-                self.message = message
-                self.status = 'INVALID'
-                return
+        if rg['file_r1'].endswith('.bam'):
+            return
 
-            if rg['file_r1'].endswith('.bam'):
-                continue
+        if rg['file_r1'] in self.fqs:
+            self.duplicated_fqs.append(rg['file_r1'])
+        else:
+            self.fqs.add(rg['file_r1'])
 
-            if rg['file_r1'] in fqs:
-                duplicated_fqs.append(rg['file_r1'])
+        if 'file_r2' in rg:
+            if rg['file_r2'].endswith('.bam'):
+                return
+            if rg['file_r2'] in self.fqs:
+                self.duplicated_fqs.append(rg['file_r2'])
             else:
-                fqs.add(rg['file_r1'])
-
-            if 'file_r2' in rg:
-                if rg['file_r2'].endswith('.bam'):
-                    continue
-                if rg['file_r2'] in fqs:
-                    duplicated_fqs.append(rg['file_r2'])
-                else:
-                    fqs.add(rg['file_r2'])
-
-        if duplicated_fqs:
-            message = "FASTQ file(s) duplicated in 'file_r1/file_r2' of " \
-                "the 'read_groups' section in the metadata: '%s'" % \
-                ', '.join(sorted(duplicated_fqs))
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+                self.fqs.add(rg['file_r2'])
+
+    def result(self):
+        if self.duplicated_fqs:
+            self.invalid("FASTQ file(s) duplicated in 'file_r1/file_r2' of "
+                         "the 'read_groups' section in the metadata: '%s'" %
+                         ', '.join(sorted(self.duplicated_fqs)))
         else:
-            self.status = 'PASS'
-            message = "FASTQ uniqueness in read groups check status: PASS"
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
+            self.passed("FASTQ uniqueness in read groups check status: PASS")
+
+
+class Checker(RuleChecker):
+    rule = Rule
+
+    def __init__(self, ctx, metadata,threads, skip=False):
+        super().__init__(ctx, metadata, __name__,threads, skip=skip)
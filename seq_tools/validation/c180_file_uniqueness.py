@@ -19,50 +19,39 @@
 """
 
 
-from base_checker import BaseChecker
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
 
 
-class Checker(BaseChecker):
-    def __init__(self, ctx, metadata,threads, skip=False):
-        super().__init__(ctx, metadata, __name__,threads, skip=skip)
+class Rule(MetadataRule):
+    requires = (('files', "Missing 'files' section in the metadata JSON"),)
 
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
-            return
-
-        if not self.metadata.get('files'):
-            message = "Missing 'files' section in the metadata JSON"
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+    def result(self):
+        if self.metadata_index.files_malformed:
+            self.invalid("'files' section of the metadata JSON must be a list of files")
             return
 
         fns = set()
         duplicated_fns = set()
-        for fl in self.metadata.get('files'):
-            if 'fileName' not in fl or not fl['fileName']:
-                message = "Required field 'fileName' is not found in metadata JSON."
-                self.logger.info(f'[{self.checker}] {message}')
-                self.message = message
-                self.status = 'INVALID'
+        for fn in self.metadata_index.file_names:
+            if fn is None:
+                self.invalid("Required field 'fileName' is not found in metadata JSON.")
                 return
 
-            if fl['fileName'] in fns:
-                duplicated_fns.add(fl['fileName'])
+            if fn in fns:
+                duplicated_fns.add(fn)
             else:
-                fns.add(fl['fileName'])
+                fns.add(fn)
 
         if duplicated_fns:
-            message = "File(s) duplicated in 'fileName' of " \
-                "the 'files' section in the metadata: '%s'" % \
-                ', '.join(duplicated_fns)
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+            self.invalid("File(s) duplicated in 'fileName' of "
+                         "the 'files' section in the metadata: '%s'" % ', '.join(duplicated_fns))
         else:
-            self.status = 'PASS'
-            message = "Files uniqueness check in files section status: PASS"
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
+            self.passed("Files uniqueness check in files section status: PASS")
+
+
+class Checker(RuleChecker):
+    rule = Rule
+
+    def __init__(self, ctx, metadata,threads, skip=False):
+        super().__init__(ctx, metadata, __name__,threads, skip=skip)
@@ -20,72 +20,51 @@
 """
 
 
-from base_checker import BaseChecker
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
 
-class Checker(BaseChecker):
-    def __init__(self, ctx, metadata,threads, skip=False):
-        super().__init__(
-            ctx=ctx,
-            metadata=metadata,
-            checker_name=__name__,
-            threads=threads,
-            depends_on=[  # dependent checks
-                'c160_file_r1_r2_check'
-            ],
-            skip=skip
-        )
 
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
-            return
+class Rule(MetadataRule):
+    requires = (('read_groups', "Missing 'read_groups' section in the metadata JSON"),
+                ('files', "Missing 'files' section in the metadata JSON"))
 
-        if not self.metadata.get('read_groups'):
-            message = "Missing 'read_groups' section in the metadata JSON"
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+    def result(self):
+        if self.metadata_index.files_malformed:
+            self.invalid("'files' section of the metadata JSON must be a list of files")
             return
 
-        if not self.metadata.get('files'):
-            message = "Missing 'files' section in the metadata JSON"
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
-            return
-
-        fns = set()
-        for rg in self.metadata.get('read_groups'):
-            if rg.get('file_r1'):
-                fns.add(rg['file_r1'])
-            if rg.get('file_r2'):
-                fns.add(rg['file_r2'])
+        fns = self.metadata_index.read_group_files
 
         fls = set()
-        for fl in self.metadata.get('files'):
-            if 'fileName' not in fl or not fl['fileName']:
-                message = "Required field 'fileName' not populated in 'files' " \
-                    "section of the metadata JSON."
-                self.logger.info(f'[{self.checker}] {message}')
-                self.message = message
-                self.status = 'INVALID'
+        for fn in self.metadata_index.file_names:
+            if fn is None:
+                self.invalid("Required field 'fileName' not populated in 'files' "
+                             "section of the metadata JSON.")
                 return
 
-            fls.add(fl.get('fileName'))
+            fls.add(fn)
 
         extra_files = fls - fns
         if extra_files:
-            message = "Found extra files specified in 'files' section of the metadata JSON, " \
-                "Please remove unneeded files: %s from the 'files' section of the metadata JSON. " \
-                "Or if the files are intended for submission, please add read group information " \
-                "related to these files in the 'read_groups' section." % ", ".join(sorted(extra_files))
-            self.message = message
-            self.status = 'INVALID'
-            self.logger.info(f'[{self.checker}] {message}')
-
+            self.invalid("Found extra files specified in 'files' section of the metadata JSON, "
+                         "Please remove unneeded files: %s from the 'files' section of the metadata JSON. "
+                         "Or if the files are intended for submission, please add read group information "
+                         "related to these files in the 'read_groups' section." % ", ".join(sorted(extra_files)))
         else:
-            self.status = 'PASS'
-            message = "No extra files check status: PASS"
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
+            self.passed("No extra files check status: PASS")
+
+
+class Checker(RuleChecker):
+    rule = Rule
+
+    def __init__(self, ctx, metadata,threads, skip=False):
+        super().__init__(
+            ctx=ctx,
+            metadata=metadata,
+            checker_name=__name__,
+            threads=threads,
+            depends_on=[  # dependent checks
+                'c160_file_r1_r2_check'
+            ],
+            skip=skip
+        )
@@ -20,58 +20,49 @@
 """
 
 
-from base_checker import BaseChecker
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
 
 
-class Checker(BaseChecker):
-    def __init__(self, ctx, metadata,threads, skip=False):
-        super().__init__(ctx, metadata, __name__,threads, skip=skip)
+class Rule(MetadataRule):
+    requires = (('read_groups', "Missing 'read_groups' in the metadata JSON"),)
 
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
-            return
+    def start(self):
+        self.rg_ids_in_bams = {}
+        self.duplicated_ids = {}
 
-        if not self.metadata.get('read_groups'):
-            message = "Missing 'read_groups' in the metadata JSON"
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+    def read_group(self, rg):
+        filename = rg['file_r1']
+        if not filename.endswith('.bam'):  # skip if not a BAM
             return
 
-        rg_ids_in_bams = {}
-        duplicated_ids = {}
-        for rg in self.metadata.get('read_groups'):
-            filename = rg['file_r1']
-            if not filename.endswith('.bam'):  # skip if not a BAM
-                continue
-
-            if rg.get('read_group_id_in_bam') is None:
-                continue
+        if rg.get('read_group_id_in_bam') is None:
+            return
 
-            if filename not in rg_ids_in_bams:
-                rg_ids_in_bams[filename] = set()
+        if filename not in self.rg_ids_in_bams:
+            self.rg_ids_in_bams[filename] = set()
 
-            if rg['read_group_id_in_bam'] in rg_ids_in_bams[filename]:
-                if filename not in duplicated_ids:
-                    duplicated_ids[filename] = set()
-                duplicated_ids[filename].add(rg['read_group_id_in_bam'])
-            else:
-                rg_ids_in_bams[filename].add(rg['read_group_id_in_bam'])
+        if rg['read_group_id_in_bam'] in self.rg_ids_in_bams[filename]:
+            if filename not in self.duplicated_ids:
+                self.duplicated_ids[filename] = set()
+            self.duplicated_ids[filename].add(rg['read_group_id_in_bam'])
+        else:
+            self.rg_ids_in_bams[filename].add(rg['read_group_id_in_bam'])
 
-        if duplicated_ids:
+    def result(self):
+        if self.duplicated_ids:
             msg = []
-            for k, v in duplicated_ids.items():
+            for k, v in self.duplicated_ids.items():
                 msg.append("BAM %s: %s" % (k, "', '".join(sorted(v))))
 
-            self.status = 'INVALID'
-            message = "'read_group_id_in_bam' must be unique within a BAM file if populated in read_groups section, " \
-                "however duplicate(s) found: %s" % '; '.join(msg)
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
+            self.invalid("'read_group_id_in_bam' must be unique within a BAM file if populated in read_groups "
+                         "section, however duplicate(s) found: %s" % '; '.join(msg))
         else:
-            self.status = 'PASS'
-            message = "'read_group_id_in_bam' uniqueness check status: PASS"
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
+            self.passed("'read_group_id_in_bam' uniqueness check status: PASS")
+
+
+class Checker(RuleChecker):
+    rule = Rule
+
+    def __init__(self, ctx, metadata,threads, skip=False):
+        super().__init__(ctx, metadata, __name__,threads, skip=skip)
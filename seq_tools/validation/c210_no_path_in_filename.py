@@ -21,47 +21,37 @@
 
 
 import os
-from base_checker import BaseChecker
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
 
 
-class Checker(BaseChecker):
-    def __init__(self, ctx, metadata,threads, skip=False):
-        super().__init__(ctx, metadata, __name__,threads, skip=skip)
+class Rule(MetadataRule):
+    requires = (('files', "Missing 'files' section in the metadata JSON"),)
 
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
-            return
-
-        if not self.metadata.get('files'):
-            message = "Missing 'files' section in the metadata JSON"
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+    def result(self):
+        if self.metadata_index.files_malformed:
+            self.invalid("'files' section of the metadata JSON must be a list of files")
             return
 
         filename_with_path = set()
-        for fl in self.metadata.get('files'):
-            if 'fileName' not in fl or not fl['fileName']:
-                message = "Required field 'fileName' is not found or not populated in 'files' " \
-                    "section of the metadata JSON."
-                self.logger.info(f'[{self.checker}] {message}')
-                self.message = message
-                self.status = 'INVALID'
+        for fn in self.metadata_index.file_names:
+            if fn is None:
+                self.invalid("Required field 'fileName' is not found or not populated in 'files' "
+                             "section of the metadata JSON.")
                 return
 
-            if os.sep in fl['fileName']:
-                filename_with_path.add(fl['fileName'])
+            if os.sep in fn:
+                filename_with_path.add(fn)
 
         if filename_with_path:
-            message = "'fileName' must NOT contain path in the 'files' section of " \
-                "the metadata, offending name(s): '%s'" % ', '.join(sorted(filename_with_path))
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
+            self.invalid("'fileName' must NOT contain path in the 'files' section of "
+                         "the metadata, offending name(s): '%s'" % ', '.join(sorted(filename_with_path)))
         else:
-            self.status = 'PASS'
-            message = "No path in fileName check in 'files' section status: PASS"
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
+            self.passed("No path in fileName check in 'files' section status: PASS")
+
+
+class Checker(RuleChecker):
+    rule = Rule
+
+    def __init__(self, ctx, metadata,threads, skip=False):
+        super().__init__(ctx, metadata, __name__,threads, skip=skip)
@@ -19,34 +19,32 @@
 """
 
 
-from base_checker import BaseChecker
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
 
 
-class Checker(BaseChecker):
-    def __init__(self, ctx, metadata,threads, skip=False):
-        super().__init__(ctx, metadata, __name__,threads, skip=skip)
+class Rule(MetadataRule):
+    optional = ('read_groups',)
 
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
+    def start(self):
+        self.offending_ids = []
+
+    def read_group(self, rg):
+        if rg.get('read_group_id_in_bam', None) is None:
             return
+        if not rg['file_r1'].endswith('.bam'):
+            self.offending_ids.append(rg['read_group_id_in_bam'])
 
-        offending_ids = []
-        for rg in self.metadata.get('read_groups', []):
-            if rg.get('read_group_id_in_bam', None) is None:
-                continue
-            if not rg['file_r1'].endswith('.bam'):
-                offending_ids.append(rg['read_group_id_in_bam'])
-
-        if offending_ids:
-            self.status = 'INVALID'
-            message = "'read_group_id_in_bam' must NOT be populated in 'read_groups' section when " \
-                "it is not a BAM file: '%s'" % "', '".join(offending_ids)
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
+    def result(self):
+        if self.offending_ids:
+            self.invalid("'read_group_id_in_bam' must NOT be populated in 'read_groups' section when "
+                         "it is not a BAM file: '%s'" % "', '".join(self.offending_ids))
         else:
-            self.status = 'PASS'
-            message = "'read_group_id_in_bam' not populated for FASTQ check: PASS"
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
+            self.passed("'read_group_id_in_bam' not populated for FASTQ check: PASS")
+
+
+class Checker(RuleChecker):
+    rule = Rule
+
+    def __init__(self, ctx, metadata,threads, skip=False):
+        super().__init__(ctx, metadata, __name__,threads, skip=skip)
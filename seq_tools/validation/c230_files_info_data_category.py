@@ -19,9 +19,33 @@
         Linda Xiang <linda.xiang@oicr.on.ca>
 """
 
-from base_checker import BaseChecker
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
+
+
+class Rule(MetadataRule):
+    def start(self):
+        self.file_without_data_category = []
+
+    def file(self, fl):
+        if not fl.get('info') or not fl['info'].get('data_category') or \
+                not fl['info']['data_category'] == 'Sequencing Reads':
+            self.file_without_data_category.append(fl['fileName'])
+
+    def result(self):
+        if self.file_without_data_category:
+            self.invalid("All files in the 'files' section of the metadata JSON are required to "
+                         "have 'info.data_category' field being populated with 'Sequencing Reads'. "
+                         "File(s) found not conforming to this requirement: '%s'."
+                         % ', '.join(sorted(self.file_without_data_category)))
+        else:
+            self.passed("Field 'info.data_category' is found populated with 'Sequencing Reads'. "
+                        "Validation status: PASS")
+
+
+class Checker(RuleChecker):
+    rule = Rule
 
-class Checker(BaseChecker):
     def __init__(self, ctx, metadata,threads, skip=False):
         super().__init__(
             ctx=ctx,
@@ -33,29 +57,3 @@ class Checker(BaseChecker):
             ],  # dependent checks
             skip=skip
         )
-
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
-            return
-
-        file_without_data_category = []
-        for fl in self.metadata.get('files'):
-            if not fl.get('info') or not fl['info'].get('data_category') or not fl['info']['data_category'] == 'Sequencing Reads':
-                file_without_data_category.append(fl['fileName'])
-
-        if file_without_data_category:
-            self.status = 'INVALID'
-            message = "All files in the 'files' section of the metadata JSON are required to " \
-                "have 'info.data_category' field being populated with 'Sequencing Reads'. " \
-                "File(s) found not conforming to this requirement: '%s'." \
-                % ', '.join(sorted(file_without_data_category))
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-
-        else:
-            self.status = 'PASS'
-            message = "Field 'info.data_category' is found populated with 'Sequencing Reads'. Validation status: PASS"
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
@@ -19,9 +19,44 @@
 """
 
 
-from base_checker import BaseChecker
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
+
+
+class Rule(MetadataRule):
+    def result(self):
+        incomplete_read_groups = self.metadata_index.incomplete_read_groups
+        if incomplete_read_groups:  # the check would be incomplete, other checks report the problem
+            self.unknown("Unable to check collision of 'submitter_read_group_id' with 'read_group_id_in_bam', "
+                         "read group(s) #%s miss 'file_r1', 'read_group_id_in_bam' or 'submitter_read_group_id', "
+                         "or have a value that is not a string. Please fix reported problem and then run the "
+                         "validation again." % ', #'.join(str(i + 1) for i in incomplete_read_groups))
+            return
+
+        # only interested in submitter_read_group_id check when read_group_id_in_bam is not populated
+        submitter_rg_ids_alone = self.metadata_index.submitter_rg_ids_alone
+        read_group_ids_in_bam = self.metadata_index.rg_ids_in_bam
+
+        offending_submitter_rg_ids = []
+        for f in sorted(submitter_rg_ids_alone):
+            for rg in sorted(submitter_rg_ids_alone[f]):
+                if rg in read_group_ids_in_bam[f]:  # submitter_rg_id collide with rg_id_in_bam
+                    offending_submitter_rg_ids.append(rg)
+
+        if offending_submitter_rg_ids:
+            self.invalid("For any read group, when 'read_group_id_in_bam' is not populated, 'submitter_read_group_id' "
+                         "must NOT be the same as 'read_group_id_in_bam' of another read group from the same BAM "
+                         "file. However, offending submitter_read_group_id(s) found: %s" %
+                         ', '.join(sorted(offending_submitter_rg_ids)))
+        else:
+            self.passed("For any read group, when 'read_group_id_in_bam' is not populated, 'submitter_read_group_id' "
+                        "must NOT be the same as 'read_group_id_in_bam' of another read group from the same BAM "
+                        "file. Validation result: PASS")
+
+
+class Checker(RuleChecker):
+    rule = Rule
 
-class Checker(BaseChecker):
     def __init__(self, ctx, metadata,threads, skip=False):
         super().__init__(
             ctx=ctx,
@@ -34,52 +69,3 @@ class Checker(BaseChecker):
             ],
             skip=skip
         )
-
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
-            return
-
-        # get submitter_read_group_ids with no read_group_id_in_bam populated
-        submitter_rg_ids_alone = {}
-        read_group_ids_in_bam = {}
-        for rg in self.metadata.get('read_groups'):
-            filename = rg['file_r1']
-            if not filename.endswith('.bam'):  # skip if not a BAM
-                continue
-
-            # only interested in submitter_read_group_id check when read_group_id_in_bam is not populated
-            if rg.get('read_group_id_in_bam') is None:
-                if filename not in submitter_rg_ids_alone:
-                    submitter_rg_ids_alone[filename] = []
-                submitter_rg_ids_alone[filename].append(rg['submitter_read_group_id'])
-
-            else:
-                if filename not in read_group_ids_in_bam:
-                    read_group_ids_in_bam[filename] = []
-                read_group_ids_in_bam[filename].append(rg['read_group_id_in_bam'])
-                continue
-
-        offending_submitter_rg_ids = []
-        for f in sorted(submitter_rg_ids_alone):
-            for rg in sorted(submitter_rg_ids_alone[f]):
-                if isinstance(read_group_ids_in_bam.get(f), list) and \
-                        rg in read_group_ids_in_bam[f]:  # submitter_rg_id collide with rg_id_in_bam
-                    offending_submitter_rg_ids.append(rg)
-
-        if offending_submitter_rg_ids:
-            self.status = 'INVALID'
-            message = "For any read group, when 'read_group_id_in_bam' is not populated, 'submitter_read_group_id' must " \
-                "NOT be the same as 'read_group_id_in_bam' of another read group from the same BAM file. However, " \
-                "offending submitter_read_group_id(s) found: %s" % ', '.join(sorted(offending_submitter_rg_ids))
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-
-        else:
-            self.status = 'PASS'
-            message = "For any read group, when 'read_group_id_in_bam' is not populated, 'submitter_read_group_id' must " \
-                "NOT be the same as 'read_group_id_in_bam' of another read group from the same BAM file. Validation " \
-                "result: PASS"
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
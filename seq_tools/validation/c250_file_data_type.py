@@ -19,10 +19,31 @@
         Linda Xiang <linda.xiang@oicr.on.ca>
 """
 
-from base_checker import BaseChecker
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
 
 
-class Checker(BaseChecker):
+class Rule(MetadataRule):
+    def start(self):
+        self.file_without_data_type = []
+
+    def file(self, fl):
+        if not fl.get('dataType') or not fl['dataType'] == 'Submitted Reads':
+            self.file_without_data_type.append(fl['fileName'])
+
+    def result(self):
+        if self.file_without_data_type:
+            self.invalid("All files in the 'files' section of the metadata JSON are required to "
+                         "have 'dataType' field being populated with 'Submitted Reads'. "
+                         "File(s) found not conforming to this requirement: '%s'."
+                         % ', '.join(sorted(self.file_without_data_type)))
+        else:
+            self.passed("Field 'dataType' is found populated with 'Submitted Reads'. Validation status: PASS")
+
+
+class Checker(RuleChecker):
+    rule = Rule
+
     def __init__(self, ctx, metadata,threads, skip=False):
         super().__init__(
             ctx=ctx,
@@ -34,29 +55,3 @@ class Checker(BaseChecker):
             ],  # dependent checks
             skip=skip
         )
-
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
-            return
-
-        file_without_data_type = []
-        for fl in self.metadata.get('files'):
-            if not fl.get('dataType') or not fl['dataType'] == 'Submitted Reads':
-                file_without_data_type.append(fl['fileName'])
-
-        if file_without_data_type:
-            message = "All files in the 'files' section of the metadata JSON are required to " \
-                "have 'dataType' field being populated with 'Submitted Reads'. " \
-                "File(s) found not conforming to this requirement: '%s'." \
-                % ', '.join(sorted(file_without_data_type))
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
-             
-        else:
-            self.status = 'PASS'
-            message = "Field 'dataType' is found populated with 'Submitted Reads'. Validation status: PASS"
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
@@ -21,10 +21,44 @@
 
 
 import re
-from base_checker import BaseChecker
+from base_checker import RuleChecker
+from seq_tools.metadata_rules import MetadataRule
 
 
-class Checker(BaseChecker):
+FILENAME_PATTERN = r'^[A-Za-z0-9]{1}[A-Za-z0-9_\.\-]*\.(bam|fq\.gz|fastq\.gz|fq\.bz2|fastq\.bz2)$'
+_filename_regex = re.compile(FILENAME_PATTERN)
+
+
+class Rule(MetadataRule):
+    requires = (('files', "Missing 'files' section in the metadata JSON"),)
+
+    def result(self):
+        if self.metadata_index.files_malformed:
+            self.invalid("'files' section of the metadata JSON must be a list of files")
+            return
+
+        filename_with_mismatch_pattern = set()
+        for fn in self.metadata_index.file_names:
+            if fn is None:
+                self.invalid("Required field 'fileName' is not found or not populated in 'files' "
+                             "section of the metadata JSON.")
+                return
+
+            if not _filename_regex.match(fn):
+                filename_with_mismatch_pattern.add(fn)
+
+        if filename_with_mismatch_pattern:
+            self.invalid("'fileName' must match expected pattern '%s' in the 'files' section of the metadata, "
+                         "offending name(s): '%s'" %
+                         (FILENAME_PATTERN, ', '.join(sorted(filename_with_mismatch_pattern))))
+        else:
+            self.passed("'fileName' matches expected pattern '%s' in 'files' "
+                        "section. Validation status: PASS" % FILENAME_PATTERN)
+
+
+class Checker(RuleChecker):
+    rule = Rule
+
     def __init__(self, ctx, metadata,threads, skip=False):
         super().__init__(
             ctx=ctx,
@@ -37,44 +71,3 @@ class Checker(BaseChecker):
             ],
             skip=skip
         )
-
-        self._patten = r'^[A-Za-z0-9]{1}[A-Za-z0-9_\.\-]*\.(bam|fq\.gz|fastq\.gz|fq\.bz2|fastq\.bz2)$'
-
-    @BaseChecker._catch_exception
-    def check(self):
-        # status already set at initiation
-        if self.status:
-            return
-
-        if not self.metadata.get('files'):
-            message = "Missing 'files' section in the metadata JSON"
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
-            return
-
-        filename_with_mismatch_pattern = set()
-        for fl in self.metadata.get('files'):
-            if 'fileName' not in fl or not fl['fileName']:
-                message = "Required field 'fileName' is not found or not populated in 'files' " \
-                    "section of the metadata JSON."
-                self.logger.info(f'[{self.checker}] {message}')
-                self.message = message
-                self.status = 'INVALID'
-                return
-
-            if not re.match(self._patten, fl['fileName']):
-                filename_with_mismatch_pattern.add(fl['fileName'])
-
-        if filename_with_mismatch_pattern:
-            message = "'fileName' must match expected pattern '%s' in the 'files' section of the metadata, " \
-                "offending name(s): '%s'" % (self._patten, ', '.join(sorted(filename_with_mismatch_pattern)))
-            self.logger.info(f'[{self.checker}] {message}')
-            self.message = message
-            self.status = 'INVALID'
-        else:
-            self.status = 'PASS'
-            message = "'fileName' matches expected pattern '%s' in 'files' " \
-                "section. Validation status: PASS" % self._patten
-            self.message = message
-            self.logger.info(f'[{self.checker}] {message}')
@@ -21,13 +21,18 @@
 
 import os
 import re
+import hashlib
+import threading
 import subprocess
+from itertools import islice
 from base_checker import BaseChecker
-from seq_tools.utils import run_cmd
+from seq_tools.utils import LineReader
+from seq_tools.metrics import carry, record_bytes_read, record_subprocess
+from seq_tools.trace import span
 
 
 class Checker(BaseChecker):
-    def __init__(self, ctx, metadata,threads, skip=False):
+    def __init__(self, ctx, metadata, threads, skip=False):
         super().__init__(
             ctx=ctx,
             metadata=metadata,
@@ -46,17 +51,18 @@ class Checker(BaseChecker):
         if self.status:
             return
 
-        query_fastq={}
-        messages= []
+        query_fastq = {}
+        messages = []
         for rg in self.metadata.get("read_groups"):
-            if re.findall(r'\.(fq\.gz|fastq\.gz|fq\.bz2|fastq\.bz2)$',rg['file_r1']) and rg['file_r1'] not in query_fastq.keys():
-                query_fastq[rg['file_r1']]={}
-                query_fastq[rg['file_r1']]['file_r1']=rg['file_r1']
-                query_fastq[rg['file_r1']]['is_paired_end']=rg['is_paired_end']
+            if re.findall(r'\.(fq\.gz|fastq\.gz|fq\.bz2|fastq\.bz2)$', rg['file_r1']) and \
+                    rg['file_r1'] not in query_fastq.keys():
+                query_fastq[rg['file_r1']] = {}
+                query_fastq[rg['file_r1']]['file_r1'] = rg['file_r1']
+                query_fastq[rg['file_r1']]['is_paired_end'] = rg['is_paired_end']
                 if rg.get("file_r2"):
-                    query_fastq[rg['file_r1']]['file_r2']=rg['file_r2']
+                    query_fastq[rg['file_r1']]['file_r2'] = rg['file_r2']
 
-        if len(query_fastq)==0:
+        if len(query_fastq) == 0:
             self.status = 'PASS'
             message = "No FASTQ Files to check"
             self.message = message
@@ -64,43 +70,52 @@ class Checker(BaseChecker):
             return
 
         for fastq in query_fastq.keys():
-            test_pass,file_size,message=fastq_test_length(query_fastq[fastq]['file_r1'],self.data_dir,str(self.threads))
-            if test_pass:
-                query_fastq[fastq]["length_file_r1"]=file_size
+            # each FASTQ is decompressed only once for line count and format check
+            line_count, message = fastq_sanity(
+                query_fastq[fastq]['file_r1'], self.data_dir, str(self.threads), digests=self.file_digests)
+            if line_count is None:  # failed to decompress, the message tells why
+                pass
+            elif line_count % 4 == 0:
+                query_fastq[fastq]["length_file_r1"] = line_count / 4
             else:
-                self.message = message
-                self.logger.info(f'[{self.checker}] {message}')
-                messages.append(message)
+                message_length = "The FASTQ file %s line count not divisible by 4" % (query_fastq[fastq]['file_r1'])
+                self.message = message_length
+                self.logger.info(f'[{self.checker}] {message_length}')
+                messages.append(message_length)
 
-            test_pass,message=fastq_test_regex(query_fastq[fastq]['file_r1'],self.data_dir,str(self.threads))
-            if not test_pass:
+            if message:
                 self.message = message
                 self.logger.info(f'[{self.checker}] {message}')
                 messages.append(message)
 
             if query_fastq[fastq]['is_paired_end']:
 
-                test_pass,file_size,message=fastq_test_length(query_fastq[fastq]['file_r2'],self.data_dir,str(self.threads))
-                if test_pass:
-                    query_fastq[fastq]["length_file_r2"]=file_size
+                line_count, message = fastq_sanity(
+                    query_fastq[fastq]['file_r2'], self.data_dir, str(self.threads), digests=self.file_digests)
+                if line_count is None:
+                    pass
+                elif line_count % 4 == 0:
+                    query_fastq[fastq]["length_file_r2"] = line_count / 4
                 else:
-                    self.message = message
-                    self.logger.info(f'[{self.checker}] {message}')
-                    messages.append(message)
+                    message_length = "The FASTQ file %s line count not divisible by 4" % (query_fastq[fastq]['file_r2'])
+                    self.message = message_length
+                    self.logger.info(f'[{self.checker}] {message_length}')
+                    messages.append(message_length)
 
-                test_pass,message=fastq_test_regex(query_fastq[fastq]['file_r2'],self.data_dir,str(self.threads))
-                if not test_pass:
+                if message:
                     self.message = message
                     self.logger.info(f'[{self.checker}] {message}')
                     messages.append(message)
 
-                if query_fastq[fastq]["length_file_r2"]!=query_fastq[fastq]["length_file_r1"]:
-                    message = "The FASTQ file pair '%s' and '%s' do not have matching line counts" % (query_fastq[fastq]["file_r1"],query_fastq[fastq]["file_r2"])
+                if "length_file_r1" in query_fastq[fastq] and "length_file_r2" in query_fastq[fastq] \
+                        and query_fastq[fastq]["length_file_r2"] != query_fastq[fastq]["length_file_r1"]:
+                    message = "The FASTQ file pair '%s' and '%s' do not have matching line counts" % (
+                        query_fastq[fastq]["file_r1"], query_fastq[fastq]["file_r2"])
                     self.message = message
                     self.logger.info(f'[{self.checker}] {message}')
                     messages.append(message)
 
-        if len(messages)>0:
+        if len(messages) > 0:
             self.status = 'INVALID'
             message = "The FASTQ files failed to validate for the following reasons : %s" % ";".join(messages)
             self.message = message
@@ -113,47 +128,144 @@ class Checker(BaseChecker):
             self.logger.info(f'[{self.checker}] {message}')
             return
 
-def fastq_test_length(fastq,path,threads):
-    file_path=os.path.join(path,fastq)
+
+# characters allowed in sequence lines, see https://en.wikipedia.org/wiki/FASTA_format
+SEQUENCE_CHARS = b'ACTGURYKMSWBDHVN-'
+# quality characters, any printable ASCII: phred scores from 0 with offset 33 up to 93, this
+# covers scores above 41 written by recent Illumina and ONT basecallers, and offset 64 as well
+PHRED_CHARS = bytes(range(33, 127))
+
+
+def fastq_sanity(fastq, path, threads, lines_to_check=400000, digests=None):
+    """
+    Decompress a FASTQ file in one streaming pass, count all of its lines and check
+    the format of the first 'lines_to_check' lines along the way. The file is read
+    once and fed to the decompressor, and to md5 registered in 'digests' if given.
+    Returns the line count and a message if a format problem is found, otherwise None.
+    When the decompressor fails, eg, on a truncated file, the line count is None and
+    the message has the error it reported
+    """
+    file_path = os.path.join(path, fastq)
     if fastq.endswith("fastq.gz") or fastq.endswith("fq.gz"):
-        cmd="unpigz -p "+threads+" -c "+file_path+" | wc -l"
+        cmd = ["unpigz", "-p", threads, "-c"]
     else:
-        cmd="pbzip2 -d -c -p"+threads+" "+file_path+" | wc -l"
+        cmd = ["pbzip2", "-d", "-c", "-p" + threads]
 
-    count_cmd = subprocess.check_output(cmd,stderr=subprocess.STDOUT,shell=True)
+    record_subprocess()
+    with span(cmd[0], 'subprocess', cmd=' '.join(cmd), file=file_path) as attrs:
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        feeder = threading.Thread(target=carry(feed_file), args=(file_path, proc.stdin, digests),
+                                  name=threading.current_thread().name + '-feed')
+        feeder.start()
+        # errors of the decompressor are kept apart from the FASTQ lines, drained
+        # along the way so that a full pipe never blocks it
+        stderr = []
+        stderr_reader = threading.Thread(target=carry(lambda: stderr.append(proc.stderr.read())),
+                                         name=threading.current_thread().name + '-stderr')
+        stderr_reader.start()
 
-    file_size=int(count_cmd.decode('utf-8').strip())/ 4
-    if int(count_cmd.decode('utf-8').strip())% 4 == 0:
-        return True,file_size,""
-    else:
-        return False,file_size,"The FASTQ file %s line count not divisible by 4" % (fastq)
+        reader = LineReader(proc.stdout)
+        lines = iter(reader)
+        message = None
+        checked = 0
+        while message is None and checked < lines_to_check:
+            # check in batches of whole records to keep memory use flat
+            batch_size = min(40000, lines_to_check - checked)
+            batch = list(islice(lines, batch_size))
+            if not batch:
+                break
+            if len(batch) < batch_size:  # end of file, ignore trailing blank lines
+                while batch and not batch[-1].strip():
+                    batch.pop()
+            test_pass, message = fastq_test_format(fastq, file_path, batch, first_line=checked)
+            checked += len(batch)
 
-def fastq_test_regex(fastq,path,threads):
-    file_path=os.path.join(path,fastq)
-    if fastq.endswith("fastq.gz") or fastq.endswith("fq.gz"):
-        cmd="unpigz -p "+threads+" -c "+file_path+" | head -n400000"
+        line_count = reader.drain()
+        proc.stdout.close()
+        proc.wait()
+        feeder.join()
+        stderr_reader.join()
+        proc.stderr.close()
+        attrs['lines'] = line_count
+        attrs['returncode'] = proc.returncode
+
+    if proc.returncode != 0:
+        error = b''.join(stderr).decode('utf-8', 'replace').strip()
+        return None, "Failed to decompress FASTQ file %s, '%s' exited with code %s: %s" % (
+            fastq, cmd[0], proc.returncode, error or 'no error message')
+
+    return line_count, message
+
+
+def feed_file(file_path, stream, digests=None):
+    # the pipe to the decompressor is the bounded buffer, reading waits while it is full
+    md5 = hashlib.md5() if digests and digests.claim(file_path) else None
+    read_through = False
+    try:
+        with span('feed_file', 'io', file=file_path, bytes=0) as attrs, open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                record_bytes_read(len(chunk))
+                attrs['bytes'] += len(chunk)
+                if md5:
+                    md5.update(chunk)
+                stream.write(chunk)
+        read_through = True
+    except OSError:  # decompressor gave up, eg, corrupted file, it reports the problem
+        pass
+    finally:
+        try:
+            stream.close()
+        except OSError:
+            pass
+        if md5:
+            # only a file read through to the end gets its md5 registered
+            if read_through:
+                digests.set(file_path, md5.hexdigest())
+            else:
+                digests.release(file_path)
+
+
+def first_invalid(lines, is_invalid):
+    for i, line in enumerate(lines):
+        if is_invalid(line):
+            return i
+    return None
+
+
+def fastq_test_format(fastq, file_path, lines, first_line=0):
+    """
+    Check FASTQ format of the given lines (bytes). Lines of the same kind are checked
+    in bulk with bytes.translate against the allowed characters, only when a problem
+    is found are the lines scanned one by one to locate the first offending line.
+    'first_line' is the line number of the given lines within the file, counting from 0
+    """
+    headers, sequences, pluses, qualities = lines[0::4], lines[1::4], lines[2::4], lines[3::4]
+
+    # index of the first invalid line of each kind, counted in records
+    invalid = {}
+    if not all(h.startswith(b'@') for h in headers):
+        invalid['header'] = first_invalid(headers, lambda line: not line.startswith(b'@'))
+    if b''.join(sequences).translate(None, SEQUENCE_CHARS):
+        invalid['sequence'] = first_invalid(sequences, lambda line: line.translate(None, SEQUENCE_CHARS))
+    if not all(p.startswith(b'+') for p in pluses):
+        invalid['plus'] = first_invalid(pluses, lambda line: not line.startswith(b'+'))
+    if b''.join(qualities).translate(None, PHRED_CHARS):
+        invalid['quality'] = first_invalid(qualities, lambda line: line.translate(None, PHRED_CHARS))
+
+    invalid = {k: v for k, v in invalid.items() if v is not None}
+    if not invalid:
+        return True, None
+
+    offset = {'header': 0, 'sequence': 1, 'plus': 2, 'quality': 3}
+    kind, line_tracker = min(((k, first_line + v * 4 + offset[k]) for k, v in invalid.items()), key=lambda x: x[1])
+
+    if kind == 'header':
+        return False, "Line #%s within FASTQ file %s not following FASTQ format, missing '@' at the start of the line" % (
+            line_tracker + 1, fastq)
+    elif kind == 'sequence':
+        return False, "Unknown sequence found in Line #%s within FASTQ file %s" % (line_tracker, file_path)
+    elif kind == 'plus':
+        return False, "Line #%s within FASTQ file %s not following FASTQ format, missing '+' at start of the line" % (
+            line_tracker + 1, fastq)
     else:
-        cmd="pbzip2 -d -c -p"+threads+" "+file_path+" | head -n400000"
-
-    reads_cmd = subprocess.check_output(cmd,stderr=subprocess.STDOUT,shell=True)
-    line_count=0
-    for line_tracker,line in enumerate(reads_cmd.decode('utf-8').strip().split("\n")):
-
-        if line_count%4==0 and not re.findall(r'^@',line):
-            return False,"Line #%s within FASTQ file %s not following FASTQ format, missing '@' at the start of the line" % (line_tracker+1,fastq)
-        elif line_count%4==1 and re.findall(r'[^ACTGURYKMSWBDHVN-]',line): #https://en.wikipedia.org/wiki/FASTA_format
-            return False,"Unknown sequence found in Line #%s within FASTQ file %s" % (line_tracker,file_path)
-        elif line_count%4==2 and not re.findall(r'^\+',line): #https://en.wikipedia.org/wiki/FASTA_format
-            return False,"Line #%s within FASTQ file %s not following FASTQ format, missing '+' at start of the line" % (line_tracker+1,fastq)
-        elif line_count%4==3 \
-            and \
-            re.findall('%r'%'[^'+r''.join([chr(phred+64) for phred in range(0,41)])+']',line) \
-            and \
-            re.findall('%r'%'[^'+r''.join([chr(phred+33) for phred in range(0,42)])+']',line) :
-            return False,"Unknown Phred character found in Line #%s within FASTQ file %s" % (line_tracker+1,fastq)
-        elif line_count==3:
-            line_count=0
-        else:
-            line_count+=1
-        
-    return True,None
\ No newline at end of file
+        return False, "Unknown Phred character found in Line #%s within FASTQ file %s" % (line_tracker + 1, fastq)
@@ -22,7 +22,6 @@
 
 import os
 from base_checker import BaseChecker
-import subprocess
 import re
 
 
@@ -50,23 +49,13 @@ class Checker(BaseChecker):
             bam_file = os.path.join(self.data_dir, f)
 
             # retrieve the @RG from BAM header
-            header = subprocess.check_output(
-                ['samtools', 'view', '-H', bam_file],
-                stderr=subprocess.STDOUT
-            )
-            header_array = header.decode('utf-8').rstrip().split('\n')
+            header = self.bam_headers.get(bam_file)
 
             rg_ids = set()
             duplicated_rg_ids = set()
-            for line in header_array:
-                if not line.startswith("@RG"):
-                    continue
-                rg_array = line.rstrip().replace('\t', '\\t')
-
+            for rg in header.rg:
                 # get rg_id from BAM header
-                rg_id_in_bam = ':'.join([
-                    kv for kv in rg_array.split('\\t') if kv.startswith('ID:')
-                ][0].split(':')[1:])
+                rg_id_in_bam = rg['ID']
 
                 # check rg_id uniqueness
                 if rg_id_in_bam in rg_ids:
@@ -22,7 +22,6 @@
 
 import os
 from base_checker import BaseChecker
-import subprocess
 
 
 class Checker(BaseChecker):
@@ -47,27 +46,14 @@ class Checker(BaseChecker):
             bam_file = os.path.join(self.data_dir, f)
 
             # retrieve the @RG from BAM header
-            header = subprocess.check_output(
-                ['samtools', 'view', '-H', bam_file],
-                stderr=subprocess.STDOUT
-            )
-            header_array = header.decode('utf-8').rstrip().split('\n')
-
-            for line in header_array:
-                if not line.startswith("@RG"):
-                    continue
-                rg_array = line.rstrip().replace('\t', '\\t')
-
-                # get rg_id from BAM header
-                rg_id_in_bam = ':'.join([
-                    kv for kv in rg_array.split('\\t') if kv.startswith('ID:')
-                ][0].split(':')[1:])
+            header = self.bam_headers.get(bam_file)
 
+            for rg in header.rg:
                 if f not in rg_id_in_bams:
                     rg_id_in_bams[f] = []
 
                 # don't need to check rg_id uniquessness as it's checked already elsewehere earlier
-                rg_id_in_bams[f].append(rg_id_in_bam)
+                rg_id_in_bams[f].append(rg['ID'])
 
         read_groups = self.metadata['read_groups']
 
@@ -22,7 +22,6 @@
 
 import os
 from base_checker import BaseChecker
-import subprocess
 
 
 class Checker(BaseChecker):
@@ -49,26 +48,14 @@ class Checker(BaseChecker):
             bam_file = os.path.join(self.data_dir, f)
 
             # retrieve the @RG from BAM header
-            header = subprocess.check_output(
-                ['samtools', 'view', '-H', bam_file],
-                stderr=subprocess.STDOUT
-            )
-            header_array = header.decode('utf-8').rstrip().split('\n')
+            header = self.bam_headers.get(bam_file)
 
             if f not in sm_in_bams:
                 sm_in_bams[f] = set()
 
-            for line in header_array:
-                if not line.startswith("@RG"):
-                    continue
-                rg_array = line.rstrip().replace('\t', '\\t')
-
+            for rg in header.rg:
                 # get sm from BAM header
-                sm_in_bam = ':'.join([
-                    kv for kv in rg_array.split('\\t') if kv.startswith('SM:')
-                ][0].split(':')[1:])
-
-                sm_in_bams[f].add(sm_in_bam)
+                sm_in_bams[f].add(rg['SM'])
 
         offending_bams = {}
         all_sms = set()
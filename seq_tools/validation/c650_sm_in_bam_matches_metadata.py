@@ -23,7 +23,6 @@
 
 import os
 from base_checker import BaseChecker
-import subprocess
 
 
 class Checker(BaseChecker):
@@ -59,23 +58,11 @@ class Checker(BaseChecker):
             bam_file = os.path.join(self.data_dir, f)
 
             # retrieve the @RG from BAM header
-            header = subprocess.check_output(
-                ['samtools', 'view', '-H', bam_file],
-                stderr=subprocess.STDOUT
-            )
-            header_array = header.decode('utf-8').rstrip().split('\n')
-
-            for line in header_array:
-                if not line.startswith("@RG"):
-                    continue
-                rg_array = line.rstrip().replace('\t', '\\t')
+            header = self.bam_headers.get(bam_file)
 
+            for rg in header.rg:
                 # get sm from BAM header
-                sm_in_bam = ':'.join([
-                    kv for kv in rg_array.split('\\t') if kv.startswith('SM:')
-                ][0].split(':')[1:])
-
-                all_sms.add(sm_in_bam)
+                all_sms.add(rg['SM'])
 
         # this could raise exception if 'samples' does not exist in metadata, which is fine
         # earlier check (c130) should have already reported the problem
@@ -22,7 +22,6 @@
 import os
 from collections import defaultdict
 from base_checker import BaseChecker
-from seq_tools.utils import run_cmd
 
 
 field_mapping = [
@@ -92,23 +91,10 @@ class Checker(BaseChecker):
             bam_file = os.path.join(self.data_dir, f)
 
             # retrieve the @RG from BAM header
-            cmd = "samtools view -H %s" % bam_file
-            header, stderr, ret_code = run_cmd(cmd)
-
-            header_array = header.rstrip().split('\n')
+            header = self.bam_headers.get(bam_file)
 
             rgs_in_bam = {}
-            for line in header_array:
-                if not line.startswith("@RG"):
-                    continue
-
-                rg = {}
-                for kv in line.split('\t'):
-                    if ':' not in kv:  # like '@RG'
-                        continue
-                    k, v = kv.split(':')[0], ':'.join(kv.split(':')[1:])
-                    rg[k] = v
-
+            for rg in header.rg:
                 # all RG IDs from one BAM must be unique, this has been checked in c610_rg_id_in_bam
                 rgs_in_bam[rg['ID']] = rg
 
@@ -21,12 +21,15 @@
 
 import os
 from base_checker import BaseChecker
-import subprocess
-import re
+from seq_tools.utils import CommandError, iter_cmd_lines
+
+
+# number of second-in-pair reads for a read group to be considered paired
+PAIRED_READS_THRESHOLD = 10
 
 
 class Checker(BaseChecker):
-    def __init__(self, ctx, metadata,threads, skip=False):
+    def __init__(self, ctx, metadata, threads, skip=False):
         super().__init__(
             ctx=ctx,
             metadata=metadata,
@@ -53,18 +56,18 @@ class Checker(BaseChecker):
             self.message = message
             self.status = 'INVALID'
             return
-    
-            
-        offending_rgs ={}
+
+        offending_rgs = {}
+        bam_rgs = {}
         for rg in self.metadata.get('read_groups'):
-        
+
             if 'is_paired_end' not in rg:
                 message = "Field 'is_pair_end' is not found for readgroup : %s" % rg['submitter_read_group_id']
                 self.logger.info(f'[{self.checker}] {message}')
                 self.message = message
                 self.status = 'INVALID'
                 return
-            elif rg['is_paired_end']==None:
+            elif rg['is_paired_end'] is None:
                 message = "Field 'is_pair_end' for readgroup is null. Must be boolean: %s" % rg['submitter_read_group_id']
                 self.logger.info(f'[{self.checker}] {message}')
                 self.message = message
@@ -73,32 +76,45 @@ class Checker(BaseChecker):
             if not rg['file_r1'].endswith('.bam'):
                 continue
             if rg['file_r1'] not in offending_rgs.keys():
-                offending_rgs[rg['file_r1']]=[]
-
-            bam_file=os.path.join(self.data_dir,rg['file_r1'])
-            cmd=['samtools', 'view',"-@",str(self.threads), '-f','128', bam_file,"|","egrep",rg['read_group_id_in_bam'].replace("'","\\'"),"-m","10","|", "wc","-l"]
-            paired_check = subprocess.check_output(
-                " ".join(cmd),
-                stderr=subprocess.STDOUT,
-                shell=True
-            )
-            paired_check_bool = True if "10" in paired_check.decode('utf-8').strip() else False
+                offending_rgs[rg['file_r1']] = []
+                bam_rgs[rg['file_r1']] = set()
+            bam_rgs[rg['file_r1']].add(rg['read_group_id_in_bam'])
+
+        # one pass over each BAM for all of its read groups
+        second_read_counts = {}
+        for bam in bam_rgs.keys():
+            try:
+                second_read_counts[bam] = count_second_reads(
+                    os.path.join(self.data_dir, bam), bam_rgs[bam], self.threads)
+            except CommandError as e:  # eg, a truncated BAM, its reads so far are not all of them
+                message = "Failed to read BAM '%s': %s" % (bam, e)
+                self.logger.info(f'[{self.checker}] {message}')
+                self.message = message
+                self.status = 'INVALID'
+                return
+
+        for rg in self.metadata.get('read_groups'):
+            if not rg['file_r1'].endswith('.bam'):
+                continue
+
+            paired_check_bool = second_read_counts[rg['file_r1']][rg['read_group_id_in_bam']] >= PAIRED_READS_THRESHOLD
             paired_metadata_bool = rg['is_paired_end']
             if paired_check_bool != paired_metadata_bool:
                 offending_rgs[rg['file_r1']].append(rg['submitter_read_group_id'])
-                
+
                 self.status = 'INVALID'
-                message = "Read group paired status in BAM does not match field 'is_paired_end' in metadata JSON: %s" % rg['submitter_read_group_id']
+                message = "Read group paired status in BAM does not match field 'is_paired_end' in metadata JSON: %s" % \
+                    rg['submitter_read_group_id']
                 self.message = message
                 self.logger.info(f'[{self.checker}] {message}')
 
-        
         msg = []
         for rg in offending_rgs.keys():
-            if len(offending_rgs[rg])>0:
-                msg.append("Offending read groups in BAM %s: %s" % (rg,",".join(offending_rgs[rg])))
-        if msg:    
-            message = "Paired status in BAM does not match field 'is_paired_end' in metadata JSON for the following: %s" % ('; '.join(msg))
+            if len(offending_rgs[rg]) > 0:
+                msg.append("Offending read groups in BAM %s: %s" % (rg, ",".join(offending_rgs[rg])))
+        if msg:
+            message = "Paired status in BAM does not match field 'is_paired_end' in metadata JSON for the following: %s" % \
+                ('; '.join(msg))
             self.logger.info(f'[{self.checker}] {message}')
             self.message = message
             self.status = 'INVALID'
@@ -108,4 +124,37 @@ class Checker(BaseChecker):
             message = "Read group pair status in BAM check: PASS"
             self.message = message
             self.logger.info(f'[{self.checker}] {message}')
-            return
\ No newline at end of file
+            return
+
+
+def count_second_reads(bam_file, rg_ids, threads):
+    """
+    Count second-in-pair reads of the given read groups in one pass over the BAM, the
+    read group of a read is taken from its RG:Z tag and must match exactly. Stops as
+    soon as every read group reaches PAIRED_READS_THRESHOLD reads.
+    """
+    counts = {rg_id: 0 for rg_id in rg_ids}
+    pending = set(rg_ids)
+
+    cmd = ['samtools', 'view', '-@', str(threads), '-f', '128']
+    for rg_id in sorted(rg_ids):
+        cmd += ['-r', rg_id]
+    cmd.append(bam_file)
+
+    for read in iter_cmd_lines(cmd):
+        start = read.find(b'\tRG:Z:')
+        if start < 0:
+            continue
+        start += 6
+        end = read.find(b'\t', start)
+        rg_id = read[start:end if end >= 0 else None].decode('utf-8')
+        if rg_id not in counts:
+            continue
+
+        counts[rg_id] += 1
+        if counts[rg_id] >= PAIRED_READS_THRESHOLD:
+            pending.discard(rg_id)
+            if not pending:
+                break
+
+    return counts
@@ -20,14 +20,22 @@
 
 
 import os
-from xmlrpc.client import boolean
-from base_checker import BaseChecker
-import subprocess
 import re
+import time
+from base_checker import BaseChecker
+from seq_tools.utils import CommandError, iter_cmd_lines
+from seq_tools.read_names import DuplicateReadNames, resolve_duplicates
+
+
+READ_NAME = re.compile(rb'[!-?A-~]{1,254}')
+
+
+def read_group_of(read):
+    return re.findall(r'RG[a-zA-Z0-9._:\ \-\'$]*.?', read.decode('utf-8'))[0]
 
 
 class Checker(BaseChecker):
-    def __init__(self, ctx, metadata,threads, skip=False):
+    def __init__(self, ctx, metadata, threads, skip=False):
         super().__init__(
             ctx=ctx,
             metadata=metadata,
@@ -55,88 +63,106 @@ class Checker(BaseChecker):
             self.message = message
             self.status = 'INVALID'
             return
-            
+
         offending_ids = []
-        query_bams={}
+        query_bams = {}
 
         for rg in self.metadata.get("read_groups"):
             if rg['file_r1'].endswith('.bam'):
                 if rg['file_r1'] not in query_bams:
-                    query_bams[rg['file_r1']]={}
-                    query_bams[rg['file_r1']]['is_paired_end']=rg['is_paired_end']
-                    query_bams[rg['file_r1']]['rg']=[]
+                    query_bams[rg['file_r1']] = {}
+                    query_bams[rg['file_r1']]['is_paired_end'] = rg['is_paired_end']
+                    query_bams[rg['file_r1']]['rg'] = []
                     query_bams[rg['file_r1']]['rg'].append(rg['read_group_id_in_bam'])
                 else:
                     query_bams[rg['file_r1']]['rg'].append(rg['read_group_id_in_bam'])
-                             
-        
-        if len(query_bams)==0:
+
+        if len(query_bams) == 0:
             self.status = 'PASS'
             message = "No BAMs to check"
             self.message = message
             self.logger.info(f'[{self.checker}] {message}')
             return
         else:
+            if self.ctx.obj.get('FULL_SCAN'):
+                # every primary read, sorted hash runs are spilled to disk to bound memory
+                max_reads = None
+                detector_options = {'run_size': 2000000, 'spill': True, 'max_duplicates': 100000}
+            else:
+                max_reads = 500000
+                detector_options = {}
+
             for bam_file in query_bams.keys():
-            
-                is_paired_end=query_bams[bam_file]['is_paired_end']
+
+                is_paired_end = query_bams[bam_file]['is_paired_end']
 
                 if is_paired_end:
-                    filter_flag='-f 64'
+                    filter_flag = ['-f', '64']
                 else:
-                    filter_flag=''
-
-                path_bam_file=os.path.join(self.data_dir,bam_file)
-
-                cmd=[
-                "samtools view -@ "+str(self.threads)+" -F 2304 "+filter_flag+"".join([" -r "+rg.replace("'","\\'") for rg in query_bams[bam_file]['rg']])+" "+path_bam_file,
-                "head -n500000"
-                ]
-            
-            
-                read_records = subprocess.check_output(
-                    "|".join(cmd),
-                    stderr=subprocess.STDOUT,
-                    shell=True
-                )
-
-                if len(read_records.decode('utf-8').split('\n'))<=1:
-                    message = "The following read groups yielded no reads to check in BAM '%s' : %s " %(bam_file,query_bams[bam_file]['rg'])
+                    filter_flag = []
+
+                path_bam_file = os.path.join(self.data_dir, bam_file)
+
+                cmd = ["samtools", "view", "-@", str(self.threads), "-F", "2304"] + filter_flag
+                for rg in query_bams[bam_file]['rg']:
+                    cmd += ["-r", rg]
+                cmd.append(path_bam_file)
+
+                def sampled_reads():
+                    for read in iter_cmd_lines(cmd, max_lines=max_reads):
+                        yield READ_NAME.match(read).group().decode('utf-8'), read
+
+                try:
+                    # first pass keeps only hashes of read names, second pass resolves the duplicated ones
+                    with DuplicateReadNames(**detector_options) as detector:
+                        start = time.time()
+                        for readname, read in sampled_reads():
+                            detector.add(readname)
+
+                        elapsed = max(time.time() - start, 1e-6)
+                        self.logger.info(f'[{self.checker}] Scanned {detector.count} reads in BAM \'{bam_file}\' '
+                                         f'in {elapsed:.1f}s, {detector.count / elapsed:.0f} reads/s')
+
+                        if detector.count == 0:
+                            message = "The following read groups yielded no reads to check in BAM '%s' : %s " % (
+                                bam_file, query_bams[bam_file]['rg'])
+                            self.logger.info(f'[{self.checker}] {message}')
+                            self.message = message
+                            self.status = 'INVALID'
+                            return
+
+                        duplicates = detector.duplicate_hashes()
+
+                    read_dict = {}
+                    if duplicates:
+                        read_dict = resolve_duplicates(sampled_reads(), duplicates, read_group_of)
+                except CommandError as e:  # eg, a truncated BAM, its reads so far are not all of them
+                    message = "Failed to read BAM '%s': %s" % (bam_file, e)
                     self.logger.info(f'[{self.checker}] {message}')
                     self.message = message
                     self.status = 'INVALID'
-                    return   
-
-
-                read_dict={}
-                for ind,read in enumerate(read_records.decode("utf-8").strip().split("\n")[:-1]):
-                    readname=re.findall(r'^[!-?A-~]{1,254}',read)[0]
-                    readgroup=re.findall(r'RG[a-zA-Z0-9._:\ \-\'$]*.?',read)[0]
-                    if readname in read_dict:
-                        read_dict[readname]['count']+=1
-                        if not readgroup in read_dict[readname]['rg']:
-                            read_dict[readname]['rg'].append(readgroup)
-                    else:
-                        read_dict[readname]={"count":1,"rg":[readgroup]}
+                    return
 
                 for read in read_dict.keys():
-                    if read_dict[read]['count']>1:
+                    if read_dict[read]['count'] > 1:
                         self.status = 'INVALID'
-                        if len(read_dict[read]['rg'])>1:
-                            message = "Read name '%s' in BAM '%s' detected in multiple ReadGroups :%s" % (read,bam_file,",".join(["'"+rg+"'" for rg in read_dict[read]['rg']]))
+                        if len(read_dict[read]['rg']) > 1:
+                            message = "Read name '%s' in BAM '%s' detected in multiple ReadGroups :%s" % (
+                                read, bam_file, ",".join(["'" + rg + "'" for rg in read_dict[read]['rg']]))
                         else:
-                            message = "Multiple instances of read name '%s' in BAM '%s' in ReadGroup '%s'" %(read,bam_file,read_dict[read]['rg'][0])
+                            message = "Multiple instances of read name '%s' in BAM '%s' in ReadGroup '%s'" % (
+                                read, bam_file, read_dict[read]['rg'][0])
 
                         self.message = message
                         self.logger.info(f'[{self.checker}] {message}')
                         offending_ids.append(message)
 
         if offending_ids:
-            if len(offending_ids)>=5:
-                offending_ids_cap="Too many conflicts to list. Displaying first five "
+            if len(offending_ids) >= 5:
+                offending_ids_cap = "Too many conflicts to list. Displaying first five "
             else:
-                offending_ids_cap="Following readname anomalies were detected "
-            message = offending_ids_cap+": " + ";".join(offending_ids[:5])
+                offending_ids_cap = "Following readname anomalies were detected "
+            message = offending_ids_cap + ": " + ";".join(offending_ids[:5])
             self.logger.info(f'[{self.checker}] {message}')
             self.message = message
             self.status = 'INVALID'
@@ -20,9 +20,11 @@
 """
 
 import os
+import sqlite3
 from collections import defaultdict
 from base_checker import BaseChecker
-from seq_tools.utils import calculate_md5
+from seq_tools.utils import calculate_md5s
+from seq_tools.checksum_cache import ChecksumCache
 
 
 class Checker(BaseChecker):
@@ -55,10 +57,28 @@ class Checker(BaseChecker):
             if f.get("info") and f["info"].get("original_cram_info"):
                 files_in_metadata.append(f['info']["original_cram_info"])
 
+        cache = None
+        cache_mode = self.ctx.obj.get('MD5_CACHE', 'on')
+        if cache_mode != 'off':
+            try:
+                cache = ChecksumCache(verify=(cache_mode == 'verify'))
+            except (OSError, sqlite3.Error) as e:  # validation goes on without the cache
+                self.logger.info(f'[{self.checker}] Checksum cache not available: {e}')
+
+        # files are hashed concurrently, as many at a time as threads, FASTQs
+        # streamed by c609 are not read again
+        try:
+            real_md5s = calculate_md5s(
+                [os.path.join(self.data_dir, f['fileName']) for f in files_in_metadata],
+                self.threads, self.logger, self.checker, cache, self.file_digests)
+        finally:
+            if cache:
+                cache.close()
+
         mismatches = defaultdict(list)  # dict to keep all mismatches from all files
         for f in files_in_metadata:
             seq_file = os.path.join(self.data_dir, f['fileName'])
-            real_md5 = calculate_md5(seq_file)
+            real_md5 = real_md5s[seq_file]
             if not real_md5 == f['fileMd5sum']:
                 mismatches[f['fileName']].append(
                         "%s: %s vs %s" % ('fileMd5sum', real_md5, f['fileMd5sum']))
@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    # keep tests away from the checksum cache, release lookup and schema under ~/.cache,
+    # so that results do not depend on earlier runs
+    cache_dir = tmp_path / 'cache'
+    monkeypatch.setenv('XDG_CACHE_HOME', str(cache_dir))
+    return cache_dir
@@ -0,0 +1,58 @@
+import os
+import pytest
+from glob import glob
+from seq_tools.bam_header import BamHeader, BamHeaderCache, read_bam_header, read_bam_header_text
+
+test_dir = os.path.abspath(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_parse_header_text():
+    header = BamHeader(
+        "@HD\tVN:1.5\tSO:coordinate\n"
+        "@SQ\tSN:1\tLN:249250621\n"
+        "@SQ\tSN:2\tLN:243199373\n"
+        "@RG\tID:C0HVY:2\tSM:HCC1160T\tPU:C0HVY.2\n"
+        "@PG\tID:bwa\tPN:bwa\n"
+        "@CO\tuser comment\n"
+    )
+
+    assert header.hd == {'VN': '1.5', 'SO': 'coordinate'}
+    assert [sq['SN'] for sq in header.sq] == ['1', '2']
+    assert header.rg == [{'ID': 'C0HVY:2', 'SM': 'HCC1160T', 'PU': 'C0HVY.2'}]  # value may contain ':'
+    assert header.pg == [{'ID': 'bwa', 'PN': 'bwa'}]
+    assert header.co == ['user comment']
+
+
+def test_header_cache_reads_once():
+    bam_file = os.path.join(test_dir, 'seq-data', 'test_rg_6.bam')
+    cache = BamHeaderCache()
+
+    header = cache.get(bam_file)
+    assert cache.get(bam_file) is header
+    assert [rg['ID'] for rg in header.rg]
+
+
+def test_read_bam_header_in_process():
+    text, references = read_bam_header(os.path.join(test_dir, 'seq-data', 'test_rg_6.bam'))
+
+    assert text.startswith('@HD\t')
+    assert references[0] == ('1', 249250621)
+    assert len(BamHeader(text).sq) == len(references)
+
+
+def test_read_non_bam():
+    with pytest.raises(ValueError):
+        read_bam_header(os.path.join(test_dir, 'seq-data', 'C0HVY.2_r1.fq.bz2'))
+
+
+@pytest.mark.parametrize('bam_file', sorted(glob(os.path.join(test_dir, 'seq-data', 'test_rg_[3456]*.bam'))))
+def test_in_process_header_matches_samtools(bam_file):
+    try:
+        expected = BamHeader(read_bam_header_text(bam_file, use_samtools=True))
+    except Exception:
+        pytest.skip('not a valid BAM for samtools either')
+
+    header = BamHeader(read_bam_header_text(bam_file))
+    assert header.hd == expected.hd
+    assert header.sq == expected.sq
+    assert header.rg == expected.rg
@@ -0,0 +1,92 @@
+import os
+from types import SimpleNamespace
+from seq_tools.checkpoints import CheckpointStore, track, inputs_digest
+
+
+def test_metadata_reads_recorded():
+    metadata = {
+        'read_groups': [{'submitter_read_group_id': 'rg1', 'platform_unit': 'pu1'}],
+        'files': [{'fileName': 'a.bam'}]
+    }
+    reads = set()
+    tracked = track(metadata, (), reads)
+
+    ids = [rg['submitter_read_group_id'] for rg in tracked.get('read_groups')]
+    assert ids == ['rg1']
+    assert 'samples' not in tracked
+    assert reads == {('read_groups', '~'), ('read_groups', '#'), ('read_groups', '*', 'submitter_read_group_id'),
+                     ('samples', '~')}
+
+    changed = {'read_groups': [{'submitter_read_group_id': 'rg1', 'platform_unit': 'pu2'}], 'files': []}
+    for path in reads:  # nothing read has changed
+        assert inputs_digest(metadata, path) == inputs_digest(changed, path)
+    assert inputs_digest(metadata, ('read_groups', '*', 'platform_unit')) != \
+        inputs_digest(changed, ('read_groups', '*', 'platform_unit'))
+
+
+def test_failed_metadata_check_not_reading_data_files(tmp_path):
+    import logging
+    import click
+    from seq_tools.validation import load_checker
+
+    BaseChecker = load_checker('base_checker').BaseChecker
+
+    class Checker(BaseChecker):
+        @BaseChecker._catch_exception
+        def check(self):
+            raise ValueError(self.metadata['read_groups'])
+
+    logger = logging.getLogger('test_checkpoints')
+    handler = logging.FileHandler(str(tmp_path / 'seq-tools.log'))
+    logger.addHandler(handler)
+    ctx = click.Context(click.Command('validate'), obj={
+        'LOGGER': logger,
+        'validation_report': {'data_dir': '/data', 'data_files': [], 'validation': {'checks': []}}
+    })
+    checker = Checker(ctx, {'read_groups': []}, 'c000_failing', 1)
+    try:
+        checker.check()
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+    # only reads of data files get the result invalidated when data files change
+    assert checker.status == 'UNKNOWN'
+    assert not checker.reads_data
+
+
+def test_checkpoints_written_at_most_every_interval(tmp_path):
+    metadata = {'files': [{'fileName': 'a.bam'}]}
+    store = CheckpointStore(str(tmp_path), 'sequencing_experiment.json', None, metadata, [])
+
+    for name in ('c180_file_uniqueness', 'c210_no_path_in_filename'):
+        store.save(SimpleNamespace(checker=name, status='PASS', message='ok', reads_data=False,
+                                   metadata_reads={('files', '*', 'fileName')}, dependency_statuses=dict))
+    assert not os.listdir(str(tmp_path))  # checks completing within SAVE_INTERVAL
+
+    store.flush()
+    resumed = CheckpointStore(str(tmp_path), 'sequencing_experiment.json', None, metadata, [], resume=True)
+    checker = SimpleNamespace(checker='c210_no_path_in_filename', status=None, message=None, dependency_statuses=dict)
+    assert resumed.restore(checker)
+    assert (checker.status, checker.message) == ('PASS', 'ok')
+
+
+def test_results_not_reused_with_other_options(tmp_path):
+    metadata = {'files': [{'fileName': 'a.bam'}]}
+    options = {'FULL_SCAN': False, 'MD5_CACHE': 'on', 'LOGGER': None}
+    store = CheckpointStore(str(tmp_path), 'sequencing_experiment.json', None, metadata, [], options=options)
+    store.save(SimpleNamespace(checker='c680_repeated_read_names_per_group_in_bam', status='PASS', message='ok',
+                               reads_data=True, metadata_reads=set(), dependency_statuses=dict))
+    store.flush()
+
+    def restored(**changed):
+        resumed = CheckpointStore(str(tmp_path), 'sequencing_experiment.json', None, metadata, [],
+                                  resume=True, options=dict(options, **changed))
+        checker = SimpleNamespace(checker='c680_repeated_read_names_per_group_in_bam', status=None, message=None,
+                                  dependency_statuses=dict)
+        return resumed.restore(checker)
+
+    assert restored()
+    assert restored(LOGGER='another logger')  # not changing results
+    assert not restored(FULL_SCAN=True)
+    assert not restored(MD5_CACHE='verify')
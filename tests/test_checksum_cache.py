@@ -0,0 +1,47 @@
+import os
+import hashlib
+from seq_tools.checksum_cache import ChecksumCache
+from seq_tools.utils import calculate_md5s
+
+
+def test_cached_md5_used_until_file_changes(tmp_path):
+    data_file = tmp_path / 'reads.fq.gz'
+    data_file.write_bytes(b'ACGT')
+
+    with ChecksumCache(cache_dir=str(tmp_path / 'cache')) as cache:
+        fingerprint = cache.fingerprint(str(data_file))
+        assert cache.get(fingerprint) is None
+
+        cache.put(fingerprint, 'cached-md5')
+        assert calculate_md5s([str(data_file)], cache=cache) == {str(data_file): 'cached-md5'}
+
+        data_file.write_bytes(b'ACGTN')  # size and mtime change, entry is stale
+        os.utime(str(data_file), ns=(0, 0))
+        assert cache.get(cache.fingerprint(str(data_file))) is None
+        assert calculate_md5s([str(data_file)], cache=cache) == {
+            str(data_file): hashlib.md5(b'ACGTN').hexdigest()}
+
+
+def test_verify_replaces_wrong_cache_entry(tmp_path):
+    data_file = tmp_path / 'reads.bam'
+    data_file.write_bytes(b'BAM')
+    real_md5 = hashlib.md5(b'BAM').hexdigest()
+
+    with ChecksumCache(cache_dir=str(tmp_path), verify=True) as cache:
+        fingerprint = cache.fingerprint(str(data_file))
+        cache.put(fingerprint, 'wrong-md5')
+
+        assert calculate_md5s([str(data_file)], cache=cache) == {str(data_file): real_md5}
+        assert cache.get(fingerprint) == real_md5
+
+
+def test_unused_entries_evicted(tmp_path):
+    data_file = tmp_path / 'reads.bam'
+    data_file.write_bytes(b'BAM')
+
+    with ChecksumCache(cache_dir=str(tmp_path)) as cache:
+        fingerprint = cache.fingerprint(str(data_file))
+        cache.put(fingerprint, 'md5')
+
+    with ChecksumCache(cache_dir=str(tmp_path), max_age_days=-1) as cache:
+        assert cache.get(fingerprint) is None
@@ -0,0 +1,46 @@
+import os
+from seq_tools.validation import load_checker
+
+test_dir = os.path.abspath(os.path.dirname(os.path.abspath(__file__)))
+
+fastq_test_format = load_checker('c609_fastq_sanity').fastq_test_format
+
+
+def record(name, seq, qual):
+    return [b'@' + name, seq, b'+', qual]
+
+
+def test_valid_records():
+    lines = record(b'r1', b'ACGTN', b'!!IJJ') + record(b'r2', b'ACGTN', b'@@hhh')  # phred+33 and phred+64
+    assert fastq_test_format('x.fq.gz', '/data/x.fq.gz', lines) == (True, None)
+
+
+def test_first_problem_reported():
+    lines = record(b'r1', b'ACGTN', b'IIIII') + record(b'r2', b'ACGTX', b'IIIII') + [b'r3', b'A', b'+', b'I']
+    test_pass, message = fastq_test_format('x.fq.gz', '/data/x.fq.gz', lines)
+
+    assert not test_pass
+    assert message == "Unknown sequence found in Line #5 within FASTQ file /data/x.fq.gz"
+
+
+def test_phred_scores_above_41():
+    lines = record(b'r1', b'ACGTN', b'#IJK~')  # 'K' and above are scores over 41 with phred+33
+    assert fastq_test_format('x.fq.gz', '/data/x.fq.gz', lines) == (True, None)
+
+
+def test_unknown_phred_character():
+    lines = record(b'r1', b'ACGTN', b'IIIII') + record(b'r2', b'ACGTN', b'II II')
+    assert fastq_test_format('x.fq.gz', '/data/x.fq.gz', lines) == (
+        False, "Unknown Phred character found in Line #8 within FASTQ file x.fq.gz")
+
+
+def test_truncated_fastq(tmp_path):
+    fastq_sanity = load_checker('c609_fastq_sanity').fastq_sanity
+    with open(os.path.join(test_dir, 'seq-data', 'C0HVY.2_r1.fq.gz'), 'rb') as f:
+        data = f.read()
+    (tmp_path / 'x.fq.gz').write_bytes(data[:len(data) // 2])
+
+    # error of the decompressor is reported, not counted as FASTQ lines
+    line_count, message = fastq_sanity('x.fq.gz', str(tmp_path), '1')
+    assert line_count is None
+    assert message.startswith("Failed to decompress FASTQ file x.fq.gz, 'unpigz' exited with code")
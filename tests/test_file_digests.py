@@ -0,0 +1,26 @@
+import threading
+from seq_tools.file_digests import FileDigests
+
+
+def test_md5_waits_for_claimer():
+    digests = FileDigests()
+    assert digests.claim('/data/r1.fq.gz')
+    assert not digests.claim('/data/r1.fq.gz')
+
+    result = []
+    waiter = threading.Thread(
+        target=lambda: result.append(digests.md5('/data/r1.fq.gz', lambda path: 'calculated')))
+    waiter.start()
+
+    digests.set('/data/r1.fq.gz', 'streamed')
+    waiter.join()
+    assert result == ['streamed']
+
+
+def test_md5_calculated_after_release():
+    digests = FileDigests()
+    assert digests.claim('/data/r2.fq.gz')
+    digests.release('/data/r2.fq.gz')  # claimer failed
+
+    assert digests.md5('/data/r2.fq.gz', lambda path: 'calculated') == 'calculated'
+    assert digests.md5('/data/r2.fq.gz', lambda path: 'again') == 'calculated'
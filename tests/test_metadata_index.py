@@ -0,0 +1,74 @@
+import pytest
+from seq_tools.checkpoints import ANY, LENGTH
+from seq_tools.metadata_index import MetadataIndex, TrackedIndex
+
+
+METADATA = {
+    'files': [{'fileName': 'a.bam'}, {'fileName': ''}, {'fileName': 'r1.fq.gz'}, 'not a dict'],
+    'read_groups': [
+        {'submitter_read_group_id': 'rg1', 'file_r1': 'a.bam', 'file_r2': 'a.bam', 'read_group_id_in_bam': 'x'},
+        {'submitter_read_group_id': 'x', 'file_r1': 'a.bam', 'file_r2': 'a.bam'},
+        {'submitter_read_group_id': 'rg3', 'file_r1': 'r1.fq.gz', 'file_r2': 'r2.fq.gz'},
+        {'submitter_read_group_id': 'rg4'},
+    ]
+}
+
+
+def test_metadata_index():
+    index = MetadataIndex(METADATA)
+
+    assert index.file_names == ('a.bam', None, 'r1.fq.gz', None)
+    assert index.read_group_files == {'a.bam', 'r1.fq.gz', 'r2.fq.gz'}
+    assert index.bam_files == {'a.bam'}
+    assert dict(index.rg_ids_in_bam) == {'a.bam': {'x'}}
+    assert dict(index.submitter_rg_ids_alone) == {'a.bam': ('x',)}
+    assert index.incomplete_read_groups == (3,)  # no file_r1
+
+
+def test_metadata_index_read_only():
+    index = MetadataIndex(METADATA)
+
+    with pytest.raises(AttributeError):
+        index.bam_files = frozenset()
+    with pytest.raises(TypeError):
+        index.rg_ids_in_bam['b.bam'] = frozenset()
+
+
+def test_metadata_index_of_malformed_metadata():
+    index = MetadataIndex({'files': 'not a list'})
+
+    assert index.file_names == ()
+    assert index.files_malformed
+    assert not index.rg_ids_in_bam
+
+    index = MetadataIndex({
+        'files': [{'fileName': ['a.bam']}],
+        'read_groups': [
+            {'file_r1': 'a.bam', 'read_group_id_in_bam': ['x']},
+            {'file_r1': 'a.bam', 'submitter_read_group_id': {'id': 'y'}},
+            {'file_r1': 'a.bam'},
+            {'file_r1': ['a.bam']},
+            None
+        ]
+    })
+    assert index.file_names == (['a.bam'],)
+    assert not index.files_malformed
+    assert dict(index.rg_ids_in_bam) == {'a.bam': set()}
+    assert dict(index.submitter_rg_ids_alone) == {'a.bam': ()}
+    assert index.incomplete_read_groups == (0, 1, 2, 3, 4)
+
+    # plain values compared as they are, as c240 did, not making its result UNKNOWN
+    index = MetadataIndex({'read_groups': [
+        {'file_r1': 'a.bam', 'read_group_id_in_bam': False},
+        {'file_r1': 'a.bam', 'read_group_id_in_bam': None, 'submitter_read_group_id': 0}
+    ]})
+    assert dict(index.rg_ids_in_bam) == {'a.bam': {False}}
+    assert dict(index.submitter_rg_ids_alone) == {'a.bam': (0,)}
+    assert not index.incomplete_read_groups
+
+
+def test_tracked_index_records_reads():
+    reads = set()
+    TrackedIndex(MetadataIndex(METADATA), reads).file_names
+
+    assert reads == {('files', LENGTH), ('files', ANY, 'fileName')}
@@ -0,0 +1,132 @@
+import io
+import copy
+import json
+import logging
+import contextlib
+import click
+import pytest
+from seq_tools.cli import validate
+from seq_tools.metadata_rules import MetadataRule, evaluate
+from seq_tools.validation import checker_registry, load_checker, perform_validation
+
+
+class Seen(MetadataRule):
+    requires = (('read_groups', "Missing 'read_groups'"),)
+
+    def start(self):
+        self.seen = []
+
+    def read_group(self, rg):
+        self.seen.append(rg['id'])
+        if rg['id'] == 'stop':
+            self.invalid('stopped')
+
+    def file(self, fl):
+        self.seen.append(fl['fileName'])
+
+    def result(self):
+        self.passed('seen: %s' % ', '.join(self.seen))
+
+
+class Failing(MetadataRule):
+    def read_group(self, rg):
+        raise ValueError(rg)
+
+
+class ReadGroupsIfAny(MetadataRule):
+    optional = ('read_groups',)
+
+    def read_group(self, rg):
+        pass
+
+    def result(self):
+        self.passed('done')
+
+
+class Counting(MetadataRule):
+    def result(self):
+        self.passed(str(len(self.metadata['files'])))
+
+
+def test_rules_evaluated_together():
+    metadata = {'read_groups': [{'id': 'a'}, {'id': 'b'}], 'files': [{'fileName': 'f'}]}
+    rules = [Seen(metadata), Failing(metadata), Counting(metadata)]
+    evaluate(rules, metadata)
+
+    assert (rules[0].status, rules[0].message) == ('PASS', 'seen: a, b, f')
+    assert rules[1].status is None and 'ValueError' in rules[1].error
+    assert (rules[2].status, rules[2].message) == ('PASS', '1')
+
+
+def test_concluded_rule_gets_nothing_more():
+    metadata = {'read_groups': [{'id': 'a'}, {'id': 'stop'}, {'id': 'c'}], 'files': [{'fileName': 'f'}]}
+    rule = Seen(metadata)
+    evaluate([rule], metadata)
+
+    assert (rule.status, rule.message) == ('INVALID', 'stopped')
+    assert rule.seen == ['a', 'stop']
+
+
+def test_required_and_missing_sections():
+    metadata = {'files': [{'fileName': 'f'}]}
+    rules = [Seen(metadata), Failing(metadata), ReadGroupsIfAny(metadata)]
+    evaluate(rules, metadata)
+
+    assert (rules[0].status, rules[0].message) == ('INVALID', "Missing 'read_groups'")
+    assert rules[1].error == "Section 'read_groups' not found in the metadata"
+    assert rules[2].status == 'PASS'
+
+    metadata = {'read_groups': None}
+    rule = ReadGroupsIfAny(metadata)
+    evaluate([rule], metadata)
+    assert rule.status is None and 'TypeError' in rule.error  # populated with no list
+
+
+def test_rule_checkers_known_without_importing():
+    for name, info in checker_registry().items():
+        assert info.rule == (getattr(load_checker(name).Checker, 'rule', None) is not None), name
+    assert checker_registry()['c110_rg_id_uniqueness'].rule
+    assert not checker_registry()['c683_fileMd5sum_match'].rule
+
+
+def malformed(metadata):
+    yield metadata
+    for section in ('read_groups', 'files', 'samples'):
+        m = copy.deepcopy(metadata)
+        del m[section]
+        yield m
+
+        m = copy.deepcopy(metadata)
+        m[section].append(copy.deepcopy(m[section][0]))
+        yield m
+
+    for section in ('read_groups', 'files'):
+        for key in metadata[section][0]:
+            for value in (None, 1, 'a/b.bam'):
+                m = copy.deepcopy(metadata)
+                m[section][0][key] = value
+                yield m
+
+
+@pytest.mark.parametrize('metadata_file', ['HCC1160T.valid/sequencing_experiment.json',
+                                           'HCC1143N.WGS.fastq/HCC1143N.WGS.fastq.valid.json'])
+def test_rules_run_together_as_one_by_one(metadata_file):
+    with open('tests/submissions/%s' % metadata_file) as f:
+        metadata = json.load(f)
+
+    logger = logging.getLogger('test_metadata_rules')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    def checks(metadata_str, skip_checks, **options):
+        ctx = click.Context(validate, obj={'LOGGER': logger, 'OFFLINE': True, **options})
+        with contextlib.redirect_stdout(io.StringIO()):
+            perform_validation(ctx, metadata_str=metadata_str, skip_checks=skip_checks)
+        return [(c['checker'], c['status'], c['message'])
+                for c in ctx.obj['validation_report']['validation']['checks']]
+
+    for m in malformed(metadata):
+        metadata_str = json.dumps(m)
+        for skip_checks in (None, ['c180', 'c190']):
+            # with --metrics checks run one by one, each measured
+            assert checks(metadata_str, skip_checks) == checks(metadata_str, skip_checks, MEASURE=True)
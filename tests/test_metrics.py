@@ -0,0 +1,77 @@
+import sys
+import time
+import threading
+import subprocess
+from seq_tools.metrics import CheckMetrics, carry, measure, record_bytes_read, record_subprocess, rollup
+
+
+def test_measure_records_from_helper_threads():
+    metrics = CheckMetrics()
+    with measure(metrics):
+        record_subprocess()
+        record_bytes_read(10)
+        helper = threading.Thread(target=carry(record_bytes_read), args=(5,))
+        helper.start()
+        helper.join()
+
+    record_bytes_read(100)  # not in a check, not recorded
+
+    assert metrics.bytes_read == 15
+    assert metrics.subprocesses == 1
+    assert metrics.wall_s > 0
+
+
+def test_rollup():
+    m = CheckMetrics()
+    m.bytes_read = 10
+    m.subprocesses = 1
+    m.peak_rss_mb = 50.0
+    checks = [
+        {'checker': 'c2', 'status': 'PASS', 'metrics': m.to_dict()},
+        {'checker': 'c1', 'status': 'PASS', 'metrics': m.to_dict()},
+        {'checker': 'c3', 'status': 'PASS'},  # reused from checkpoint
+    ]
+    total = rollup([{'validation': {'checks': checks}}] * 2)
+
+    assert total['checks'] == 4
+    assert total['bytes_read'] == 40
+    assert total['peak_rss_mb'] == 50.0
+    assert list(total['checkers']) == ['c1', 'c2']
+    assert total['checkers']['c1']['subprocesses'] == 2
+    assert total['child_cpu_s'] is None  # not known for any of the checks
+
+
+def test_measure_cpu_of_helper_threads_and_commands():
+    def spin():
+        end = time.thread_time() + 0.05
+        while time.thread_time() < end:
+            pass
+
+    metrics = CheckMetrics()
+    with measure(metrics):
+        helper = threading.Thread(target=carry(spin))
+        helper.start()
+        helper.join()
+        subprocess.run([sys.executable, '-c', 'import time; end = time.process_time() + 0.05\n'
+                        'while time.process_time() < end: pass'], check=True)
+
+    assert metrics.cpu_s >= 0.05
+    assert metrics.child_cpu_s >= 0.05
+
+
+def test_command_cpu_not_known_for_overlapping_checks():
+    first, second = CheckMetrics(), CheckMetrics()
+    both_started = threading.Barrier(2)
+
+    def check(metrics):
+        with measure(metrics):
+            both_started.wait()
+
+    checks = [threading.Thread(target=check, args=(m,)) for m in (first, second)]
+    for t in checks:
+        t.start()
+    for t in checks:
+        t.join()
+
+    assert first.child_cpu_s is None and second.child_cpu_s is None
+    assert first.to_dict()['child_cpu_s'] is None
@@ -0,0 +1,69 @@
+from seq_tools.openmetrics import format_metrics, read_textfile, write_textfile
+
+
+def _reports():
+    summary_report = {
+        'summary': {'PASS': 1, 'INVALID': 1},
+        'started_at': '2020-05-01T12:00:00.000Z',
+        'ended_at': '2020-05-01T12:01:30.500Z'
+    }
+    validation_reports = [
+        {
+            'data_files': ['a.bam', 'b.bam'],
+            'validation': {'checks': [
+                {'checker': 'c683_fileMd5sum_match', 'status': 'PASS', 'metrics': {'wall_s': 0.2, 'bytes_read': 100}},
+                {'checker': 'c110_rg_id_uniqueness', 'status': 'PASS'}  # reused from a checkpoint
+            ]}
+        },
+        {
+            'data_files': ['c.bam'],
+            'validation': {'checks': [
+                {'checker': 'c683_fileMd5sum_match', 'status': 'INVALID', 'metrics': {'wall_s': 40, 'bytes_read': 50}}
+            ]}
+        }
+    ]
+    return summary_report, validation_reports
+
+
+def test_format_metrics():
+    lines = format_metrics(*_reports()).split('\n')
+
+    assert 'seq_tools_metadata_files_total{status="INVALID"} 1' in lines
+    assert 'seq_tools_data_files_total 3' in lines
+    assert 'seq_tools_checks_total{checker="c683_fileMd5sum_match",status="PASS"} 1' in lines
+    assert 'seq_tools_checks_total{checker="c110_rg_id_uniqueness",status="PASS"} 1' in lines
+    assert 'seq_tools_check_duration_seconds_bucket{checker="c683_fileMd5sum_match",le="0.5"} 1' in lines
+    assert 'seq_tools_check_duration_seconds_bucket{checker="c683_fileMd5sum_match",le="60"} 2' in lines
+    assert 'seq_tools_check_duration_seconds_bucket{checker="c683_fileMd5sum_match",le="+Inf"} 2' in lines
+    assert 'seq_tools_check_duration_seconds_count{checker="c683_fileMd5sum_match"} 2' in lines
+    assert not any(line.startswith('seq_tools_check_duration_seconds_count{checker="c110') for line in lines)
+    assert 'seq_tools_check_bytes_read_total{checker="c683_fileMd5sum_match"} 150' in lines
+    assert 'seq_tools_validation_duration_seconds 90.5' in lines
+    assert 'seq_tools_validation_last_run_timestamp_seconds 1588334490.5' in lines
+    assert '# EOF' not in lines  # Prometheus text format, not OpenMetrics
+
+
+def test_write_textfile(tmp_path):
+    textfile = tmp_path / 'seq_tools.prom'
+    write_textfile(str(textfile), *_reports())
+
+    assert textfile.read_text() == format_metrics(*_reports())
+    assert not [p.name for p in tmp_path.iterdir() if p.name.endswith('.tmp')]
+
+
+def test_counters_add_up_runs(tmp_path):
+    textfile = str(tmp_path / 'seq_tools.prom')
+    write_textfile(textfile, *_reports())
+    summary_report, validation_reports = _reports()
+    summary_report['summary'] = {'PASS': 1}
+    summary_report['ended_at'] = '2020-05-01T12:00:10.000Z'
+    write_textfile(textfile, summary_report, validation_reports[:1])
+
+    samples = read_textfile(textfile)
+    assert samples['seq_tools_metadata_files_total{status="PASS"}'] == 2
+    assert samples['seq_tools_metadata_files_total{status="INVALID"}'] == 1  # from the first run only
+    assert samples['seq_tools_data_files_total'] == 5
+    assert samples['seq_tools_check_duration_seconds_count{checker="c683_fileMd5sum_match"}'] == 3
+    assert samples['seq_tools_check_duration_seconds_sum{checker="c683_fileMd5sum_match"}'] == 40.4
+    assert samples['seq_tools_check_bytes_read_total{checker="c683_fileMd5sum_match"}'] == 250
+    assert samples['seq_tools_validation_duration_seconds'] == 10  # gauges are of the last run
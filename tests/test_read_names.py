@@ -0,0 +1,43 @@
+import os
+from seq_tools.read_names import DuplicateReadNames, resolve_duplicates
+
+
+def test_duplicates_across_sorted_runs():
+    reads = [('r%s' % i, 'RG:Z:%s' % (i % 2)) for i in range(10)] + [('r3', 'RG:Z:x'), ('r7', 'RG:Z:1')]
+    detector = DuplicateReadNames(run_size=4)
+    for name, _ in reads:
+        detector.add(name)
+
+    duplicates = detector.duplicate_hashes()
+    assert detector.count == 12
+    assert duplicates == {hash('r3'), hash('r7')}
+
+    assert resolve_duplicates(reads, duplicates, lambda read: read) == {
+        'r3': {'count': 2, 'rg': ['RG:Z:1', 'RG:Z:x']},
+        'r7': {'count': 2, 'rg': ['RG:Z:1']}
+    }
+
+
+def test_hash_collision_not_reported():
+    reads = [('a', 'RG:Z:1'), ('b', 'RG:Z:1')]
+    # pretend the two names share a hash
+    assert resolve_duplicates(reads, {hash('a'), hash('b')}, lambda read: read) == {}
+
+
+def test_spilled_runs():
+    with DuplicateReadNames(run_size=3, spill=True) as detector:
+        for name in ['a', 'b', 'c', 'd', 'a', 'e', 'f', 'g', 'd', 'h']:
+            detector.add(name)
+
+        assert detector.duplicate_hashes() == {hash('a'), hash('d')}
+
+
+def test_spilled_runs_merged_in_passes():
+    names = ['r%s' % (i % 40) for i in range(45)]  # r0 to r4 repeated
+    with DuplicateReadNames(run_size=2, spill=True, max_open_runs=3) as detector:
+        for name in names:
+            detector.add(name)
+
+        assert detector.duplicate_hashes() == {hash('r%s' % i) for i in range(5)}
+        # 23 runs were merged down to at most 3 open at once
+        assert len(os.listdir(detector._spill_dir)) <= 3
@@ -0,0 +1,91 @@
+import json
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import pytest
+from seq_tools.schema import SchemaProvider
+
+
+SCHEMA = {
+    'schema': {
+        'properties': {
+            'read_groups': {
+                'type': 'array',
+                'items': {'properties': {'submitter_read_group_id': {'pattern': '^[a-z]{1,5}$'}}}
+            }
+        }
+    }
+}
+
+
+@pytest.fixture
+def schema_server():
+    """Local stand-in for GitHub serving the metadata schema, counting the requests it gets"""
+    server = HTTPServer(('127.0.0.1', 0), None)
+    server.requests = 0
+    server.status = 200
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            server.requests += 1
+            body = json.dumps(SCHEMA).encode()
+            self.send_response(server.status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server.RequestHandlerClass = Handler
+    server.url = 'http://127.0.0.1:%s/sequencing_experiment.json' % server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_schema_downloaded_once(schema_server, tmp_path):
+    provider = SchemaProvider(schema_server.url, cache_dir=str(tmp_path))
+    pattern = provider.pattern('read_groups', 'submitter_read_group_id')
+
+    assert pattern.pattern == '^[a-z]{1,5}$'
+    assert provider.pattern('read_groups', 'submitter_read_group_id') is pattern
+
+    # another process gets it from the disk cache
+    other = SchemaProvider(schema_server.url, cache_dir=str(tmp_path))
+    assert other.pattern('read_groups', 'submitter_read_group_id').pattern == '^[a-z]{1,5}$'
+    assert schema_server.requests == 1
+
+
+def test_stale_cache_used_when_download_fails(schema_server, tmp_path):
+    SchemaProvider(schema_server.url, cache_dir=str(tmp_path)).schema()
+    schema_server.status = 500
+
+    provider = SchemaProvider(schema_server.url, cache_dir=str(tmp_path), ttl=0)
+    assert provider.pattern('read_groups', 'submitter_read_group_id').pattern == '^[a-z]{1,5}$'
+    assert schema_server.requests == 2
+
+
+def test_failed_download_not_tried_again(schema_server, tmp_path):
+    schema_server.status = 500
+    SchemaProvider(schema_server.url, cache_dir=str(tmp_path)).schema()
+
+    # other processes use the fallback schema without downloading again for a while
+    other = SchemaProvider(schema_server.url, cache_dir=str(tmp_path))
+    assert other.pattern('read_groups', 'submitter_read_group_id').pattern == r'^[a-zA-Z0-9\-_:\.]{1,98}$'
+    assert schema_server.requests == 1
+
+    schema_server.status = 200
+    retried = SchemaProvider(schema_server.url, cache_dir=str(tmp_path), failure_ttl=0)
+    assert retried.pattern('read_groups', 'submitter_read_group_id').pattern == '^[a-z]{1,5}$'
+    assert schema_server.requests == 2
+
+
+def test_fallback_schema(schema_server, tmp_path):
+    schema_server.status = 404
+    provider = SchemaProvider(schema_server.url, cache_dir=str(tmp_path))
+    assert provider.pattern('read_groups', 'submitter_read_group_id').match('C0HVY:2')
+
+    offline = SchemaProvider(schema_server.url, cache_dir=str(tmp_path / 'offline'), offline=True)
+    assert offline.pattern('read_groups', 'submitter_read_group_id').pattern == r'^[a-zA-Z0-9\-_:\.]{1,98}$'
+    assert schema_server.requests == 1
@@ -0,0 +1,30 @@
+import json
+from seq_tools import trace
+
+
+def test_trace_events(tmp_path):
+    trace_file = str(tmp_path / 'trace.json')
+    trace.start()
+    try:
+        with trace.span('c683_fileMd5sum_match', 'checker') as attrs:
+            with trace.span('md5', 'io', file='a.bam') as io_attrs:
+                io_attrs['bytes'] = 10
+            attrs['status'] = 'PASS'
+        trace.write(trace_file)
+    finally:
+        trace._tracer = None
+
+    with open(trace_file) as f:
+        events = json.load(f)['traceEvents']
+
+    spans = {e['name']: e for e in events if e['ph'] == 'X'}
+    assert spans['md5']['args'] == {'file': 'a.bam', 'bytes': 10}
+    assert spans['c683_fileMd5sum_match']['args'] == {'status': 'PASS'}
+    # the checker span encloses the file read
+    assert spans['c683_fileMd5sum_match']['ts'] <= spans['md5']['ts']
+    assert any(e['name'] == 'thread_name' and e['args']['name'] == 'MainThread' for e in events)
+
+
+def test_span_without_tracing():
+    with trace.span('md5', 'io', file='a.bam') as attrs:
+        attrs['bytes'] = 10  # attributes can be set, nothing is recorded
@@ -0,0 +1,109 @@
+import json
+import time
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import pytest
+from seq_tools.utils import get_latest_releases
+
+
+RELEASES = [
+    {'tag_name': '2.0.0rc1', 'prerelease': True},
+    {'tag_name': '1.2.0', 'prerelease': False},
+    {'tag_name': '1.1.0', 'prerelease': False},
+]
+
+
+@pytest.fixture
+def github():
+    """Local stand-in for the GitHub releases API, counting the requests it gets"""
+    server = HTTPServer(('127.0.0.1', 0), None)
+    server.requests = 0
+    server.delay = 0
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            server.requests += 1
+            time.sleep(server.delay)
+            body = json.dumps(RELEASES).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server.RequestHandlerClass = Handler
+    server.url = 'http://127.0.0.1:%s/releases' % server.server_port
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_releases_looked_up_once_then_cached(github, tmp_path):
+    cache_file = str(tmp_path / 'releases.json')
+
+    for _ in range(3):
+        releases = get_latest_releases(github.url, cache_file=cache_file)
+        assert releases == {'stable': '1.2.0', 'prerelease': '2.0.0rc1'}
+
+    assert github.requests == 1
+
+
+def test_stale_cache_looked_up_again(github, tmp_path):
+    cache_file = tmp_path / 'releases.json'
+    get_latest_releases(github.url, cache_file=str(cache_file))
+
+    cached = json.loads(cache_file.read_text())
+    cached['checked_at'] -= 2 * 24 * 3600
+    cache_file.write_text(json.dumps(cached))
+
+    get_latest_releases(github.url, cache_file=str(cache_file))
+    assert github.requests == 2
+
+
+def test_slow_lookup_does_not_block(github, tmp_path):
+    github.delay = 2
+
+    start = time.time()
+    releases = get_latest_releases(github.url, cache_file=str(tmp_path / 'releases.json'), deadline=0.2)
+
+    assert time.time() - start < 1
+    assert releases == {'stable': None, 'prerelease': None}
+
+
+def test_offline_uses_cache_only(github, tmp_path):
+    cache_file = str(tmp_path / 'releases.json')
+
+    assert get_latest_releases(github.url, offline=True, cache_file=cache_file) == {'stable': None, 'prerelease': None}
+    assert github.requests == 0
+
+    get_latest_releases(github.url, cache_file=cache_file)
+    assert get_latest_releases(github.url, offline=True, cache_file=cache_file)['stable'] == '1.2.0'
+    assert github.requests == 1
+
+
+def test_slow_lookup_remembered_as_failed(github, tmp_path):
+    github.delay = 1
+    cache_file = str(tmp_path / 'releases.json')
+
+    get_latest_releases(github.url, cache_file=cache_file, deadline=0.1, timeout=0.2)
+    start = time.time()
+    get_latest_releases(github.url, cache_file=cache_file, deadline=0.5)
+
+    # the next run does not wait for a lookup again within the failure TTL
+    assert time.time() - start < 0.1
+    assert github.requests == 1
+
+
+def test_lookup_done_after_deadline_is_cached(github, tmp_path):
+    github.delay = 0.3
+    cache_file = str(tmp_path / 'releases.json')
+
+    assert get_latest_releases(github.url, cache_file=cache_file, deadline=0.05)['stable'] is None
+    time.sleep(0.6)
+    assert get_latest_releases(github.url, cache_file=cache_file)['stable'] == '1.2.0'
+    assert github.requests == 1
@@ -0,0 +1,53 @@
+import io
+import sys
+import hashlib
+import pytest
+from seq_tools.utils import LineReader, CommandError, iter_cmd_lines, calculate_md5, calculate_md5s
+
+
+def test_line_reader_across_chunks():
+    reader = LineReader(io.BytesIO(b'line1\nline2\nline3'), chunk_size=4)
+
+    assert list(reader) == [b'line1', b'line2', b'line3']
+    assert reader.newlines == 2
+
+
+def test_line_reader_drain_counts_rest():
+    reader = LineReader(io.BytesIO(b'a\nb\nc\nd\n'), chunk_size=2)
+
+    assert next(iter(reader)) == b'a'
+    assert reader.drain() == 4
+
+
+def test_iter_cmd_lines_stops_at_max_lines():
+    cmd = [sys.executable, '-c', 'while True: print("read")']  # never ends by itself
+
+    assert list(iter_cmd_lines(cmd, max_lines=3)) == [b'read'] * 3
+
+
+def test_iter_cmd_lines_failing_command():
+    cmd = [sys.executable, '-c', 'import sys; print("read"); print("read"); sys.exit("truncated file")']
+
+    lines = []
+    with pytest.raises(CommandError, match="exited with code 1: truncated file"):
+        for line in iter_cmd_lines(cmd):
+            lines.append(line)
+    assert lines == [b'read'] * 2  # errors are not taken for output lines
+
+    # stopped before the end of its output, the exit status does not matter
+    assert list(iter_cmd_lines(cmd, max_lines=1)) == [b'read']
+
+
+def test_calculate_md5s(tmp_path):
+    contents = {'empty': b'', 'small': b'ACGT\n' * 1000, 'large': b'N' * (9 * 1024 * 1024 + 7)}
+    files = []
+    for name, content in contents.items():
+        (tmp_path / name).write_bytes(content)
+        files.append(str(tmp_path / name))
+
+    md5s = calculate_md5s(files, threads=2)
+
+    assert list(md5s) == files
+    for name, content in contents.items():
+        assert md5s[str(tmp_path / name)] == hashlib.md5(content).hexdigest()
+    assert calculate_md5(files[2], buffer_size=1024 * 1024) == md5s[files[2]]
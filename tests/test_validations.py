@@ -1,11 +1,14 @@
 import os
 import json
 import re
+import shutil
 from pathlib import Path
 from glob import glob
+import pytest
 from click.testing import CliRunner
 from seq_tools.cli import main
 from seq_tools.utils import find_files
+from seq_tools.validation import run_checkers
 
 test_dir = os.path.abspath(os.path.dirname(os.path.abspath(__file__)))
 
@@ -78,3 +81,267 @@ def test_validate(submission):
             os.remove(report)
         except Exception:
             pass
+
+
+def test_checks_reported_in_checker_order():
+    runner = CliRunner()
+    metadata_file = os.path.join(test_dir, 'submissions', 'HCC1160T.valid', 'sequencing_experiment.json')
+    with open(metadata_file) as f:
+        metadata_str = f.read()
+
+    result = runner.invoke(main, ['validate', '-w', '4', '-s', metadata_str])
+    report_obj = json.loads(result.stdout.strip().split('\n')[-1])
+
+    checkers = [c['checker'] for c in report_obj['validation']['checks']]
+    assert checkers and checkers == sorted(checkers)
+
+
+def test_run_checkers_one_at_a_time():
+    ran = []
+    # c2 is listed first but depends on c3
+    run_checkers({'c2': ['c3'], 'c1': [], 'c3': ['c1']}, ran.append, workers=1)
+
+    assert ran == ['c1', 'c3', 'c2']
+
+
+def test_validate_with_jobs():
+    runner = CliRunner()
+    metadata_files = sorted(glob(os.path.join(test_dir, 'submissions', 'metadata_file_only', '*.json')))
+    result = runner.invoke(main, ['validate', '-j', '2', '-d', os.path.join(test_dir, 'seq-data')] + metadata_files)
+
+    summary_report = json.loads(result.stdout.strip().split('\n')[-1])
+    assert summary_report['summary'] == {'INVALID': 2}
+
+    with open('validation_report.INVALID.jsonl') as f:
+        reports = [json.loads(line) for line in f]
+    os.remove('validation_report.INVALID.jsonl')
+
+    # reports are merged in the order metadata files are given
+    assert [r['metadata_file'] for r in reports] == metadata_files
+
+
+def test_validate_same_file_twice(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    runner = CliRunner()
+    metadata_file = sorted(glob(os.path.join(test_dir, 'submissions', 'metadata_file_only', '*.json')))[0]
+
+    for jobs in ('1', '2'):
+        result = runner.invoke(main, ['validate', '-j', jobs, '-d', os.path.join(test_dir, 'seq-data'),
+                                      metadata_file, metadata_file])
+        assert result.exit_code == 0
+        summary_report = json.loads(result.stdout.strip().split('\n')[-1])
+        assert summary_report['summary'] == {'INVALID': 2}
+
+        with open('validation_report.INVALID.jsonl') as f:
+            assert [json.loads(line)['metadata_file'] for line in f] == [metadata_file] * 2
+
+
+def test_validate_metrics():
+    runner = CliRunner()
+    metadata_file = os.path.join(test_dir, 'submissions', 'HCC1160T.valid', 'sequencing_experiment.json')
+    result = runner.invoke(main, ['validate', '--metrics', '-m', 'off', metadata_file])
+    summary_report = json.loads(result.stdout.strip().split('\n')[-1])
+
+    with open(summary_report['reports'][0]) as f:
+        checks = json.loads(f.readline())['validation']['checks']
+    metrics = {c['checker']: c['metrics'] for c in checks}
+    assert metrics['c683_fileMd5sum_match']['bytes_read'] > 0
+    assert metrics['c608_bam_sanity']['subprocesses'] > 0
+
+    assert summary_report['metrics']['checks'] == len(checks)
+    assert summary_report['metrics']['checkers']['c683_fileMd5sum_match']['wall_s'] >= 0
+
+
+def test_validate_profile(tmp_path):
+    runner = CliRunner()
+    metadata_file = os.path.join(test_dir, 'submissions', 'HCC1160T.valid', 'sequencing_experiment.json')
+    result = runner.invoke(main, ['validate', '--profile', str(tmp_path), metadata_file])
+    summary_report = json.loads(result.stdout.strip().split('\n')[-1])
+
+    profile_dir = os.path.dirname(summary_report['profile'])
+    assert glob(os.path.join(profile_dir, 'sequencing_experiment.json.*.c683_fileMd5sum_match.pstats'))
+    with open(summary_report['profile']) as f:
+        summary = f.read()
+    assert 'c683_fileMd5sum_match' in summary
+    assert 'cumulative' in summary
+
+
+def test_validate_trace(tmp_path):
+    runner = CliRunner()
+    metadata_files = sorted(glob(os.path.join(test_dir, 'submissions', 'metadata_file_only', '*.json')))
+    trace_file = str(tmp_path / 'trace.json')
+    runner.invoke(main, ['validate', '-j', '2', '--trace', trace_file,
+                         '-d', os.path.join(test_dir, 'seq-data')] + metadata_files)
+
+    with open(trace_file) as f:
+        spans = [e for e in json.load(f)['traceEvents'] if e['ph'] == 'X']
+
+    # spans of worker processes are merged
+    validations = [e for e in spans if e['cat'] == 'validation']
+    assert sorted(e['args']['metadata_file'] for e in validations) == metadata_files
+    assert any(e['cat'] == 'checker' and e['name'] == 'c683_fileMd5sum_match' for e in spans)
+    assert any(e['cat'] == 'io' and e['args'].get('bytes') for e in spans)
+    assert not glob(trace_file + '.*.part')
+
+
+def test_validate_full_scan():
+    runner = CliRunner()
+    submission = 'anon_chr1_sameReadName_diffReadGroup'
+    metadata_file = os.path.join(test_dir, 'submissions', submission, '%s.json' % submission)
+    runner.invoke(main, ['validate', '-f', metadata_file])
+
+    with open('validation_report.INVALID.jsonl') as f:
+        report = json.loads(f.readline())
+    os.remove('validation_report.INVALID.jsonl')
+
+    with open(find_expected_report_jsonls(metadata_file)[0]) as f:
+        expected = json.load(f)
+
+    def c680(r):
+        return [c for c in r['validation']['checks'] if c['checker'] == 'c680_repeated_read_names_per_group_in_bam']
+
+    assert c680(report) == c680(expected)
+
+
+def test_validate_resume(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # no checkpoints of earlier runs
+    runner = CliRunner()
+    metadata_file = os.path.join(test_dir, 'submissions', 'HCC1160T.valid', 'sequencing_experiment.json')
+    runner.invoke(main, ['validate', '-r', metadata_file])
+
+    checkpoint_file = max(glob(os.path.join('logs', 'checkpoints', '*.json')), key=os.path.getmtime)
+    with open(checkpoint_file) as f:
+        checkpoint = json.load(f)
+    assert checkpoint['c683_fileMd5sum_match']['status'] == 'PASS'
+
+    # tell a resumed check apart from one that is run again
+    checkpoint['c683_fileMd5sum_match']['message'] = 'from checkpoint'
+    with open(checkpoint_file, 'w') as f:
+        json.dump(checkpoint, f)
+
+    def c683_message(cli_option):
+        runner.invoke(main, cli_option)
+        with open('validation_report.PASS.jsonl') as f:
+            report = json.loads(f.readline())
+        os.remove('validation_report.PASS.jsonl')
+        return [c['message'] for c in report['validation']['checks'] if c['checker'] == 'c683_fileMd5sum_match']
+
+    assert c683_message(['validate', '-r', metadata_file]) == ['from checkpoint']
+    assert c683_message(['validate', metadata_file]) != ['from checkpoint']
+    # checksums are verified again, not taken from a result saved without verifying
+    assert c683_message(['validate', '-r', '-m', 'verify', metadata_file]) != ['from checkpoint']
+
+
+def test_validate_without_resume_saves_no_checkpoints(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    runner = CliRunner()
+    metadata_file = os.path.join(test_dir, 'submissions', 'HCC1160T.valid', 'sequencing_experiment.json')
+    runner.invoke(main, ['validate', metadata_file])
+
+    assert os.path.isfile('validation_report.PASS.jsonl')
+    assert not os.path.exists(os.path.join('logs', 'checkpoints'))
+
+
+def test_validate_resume_after_metadata_change(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    runner = CliRunner()
+    submission_dir = tmp_path / 'HCC1160T.valid'
+    shutil.copytree(os.path.join(test_dir, 'submissions', 'HCC1160T.valid'), str(submission_dir))
+    metadata_file = str(submission_dir / 'sequencing_experiment.json')
+    runner.invoke(main, ['validate', '-r', metadata_file])
+
+    checkpoint_file = max(glob(os.path.join('logs', 'checkpoints', '*.json')), key=os.path.getmtime)
+    with open(checkpoint_file) as f:
+        checkpoint = json.load(f)
+    for result in checkpoint.values():  # tell reused results apart from checks run again
+        result['message'] = 'from checkpoint'
+    with open(checkpoint_file, 'w') as f:
+        json.dump(checkpoint, f)
+
+    with open(metadata_file) as f:
+        metadata = json.load(f)
+    metadata['read_groups'][0]['platform_unit'] = '74_8z'  # a WARNING in c660, other checks still PASS
+    with open(metadata_file, 'w') as f:
+        json.dump(metadata, f)
+
+    runner.invoke(main, ['validate', '-r', metadata_file])
+    with open('validation_report.PASS-with-WARNING.jsonl') as f:
+        report = json.loads(f.readline())
+    os.remove('validation_report.PASS-with-WARNING.jsonl')
+
+    reused = {c['checker'] for c in report['validation']['checks'] if c['message'] == 'from checkpoint'}
+    assert 'c140_platform_unit_uniqueness' not in reused  # reads platform_unit
+    assert 'c660_metadata_in_bam_rg_header' not in reused
+    assert {'c110_rg_id_uniqueness', 'c608_bam_sanity', 'c680_repeated_read_names_per_group_in_bam',
+            'c683_fileMd5sum_match'} <= reused
+
+
+def test_validate_openmetrics(tmp_path):
+    runner = CliRunner()
+    metadata_file = os.path.join(test_dir, 'submissions', 'HCC1160T.valid', 'sequencing_experiment.json')
+    textfile = str(tmp_path / 'seq_tools.prom')
+    result = runner.invoke(main, ['validate', '--openmetrics', textfile, metadata_file])
+    summary_report = json.loads(result.stdout.strip().split('\n')[-1])
+
+    with open(textfile) as f:
+        lines = f.read().split('\n')
+    assert 'seq_tools_metadata_files_total{status="PASS"} 1' in lines
+    assert 'seq_tools_checks_total{checker="c683_fileMd5sum_match",status="PASS"} 1' in lines
+    assert any(line.startswith('seq_tools_check_duration_seconds_count{checker="c608_bam_sanity"}') for line in lines)
+
+    # metrics of checks are only kept in reports with --metrics
+    assert 'metrics' not in summary_report
+    with open(summary_report['reports'][0]) as f:
+        checks = json.loads(f.readline())['validation']['checks']
+    assert not any('metrics' in c for c in checks)
+
+
+def test_validate_metadata_str_openmetrics(tmp_path):
+    runner = CliRunner()
+    with open(os.path.join(test_dir, 'submissions', 'HCC1160T.valid', 'sequencing_experiment.json')) as f:
+        metadata_str = f.read()
+    textfile = str(tmp_path / 'seq_tools.prom')
+    result = runner.invoke(main, ['validate', '--openmetrics', textfile, '-s', metadata_str])
+    report = json.loads(result.stdout.strip().split('\n')[-1])
+
+    with open(textfile) as f:
+        assert 'seq_tools_metadata_files_total{status="PASS"} 1' in f.read().split('\n')
+    # measured for the export only, the report printed is as without --openmetrics
+    assert not any('metrics' in c for c in report['validation']['checks'])
+
+
+def test_validate_malformed_read_group(tmp_path):
+    runner = CliRunner()
+    submission_dir = tmp_path / 'HCC1160T.valid'
+    shutil.copytree(os.path.join(test_dir, 'submissions', 'HCC1160T.valid'), str(submission_dir))
+    metadata_file = str(submission_dir / 'sequencing_experiment.json')
+    with open(metadata_file) as f:
+        metadata = json.load(f)
+    metadata['read_groups'][0]['read_group_id_in_bam'] = ['x']
+    with open(metadata_file, 'w') as f:
+        json.dump(metadata, f)
+
+    # checks go on and report it, instead of failing the whole run
+    result = runner.invoke(main, ['validate', metadata_file])
+    summary_report = json.loads(result.stdout.strip().split('\n')[-1])
+    assert summary_report['summary'] == {'UNKNOWN': 1}
+
+    with open('validation_report.UNKNOWN.jsonl') as f:
+        report = json.loads(f.readline())
+    os.remove('validation_report.UNKNOWN.jsonl')
+    statuses = {c['checker']: c['status'] for c in report['validation']['checks']}
+    assert statuses['c240_submitter_rg_id_collide_with_rg_id_in_bam'] == 'UNKNOWN'
+
+
+@pytest.mark.parametrize('files', ['Submitted Reads', 1, {'fileName': 'a.bam'}])
+def test_validate_files_not_a_list(files):
+    runner = CliRunner()
+    with open(os.path.join(test_dir, 'submissions', 'HCC1160T.valid', 'sequencing_experiment.json')) as f:
+        metadata = json.load(f)
+    metadata['files'] = files
+    result = runner.invoke(main, ['validate', '-s', json.dumps(metadata)])
+    report = json.loads(result.stdout.strip().split('\n')[-1])
+
+    statuses = {c['checker']: c['status'] for c in report['validation']['checks']}
+    assert statuses['c180_file_uniqueness'] == 'INVALID'
+    assert statuses['c210_no_path_in_filename'] == 'INVALID'